@@ -24,5 +24,92 @@ class Settings:
         "GOOGLE_APPLICATION_CREDENTIALS_JSON_BASE64"
     )
 
+    # Local directory uploads are spooled to before a Celery worker ingests them;
+    # it must be shared by the API and the workers
+    PRE_PROCESSING_SPOOL_DIR: str = os.getenv("PRE_PROCESSING_SPOOL_DIR", "/tmp/pre_processing_spool")
+
+    # Processes decoding and validating the files of a batch in parallel; 1 parses them in the request process
+    PRE_PROCESSING_PARSE_WORKERS: int = int(os.getenv("PRE_PROCESSING_PARSE_WORKERS", min(os.cpu_count() or 1, 4)))
+
+    # A file is rejected during ingestion when more than this share of its records is malformed,
+    # judged as soon as PRE_VALIDATION_MIN_RECORDS records were read
+    PRE_VALIDATION_MAX_BROKEN_RATIO: float = float(os.getenv("PRE_VALIDATION_MAX_BROKEN_RATIO", 0.5))
+    PRE_VALIDATION_MIN_RECORDS: int = int(os.getenv("PRE_VALIDATION_MIN_RECORDS", 50))
+
+    # Validation of a batch is split into up to VALIDATION_SHARDS Celery tasks of at least
+    # VALIDATION_SHARD_MIN_RECORDS entries each
+    VALIDATION_SHARDS: int = int(os.getenv("VALIDATION_SHARDS", 8))
+    VALIDATION_SHARD_MIN_RECORDS: int = int(os.getenv("VALIDATION_SHARD_MIN_RECORDS", 2000))
+
+    # Serializer of Celery task messages and results: "msgpack+zstd" (app.jobs.serialization) or "json".
+    # msgpack+zstd payloads at least CELERY_COMPRESSION_THRESHOLD_BYTES long are compressed; 0 disables it
+    CELERY_SERIALIZER: str = os.getenv("CELERY_SERIALIZER", "msgpack+zstd")
+    CELERY_COMPRESSION_THRESHOLD_BYTES: int = int(os.getenv("CELERY_COMPRESSION_THRESHOLD_BYTES", 16 * 1024))
+    # Payload metrics are summed in each process and written to Redis at most every CELERY_PAYLOAD_METRICS_FLUSH_SECONDS
+    CELERY_PAYLOAD_METRICS_FLUSH_SECONDS: float = float(os.getenv("CELERY_PAYLOAD_METRICS_FLUSH_SECONDS", 10))
+
+    # Tasks matching CELERY_IO_TASKS (comma-separated names, * globs allowed) go to CELERY_IO_QUEUE,
+    # served by a thread pool; all others go to CELERY_CPU_QUEUE, served by a prefork pool.
+    # The pool sizes are set on the worker command lines (CELERY_IO_CONCURRENCY, CELERY_CPU_CONCURRENCY).
+    # Ingestion is on the io queue as it parses on a process pool, which daemonic prefork children cannot start
+    CELERY_IO_QUEUE: str = os.getenv("CELERY_IO_QUEUE", "io")
+    CELERY_CPU_QUEUE: str = os.getenv("CELERY_CPU_QUEUE", "cpu")
+    CELERY_IO_TASKS: list = [
+        name.strip()
+        for name in os.getenv(
+            "CELERY_IO_TASKS",
+            "app.jobs.celery_task.process_images_task*,app.jobs.celery_task.process_colab_link,"
+            "app.jobs.ingest.ingest_upload_task",
+        ).split(",")
+        if name.strip()
+    ]
+
+    # S3 file webhook jobs are read from their Redis stream WEBHOOK_STREAM_BATCH_SIZE at a time, waiting up to
+    # WEBHOOK_STREAM_BLOCK_MS for new ones, and processed WEBHOOK_CONSUMER_CONCURRENCY at once per consumer.
+    # Jobs left unacknowledged for WEBHOOK_STREAM_CLAIM_IDLE_MS are retried, up to WEBHOOK_STREAM_MAX_DELIVERIES times
+    WEBHOOK_STREAM_BATCH_SIZE: int = int(os.getenv("WEBHOOK_STREAM_BATCH_SIZE", 50))
+    WEBHOOK_STREAM_BLOCK_MS: int = int(os.getenv("WEBHOOK_STREAM_BLOCK_MS", 5000))
+    WEBHOOK_CONSUMER_CONCURRENCY: int = int(os.getenv("WEBHOOK_CONSUMER_CONCURRENCY", 8))
+    WEBHOOK_STREAM_CLAIM_IDLE_MS: int = int(os.getenv("WEBHOOK_STREAM_CLAIM_IDLE_MS", 5 * 60 * 1000))
+    WEBHOOK_STREAM_MAX_DELIVERIES: int = int(os.getenv("WEBHOOK_STREAM_MAX_DELIVERIES", 5))
+    # Approximate number of entries kept in the stream
+    WEBHOOK_STREAM_MAXLEN: int = int(os.getenv("WEBHOOK_STREAM_MAXLEN", 100000))
+
+    # Images are copied from GCS to S3 by IMAGE_COPY_WORKERS threads per task, each streaming its image
+    # in parts of IMAGE_TRANSFER_PART_SIZE bytes (5 MiB at least) uploaded IMAGE_TRANSFER_CONCURRENCY at a time
+    IMAGE_COPY_WORKERS: int = int(os.getenv("IMAGE_COPY_WORKERS", 8))
+    IMAGE_TRANSFER_PART_SIZE: int = int(os.getenv("IMAGE_TRANSFER_PART_SIZE", 8 * 1024 * 1024))
+    IMAGE_TRANSFER_CONCURRENCY: int = int(os.getenv("IMAGE_TRANSFER_CONCURRENCY", 1))
+
+    # A copy failing with a transient error is tried up to IMAGE_TRANSFER_MAX_ATTEMPTS times, waiting
+    # IMAGE_TRANSFER_RETRY_BASE_SECONDS after the first failure, doubled after each one up to IMAGE_TRANSFER_RETRY_MAX_SECONDS
+    IMAGE_TRANSFER_MAX_ATTEMPTS: int = int(os.getenv("IMAGE_TRANSFER_MAX_ATTEMPTS", 4))
+    IMAGE_TRANSFER_RETRY_BASE_SECONDS: float = float(os.getenv("IMAGE_TRANSFER_RETRY_BASE_SECONDS", 1))
+    IMAGE_TRANSFER_RETRY_MAX_SECONDS: float = float(os.getenv("IMAGE_TRANSFER_RETRY_MAX_SECONDS", 30))
+
+    # Engine copying the images of a task: "threads" (IMAGE_COPY_WORKERS threads per task) or "asyncio",
+    # one event loop per worker process running up to IMAGE_COPY_MAX_CONCURRENCY copies across all its tasks
+    IMAGE_COPY_BACKEND: str = os.getenv("IMAGE_COPY_BACKEND", "threads")
+    IMAGE_COPY_MAX_CONCURRENCY: int = int(os.getenv("IMAGE_COPY_MAX_CONCURRENCY", 256))
+
+    # Connections kept per worker process to S3 and to GCS, shared by the image copies of all its tasks
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 64))
+    GCS_MAX_POOL_CONNECTIONS: int = int(os.getenv("GCS_MAX_POOL_CONNECTIONS", 64))
+
+    # A batch still in progress can only be resumed once neither it nor any of its stages has
+    # changed for BATCH_RESUME_STALE_SECONDS, i.e. the worker running it is gone
+    BATCH_RESUME_STALE_SECONDS: int = int(os.getenv("BATCH_RESUME_STALE_SECONDS", 2 * 60 * 60))
+
+    # Largest chunk accepted by the resumable upload API, and how long an idle upload is kept
+    RESUMABLE_UPLOAD_MAX_CHUNK_SIZE: int = int(os.getenv("RESUMABLE_UPLOAD_MAX_CHUNK_SIZE", 16 * 1024 * 1024))
+    RESUMABLE_UPLOAD_TTL_SECONDS: int = int(os.getenv("RESUMABLE_UPLOAD_TTL_SECONDS", 24 * 60 * 60))
+
+    # Bytes of upload bodies the API processes at once, across all workers; requests over it
+    # wait up to UPLOAD_ADMISSION_MAX_WAIT_SECONDS before being rejected with 429
+    UPLOAD_ADMISSION_BUDGET_BYTES: int = int(os.getenv("UPLOAD_ADMISSION_BUDGET_BYTES", 1024 * 1024 * 1024))
+    UPLOAD_ADMISSION_MAX_WAIT_SECONDS: float = float(os.getenv("UPLOAD_ADMISSION_MAX_WAIT_SECONDS", 10))
+    UPLOAD_ADMISSION_RETRY_AFTER_SECONDS: int = int(os.getenv("UPLOAD_ADMISSION_RETRY_AFTER_SECONDS", 30))
+    UPLOAD_ADMISSION_TTL_SECONDS: int = int(os.getenv("UPLOAD_ADMISSION_TTL_SECONDS", 60 * 60))
+
 
 settings = Settings()
@@ -2,7 +2,7 @@ from fastapi import UploadFile
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.enums import WorkstreamEnum, ClientEnum
-from app.db.models import Batch
+from app.db.models import Batch, PreProcessingFile
 from app.strategies.preprocessing.base import PreProcessingStrategy
 from app.strategies.preprocessing.rlhf_text_strategy import RLHFTextPreProcessingStrategy
 from app.strategies.preprocessing.rlhf_vision_strategy import RLHFPreProcessingStrategy
@@ -22,13 +22,31 @@ class PreProcessingContext:
     def set_batch(self, batch: Batch):
         self.batch = batch
 
-    async def process_file(self, file: UploadFile):
-        task = await self.strategy.process_file(file, self.batch, self.db)
-        if task:
-            self.parallel_tasks.append(task)
+    def process_files(self, files: List[UploadFile]):
+        self.parallel_tasks.extend(self.strategy.process_files(files, self.batch, self.db))
 
-    async def execute_tasks(self):
-        await self.strategy.execute_tasks(self.batch, self.parallel_tasks)
+    def execute_tasks(self):
+        # Byte-identical re-uploads take the results of the earlier batch instead of reprocessing
+        if self.strategy.reuse_identical_batch(self.batch, self.db):
+            return
+        self.strategy.execute_tasks(self.batch, self.parallel_tasks)
+
+    def resume(self):
+        """
+        Start the processing tasks of a batch whose records are already stored again; the
+        stages an earlier run completed return their checkpoint instead of running
+        """
+        file_records = (
+            self.db.query(PreProcessingFile)
+            .filter(PreProcessingFile.batch_id == self.batch.id)
+            .order_by(PreProcessingFile.id)
+            .all()
+        )
+        for file_record in file_records:
+            task = self.strategy.create_tasks(file_record, self.batch)
+            if task:
+                self.parallel_tasks.append(task)
+        self.strategy.execute_tasks(self.batch, self.parallel_tasks)
 
 
 class PreProcessingContextFactory:
@@ -0,0 +1,77 @@
+"""
+Process-wide GCS and S3 clients of the image transfers.
+
+Building a client loads credentials and opens a new connection pool, so the tasks of a worker
+process share the clients built by the first of them. The pools are sized by
+S3_MAX_POOL_CONNECTIONS and GCS_MAX_POOL_CONNECTIONS to serve the copy threads of all the
+tasks the process runs at once, rather than botocore's and requests' default of 10.
+"""
+import threading
+import boto3
+from botocore.config import Config
+from google.cloud import storage
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+from app.config import settings
+from app.core.s3_client import S3Client
+
+
+GCS_SERVICE_ACCOUNT_FILE = "turing-gpt.json"
+GCS_READ_SCOPES = ["https://www.googleapis.com/auth/devstorage.read_only"]
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _shared(name, create):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = create()
+    return client
+
+
+def s3_config() -> Config:
+    return Config(max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS)
+
+
+def _create_gcs_client() -> storage.Client:
+    client = storage.Client.from_service_account_json(GCS_SERVICE_ACCOUNT_FILE)
+    adapter = HTTPAdapter(
+        pool_connections=settings.GCS_MAX_POOL_CONNECTIONS, pool_maxsize=settings.GCS_MAX_POOL_CONNECTIONS
+    )
+    client._http.mount("https://", adapter)
+    return client
+
+
+def gcs_client() -> storage.Client:
+    """Client of the GCS buckets the images are read from"""
+    return _shared("gcs", _create_gcs_client)
+
+
+def gcs_credentials() -> service_account.Credentials:
+    """Credentials of the service account, for GCS requests made without the client"""
+    return _shared(
+        "gcs_credentials",
+        lambda: service_account.Credentials.from_service_account_file(GCS_SERVICE_ACCOUNT_FILE, scopes=GCS_READ_SCOPES),
+    )
+
+
+def dev_s3_client():
+    """boto3 client of the dev bucket"""
+    return _shared(
+        "dev_s3",
+        lambda: boto3.client(
+            "s3",
+            aws_access_key_id=settings.DEV_AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.DEV_AWS_SECRET_ACCESS_KEY,
+            config=s3_config(),
+        ),
+    )
+
+
+def penguin_s3() -> S3Client:
+    """S3Client of the delivery bucket; call _refresh_if_credentials_expired before using its s3_client"""
+    return _shared("penguin_s3", S3Client)
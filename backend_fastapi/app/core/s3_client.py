@@ -1,5 +1,6 @@
 import os
 import boto3
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
 from datetime import datetime, timezone
 import json
@@ -59,6 +60,7 @@ class S3Client:
                 aws_access_key_id=self.credentials["AccessKeyId"],
                 aws_secret_access_key=self.credentials["SecretAccessKey"],
                 aws_session_token=self.credentials["SessionToken"],
+                config=Config(max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", 64))),
             )
         except (NoCredentialsError, PartialCredentialsError) as e:
             self.logger.error(f"Credentials error: {str(e)}", exc_info=True)
@@ -80,6 +82,28 @@ class S3Client:
             self.logger.info("Credentials expired; reinitializing.")
             self._assume_role_and_initialize()
 
+    def head_file(self, object_key):
+        """Return the ETag, size and version id of a file in S3, or None when it cannot be read."""
+        self._refresh_if_credentials_expired()
+
+        if not self.s3_client:
+            print("Error: S3 client is not initialized.")
+            return None
+
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+            return {
+                "etag": response["ETag"],
+                "size": response["ContentLength"],
+                "version_id": response.get("VersionId"),
+            }
+        except ClientError as e:
+            print(f"Error reading metadata of {object_key} from S3: {e.response['Error'].get('Message', e.response['Error']['Code'])}")
+            return None
+        except Exception as e:
+            print(f"Unexpected error: {str(e)}")
+            return None
+
     def download_file(self, object_key):
         """Download a file from S3 and return its content."""
         # Refresh credentials if expired
@@ -0,0 +1,79 @@
+import csv
+import tempfile
+from typing import Optional, Sequence, TextIO
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+class CopyWriter:
+    """
+    Buffers rows as CSV on a spooled temporary file and bulk-loads them with
+    COPY ... FROM STDIN on the session's connection, so large inserts neither
+    build ORM objects nor hold every row in memory.
+
+    The COPY runs inside the session's transaction; callers commit as usual. With `path`,
+    rows are written to that file instead, so another process can load them with copy_csv.
+    """
+
+    def __init__(
+        self, table: Table, columns: Sequence[str], max_memory: int = SPOOL_MAX_MEMORY, path: Optional[str] = None
+    ):
+        self.table = table
+        self.columns = list(columns)
+        self.rows = 0
+        if path is None:
+            self._fp = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+", encoding="utf-8", newline="")
+        else:
+            self._fp = open(path, "w+", encoding="utf-8", newline="")
+        # Strings are always quoted so an empty string is not read back as NULL
+        self._writer = csv.writer(self._fp, quoting=csv.QUOTE_NONNUMERIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, row: Sequence) -> None:
+        self._writer.writerow([_to_csv_value(value) for value in row])
+        self.rows += 1
+
+    def copy(self, db: Session) -> int:
+        """Load the buffered rows and reset the buffer; returns the number of rows copied"""
+        if not self.rows:
+            return 0
+
+        self._fp.seek(0)
+        copy_csv(db, self.table, self.columns, self._fp)
+
+        copied = self.rows
+        self._fp.seek(0)
+        self._fp.truncate()
+        self.rows = 0
+        return copied
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def copy_csv(db: Session, table: Table, columns: Sequence[str], fp: TextIO) -> None:
+    """COPY rows written by a CopyWriter from `fp` into `table`"""
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(statement, fp)
+    finally:
+        cursor.close()
+
+
+def _to_csv_value(value):
+    # UUIDs, dates and the like are written as their text form; None stays an unquoted NULL
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, bytes):
+        # bytea hex input format
+        return f"\\x{value.hex()}"
+    return str(value)
@@ -0,0 +1,51 @@
+"""
+Completion markers of the pipeline stages of a batch, so a failed or interrupted batch
+can be resumed from where it stopped instead of being uploaded again. A stage writes its
+checkpoint in the same transaction as its results; on a rerun it finds the checkpoint
+and returns the stored artifact instead of doing the work again.
+"""
+from typing import Any, Optional
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.db.models import BatchCheckpoint
+
+
+IMAGE_COPY_STAGE = "image_copy"
+CONVERSION_STAGE = "conversion"
+VALIDATION_SHARD_STAGE = "validation_shard"
+VALIDATION_STAGE = "validation"
+
+# Marker returned by get_checkpoint for a stage not completed yet, as None is a valid artifact
+NOT_COMPLETED = object()
+
+
+def image_copy_stage(preprocessing_file_id) -> str:
+    return f"{IMAGE_COPY_STAGE}:{preprocessing_file_id}"
+
+
+def validation_shard_stage(shard: int, shards: int) -> str:
+    return f"{VALIDATION_SHARD_STAGE}:{shard}/{shards}"
+
+
+def get_checkpoint(db: Session, batch_id, stage: str) -> Any:
+    """The artifact stored when `stage` of the batch completed, or NOT_COMPLETED"""
+    checkpoint = db.query(BatchCheckpoint.artifact).filter_by(batch_id=batch_id, stage=stage).first()
+    return NOT_COMPLETED if checkpoint is None else checkpoint.artifact
+
+
+def mark_completed(db: Session, batch_id, stage: str, artifact: Optional[Any] = None) -> None:
+    """Record `stage` of the batch as completed with its artifact; the caller commits"""
+    statement = insert(BatchCheckpoint).values(batch_id=batch_id, stage=stage, artifact=artifact)
+    db.execute(
+        statement.on_conflict_do_update(
+            constraint="uq_batch_checkpoints_batch_stage",
+            set_={"artifact": statement.excluded.artifact, "completed_at": statement.excluded.completed_at},
+        )
+    )
+
+
+def clear_checkpoints(db: Session, batch_id, stage_prefix: str) -> None:
+    """Remove the checkpoints of the batch whose stage starts with `stage_prefix`; the caller commits"""
+    db.query(BatchCheckpoint).filter(
+        BatchCheckpoint.batch_id == batch_id, BatchCheckpoint.stage.startswith(stage_prefix)
+    ).delete(synchronize_session=False)
@@ -17,6 +17,7 @@ class ValidationErrorTypeEnum(enum.Enum):
     TASK_CREATION = "Task creation error"
     TASK_PROCESSING = "Task processing error"
     PENGUIN_FORMATTING = "Penguin formatting error"
+    RECORD_STRUCTURE = "Record structure error"
 
 
 class StatusEnum(enum.Enum):
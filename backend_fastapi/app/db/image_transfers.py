@@ -0,0 +1,113 @@
+from typing import List
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.db.bulk import CopyWriter
+from app.db.models import ImageTransfer
+
+
+IMAGE_TRANSFER_COLUMNS = (
+    "batch_id",
+    "preprocessing_file_id",
+    "source",
+    "s3_key",
+    "status",
+    "started_at",
+    "seconds",
+    "attempts",
+    "bytes",
+    "error_class",
+    "error_message",
+)
+
+# Failed copies listed by batch_transfer_report
+MAX_REPORTED_FAILURES = 100
+
+
+class ImageTransferWriter(CopyWriter):
+    """
+    Bulk-loads the TransferResults of the image copies of a file into image_transfers; copy()
+    loads them in one COPY and the caller commits.
+    """
+
+    def __init__(self, batch_id, preprocessing_file_id=None):
+        super().__init__(ImageTransfer.__table__, IMAGE_TRANSFER_COLUMNS)
+        self.batch_id = batch_id
+        self.preprocessing_file_id = preprocessing_file_id
+
+    def add(self, result) -> None:
+        self.write(
+            (
+                self.batch_id,
+                self.preprocessing_file_id,
+                result.source,
+                result.s3_key,
+                result.status,
+                result.started_at,
+                result.seconds,
+                result.attempts,
+                result.bytes,
+                result.error_class,
+                result.error_message,
+            )
+        )
+
+
+def _latest_transfers(db: Session, batch_id):
+    """The last copy of each image of a batch, which earlier attempts of the batch may have preceded"""
+    return (
+        db.query(ImageTransfer)
+        .filter(ImageTransfer.batch_id == batch_id)
+        .distinct(ImageTransfer.s3_key)
+        .order_by(ImageTransfer.s3_key, ImageTransfer.id.desc())
+        .subquery()
+    )
+
+
+def batch_transfer_report(db: Session, batch_id) -> dict:
+    """
+    Counts and throughput of the image copies of a batch, by the last copy of each image,
+    with the copies still failing
+    """
+    latest = _latest_transfers(db, batch_id)
+    counts = dict(db.query(latest.c.status, func.count()).group_by(latest.c.status).all())
+    retried = db.query(func.count()).select_from(latest).filter(latest.c.attempts > 1).scalar()
+
+    # Throughput of every copy made for the batch, over the wall-clock time they ran, as they overlap
+    copied, total_bytes, started_at, ended_at = (
+        db.query(
+            func.count(),
+            func.coalesce(func.sum(ImageTransfer.bytes), 0),
+            func.min(ImageTransfer.started_at),
+            func.max(ImageTransfer.started_at + func.make_interval(0, 0, 0, 0, 0, 0, ImageTransfer.seconds)),
+        )
+        .filter(ImageTransfer.batch_id == batch_id, ImageTransfer.status == "copied")
+        .one()
+    )
+    seconds = (ended_at - started_at).total_seconds() if started_at else 0.0
+
+    failures: List[dict] = [
+        {
+            "source": row.source,
+            "s3_key": row.s3_key,
+            "attempts": row.attempts,
+            "error_class": row.error_class,
+            "error_message": row.error_message,
+        }
+        for row in db.query(latest)
+        .filter(latest.c.status == "failed")
+        .order_by(latest.c.s3_key)
+        .limit(MAX_REPORTED_FAILURES)
+        .all()
+    ]
+    return {
+        "images": sum(counts.values()),
+        "copied": counts.get("copied", 0),
+        "skipped": counts.get("skipped", 0),
+        "failed": counts.get("failed", 0),
+        "retried": retried,
+        "bytes": int(total_bytes),
+        "seconds": seconds,
+        "images_per_second": copied / seconds if seconds else None,
+        "mb_per_second": int(total_bytes) / (1024 * 1024) / seconds if seconds else None,
+        "failures": failures,
+    }
@@ -2,15 +2,19 @@ import enum
 import uuid
 from sqlalchemy import (
     TIMESTAMP,
+    BigInteger,
     Boolean,
     Column,
     Date,
     Enum,
+    Float,
     Integer,
     String,
     ForeignKey,
     JSON,
     DateTime,
+    Index,
+    LargeBinary,
     UniqueConstraint,
 )
 from sqlalchemy.orm import relationship, Session
@@ -49,6 +53,10 @@ class S3File(Base):
     file_url = Column(String, nullable=False)
     workstream = Column(String, nullable=True)
     annotator_id = Column(Integer, index=True, nullable=True)
+    # Object the content and stats were computed from, to skip webhook updates that changed nothing
+    etag = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=True)
+    version_id = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -115,6 +123,33 @@ class PreProcessingFileJson(Base):
     preprocessing_file = relationship("PreProcessingFile", back_populates="json_data", uselist=False)
 
 
+class PreProcessingRecord(Base):
+    __tablename__ = "pre_processing_records"
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), nullable=False)
+    preprocessing_file_id = Column(Integer, ForeignKey("pre_processing_files.id"), nullable=False)
+    section = Column(String, nullable=False)
+    position = Column(Integer, nullable=False)
+    task_url = Column(String, nullable=True)
+    # Rows written before payload compression keep their record in content
+    content = Column(JSONB, nullable=True)
+    # zstd-compressed canonical JSON of the record
+    payload = Column(LargeBinary, nullable=True)
+    record_sha256 = Column(String(64), nullable=True)
+    # Apple format conversion of an rlhf record and the hash of the sft entry it was built with
+    converted = Column(JSONB, nullable=True)
+    sft_sha256 = Column(String(64), nullable=True)
+    # Bucket the images of the record were copied to
+    image_bucket = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pre_processing_records_batch_task_url", "batch_id", "task_url"),
+        Index("ix_pre_processing_records_record_sha256", "record_sha256", "section"),
+        Index("ix_pre_processing_records_batch_section", "batch_id", "section", "preprocessing_file_id", "position"),
+    )
+
+
 class Batch(Base, TimeStampMixin):
     __tablename__ = "batches"
 
@@ -152,6 +187,7 @@ class PreProcessingFile(Base, TimeStampMixin):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), nullable=True)
+    content_sha256 = Column(String(64), nullable=True, index=True)
 
     json_data = relationship("PreProcessingFileJson", back_populates="preprocessing_file", uselist=False)
     batch = relationship("Batch", back_populates="preprocessing_files")
@@ -170,6 +206,59 @@ class ValidationError(Base, TimeStampMixin):
     batch = relationship("Batch", back_populates="validation_errors")
 
 
+class BatchStageMetric(Base):
+    __tablename__ = "batch_stage_metrics"
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), nullable=False, index=True)
+    # Pipeline stage, e.g. image_copy, conversion, validation_shard
+    stage = Column(String, nullable=False)
+    task_id = Column(String, nullable=True)
+    status = Column(String, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+    records = Column(Integer, nullable=True)
+    bytes_in = Column(BigInteger, nullable=True)
+    bytes_out = Column(BigInteger, nullable=True)
+    # Peak resident memory of the worker process while the stage ran, shared with the tasks running beside it
+    peak_rss_bytes = Column(BigInteger, nullable=True)
+    # Stage-specific figures, e.g. the seconds spent in each validator
+    details = Column(JSONB, nullable=True)
+
+
+class BatchCheckpoint(Base):
+    __tablename__ = "batch_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), nullable=False)
+    # Pipeline stage completed, e.g. conversion or validation_shard:2/8
+    stage = Column(String, nullable=False)
+    # What the stage handed to the next one, returned again when the stage is skipped on resume
+    artifact = Column(JSONB, nullable=True)
+    completed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (UniqueConstraint("batch_id", "stage", name="uq_batch_checkpoints_batch_stage"),)
+
+
+class ImageTransfer(Base):
+    __tablename__ = "image_transfers"
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), nullable=False, index=True)
+    preprocessing_file_id = Column(Integer, ForeignKey("pre_processing_files.id"), nullable=True)
+    # gs:// URL of the image and the key it is copied to
+    source = Column(String, nullable=False)
+    s3_key = Column(String, nullable=False)
+    # copied, skipped (already in S3) or failed
+    status = Column(String, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    seconds = Column(Float, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    bytes = Column(BigInteger, nullable=True)
+    error_class = Column(String, nullable=True)
+    error_message = Column(String, nullable=True)
+
+
 class DeliveredId(Base, TimeStampMixin):
     __tablename__ = "delivered_ids"
 
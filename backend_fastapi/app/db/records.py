@@ -0,0 +1,296 @@
+import hashlib
+import json
+from typing import Any, Collection, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import Numeric, Text, and_, cast, exists, func, select, true, update
+from sqlalchemy.orm import Session, aliased
+from app.db.bulk import CopyWriter
+from app.db.models import Batch, PreProcessingRecord
+from app.utils.compression import compress_payload, decompress_payload
+
+
+RLHF_SECTION = "rlhf"
+SFT_SECTION = "sft"
+# Section used for files whose top level is a bare array of records
+RECORDS_SECTION = "records"
+
+RECORD_COLUMNS = ("batch_id", "preprocessing_file_id", "section", "position", "task_url", "record_sha256", "payload")
+STREAM_BATCH_SIZE = 500
+# Image URL the converters write for an image missing from the S3 asset listing, e.g. after a failed copy
+UNRESOLVED_IMAGE = "/None"
+
+
+class ConversionInput(NamedTuple):
+    id: int
+    rlhf: dict
+    sft: Optional[dict]
+    sft_sha256: Optional[str]
+    # Conversion stored for an identical record of an earlier batch, if any
+    converted: Optional[dict]
+
+
+class RecordWriter(CopyWriter):
+    """Bulk-loads the records of one uploaded file into pre_processing_records"""
+
+    def __init__(self, batch_id, preprocessing_file_id, path: Optional[str] = None):
+        super().__init__(PreProcessingRecord.__table__, RECORD_COLUMNS, path=path)
+        self.batch_id = batch_id
+        self.preprocessing_file_id = preprocessing_file_id
+        self._positions = {}
+
+    def add(self, section: str, record: Any, task_url: Optional[str]) -> None:
+        position = self._positions.get(section, 0)
+        self._positions[section] = position + 1
+        # Canonical form, so the same record always hashes the same whatever its key order
+        content = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.write(
+            (
+                self.batch_id,
+                self.preprocessing_file_id,
+                section,
+                position,
+                task_url,
+                hashlib.sha256(content).hexdigest(),
+                compress_payload(content),
+            )
+        )
+
+
+def has_unresolved_images(converted: Any) -> bool:
+    """Whether a stored conversion points at an image that was not in S3 when it was converted"""
+    return f'{UNRESOLVED_IMAGE}"' in json.dumps(converted)
+
+
+def load_record(content: Any, payload: Optional[bytes]) -> Any:
+    """The record of a row, from its compressed payload or, for older rows, its content"""
+    if payload is not None:
+        return json.loads(decompress_payload(payload))
+    return content
+
+
+def _earlier_batch_record(record, batch: Batch):
+    """Conditions matching `record` to an identical record of an earlier batch of the same workstream and delivery date"""
+    earlier_batch = aliased(Batch)
+    return and_(
+        record.batch_id != batch.id,
+        record.record_sha256 == PreProcessingRecord.record_sha256,
+        record.section == PreProcessingRecord.section,
+        exists().where(
+            earlier_batch.id == record.batch_id,
+            earlier_batch.workstream == batch.workstream,
+            earlier_batch.delivery_date == batch.delivery_date,
+        ),
+    )
+
+
+def iter_section(
+    db: Session, batch_id, section: str, preprocessing_file_id: Optional[int] = None
+) -> Iterator[Any]:
+    """Stream the records of one section of a batch, in upload order, through a server-side cursor"""
+    query = db.query(PreProcessingRecord.content, PreProcessingRecord.payload).filter(
+        PreProcessingRecord.batch_id == batch_id,
+        PreProcessingRecord.section == section,
+    )
+    if preprocessing_file_id is not None:
+        query = query.filter(PreProcessingRecord.preprocessing_file_id == preprocessing_file_id)
+
+    query = query.order_by(PreProcessingRecord.preprocessing_file_id, PreProcessingRecord.position)
+    for row in query.yield_per(STREAM_BATCH_SIZE):
+        yield load_record(row.content, row.payload)
+
+
+def iter_conversion_inputs(db: Session, batch: Batch) -> Iterator[ConversionInput]:
+    """
+    Stream the rlhf records of a batch paired with the first sft entry of the same
+    file sharing their task url, or None when there is no match.
+
+    Only the fields of the sft entry the converters read are returned. When an earlier
+    batch of the same workstream and delivery date converted the same rlhf record with
+    the same sft entry, with all its images found, its stored conversion is returned alongside.
+    """
+    sft = aliased(PreProcessingRecord)
+    matching_sft = (
+        select(sft.id, sft.record_sha256, sft.content["humanUser"].label("human_user"), sft.payload)
+        .where(
+            sft.batch_id == PreProcessingRecord.batch_id,
+            sft.preprocessing_file_id == PreProcessingRecord.preprocessing_file_id,
+            sft.section == SFT_SECTION,
+            sft.task_url == PreProcessingRecord.task_url,
+        )
+        .order_by(sft.position)
+        .limit(1)
+        .lateral()
+    )
+    earlier = aliased(PreProcessingRecord)
+    earlier_conversion = (
+        select(earlier.converted)
+        .where(
+            _earlier_batch_record(earlier, batch),
+            earlier.sft_sha256 == matching_sft.c.record_sha256,
+            earlier.converted.isnot(None),
+            # Converted while one of its images was missing, so converted again now they may be there
+            ~cast(earlier.converted, Text).contains(f'{UNRESOLVED_IMAGE}"'),
+        )
+        .limit(1)
+        .lateral()
+    )
+    query = (
+        db.query(
+            PreProcessingRecord.id,
+            PreProcessingRecord.content,
+            PreProcessingRecord.payload,
+            PreProcessingRecord.task_url,
+            matching_sft.c.id.label("sft_id"),
+            matching_sft.c.record_sha256.label("sft_sha256"),
+            matching_sft.c.human_user,
+            matching_sft.c.payload.label("sft_payload"),
+            earlier_conversion.c.converted,
+        )
+        .select_from(PreProcessingRecord)
+        .outerjoin(matching_sft, true())
+        .outerjoin(earlier_conversion, true())
+        .filter(PreProcessingRecord.batch_id == batch.id, PreProcessingRecord.section == RLHF_SECTION)
+        .order_by(PreProcessingRecord.preprocessing_file_id, PreProcessingRecord.position)
+    )
+
+    for row in query.yield_per(STREAM_BATCH_SIZE):
+        sft_entry = None
+        if row.sft_id is not None:
+            sft_entry = {"colabLink": row.task_url}
+            human_user = row.human_user
+            if row.sft_payload is not None:
+                human_user = load_record(None, row.sft_payload).get("humanUser")
+            if human_user is not None:
+                sft_entry["humanUser"] = human_user
+        yield ConversionInput(row.id, load_record(row.content, row.payload), sft_entry, row.sft_sha256, row.converted)
+
+
+def _validation_entries_query(db: Session, batch_id, converted: bool):
+    """
+    Rows holding the entries a batch delivers: the stored conversions of its rlhf records
+    or, for `converted=False`, its bare records. Also returns the deliverable id expression.
+    """
+    if converted:
+        query = db.query(PreProcessingRecord.id, PreProcessingRecord.converted).filter(
+            PreProcessingRecord.section == RLHF_SECTION,
+            PreProcessingRecord.converted.isnot(None),
+        )
+        deliverable_id = PreProcessingRecord.converted["deliverable_id"].astext
+    else:
+        query = db.query(PreProcessingRecord.id, PreProcessingRecord.content, PreProcessingRecord.payload).filter(
+            PreProcessingRecord.section == RECORDS_SECTION
+        )
+        # get_task_url keys bare records by their deliverable_id
+        deliverable_id = PreProcessingRecord.task_url
+    return query.filter(PreProcessingRecord.batch_id == batch_id), deliverable_id
+
+
+def count_validation_entries(db: Session, batch_id, converted: bool) -> int:
+    query, _ = _validation_entries_query(db, batch_id, converted)
+    return query.count()
+
+
+def conversion_artifact(db: Session, batch_id) -> dict:
+    """
+    Handle to the conversions stored for a batch, passed between Celery tasks instead of
+    the converted entries themselves: the number of entries and an order-independent
+    checksum of their record ids and content, both computed by Postgres.
+    """
+    query, _ = _validation_entries_query(db, batch_id, converted=True)
+    entry_hash = func.hashtextextended(
+        cast(PreProcessingRecord.id, Text) + ":" + cast(PreProcessingRecord.converted, Text), 0
+    )
+    entries, checksum = query.with_entities(func.count(), func.sum(cast(entry_hash, Numeric))).one()
+    return {"batch_id": str(batch_id), "entries": entries, "checksum": str(checksum or 0)}
+
+
+def conversion_bytes(db: Session, batch_id) -> Tuple[int, int]:
+    """Stored size of the rlhf records of a batch, compressed, and of their conversions"""
+    record_bytes, converted_bytes = (
+        db.query(
+            func.sum(func.coalesce(func.octet_length(PreProcessingRecord.payload), func.pg_column_size(PreProcessingRecord.content))),
+            func.sum(func.pg_column_size(PreProcessingRecord.converted)),
+        )
+        .filter(PreProcessingRecord.batch_id == batch_id, PreProcessingRecord.section == RLHF_SECTION)
+        .one()
+    )
+    return record_bytes or 0, converted_bytes or 0
+
+
+def iter_validation_entries(
+    db: Session, batch_id, converted: bool, shard: int = 0, shards: int = 1, ids: Optional[Collection[int]] = None
+) -> Iterator[Tuple[int, dict]]:
+    """
+    Stream (record id, entry) for the entries of a batch in upload order. With `shards`,
+    only those whose deliverable id hashes to `shard`, so every copy of a deliverable id
+    lands in the same shard; with `ids`, only those records.
+    """
+    query, deliverable_id = _validation_entries_query(db, batch_id, converted)
+    if shards > 1:
+        # Masked to a non-negative int4; a missing deliverable id shards as an empty string
+        shard_hash = func.hashtext(func.coalesce(deliverable_id, "")).op("&")(0x7FFFFFFF)
+        query = query.filter(shard_hash % shards == shard)
+
+    query = query.order_by(PreProcessingRecord.preprocessing_file_id, PreProcessingRecord.position)
+    for row in query.yield_per(STREAM_BATCH_SIZE):
+        if ids is not None and row.id not in ids:
+            continue
+        yield row.id, (row.converted if converted else load_record(row.content, row.payload))
+
+
+def save_conversions(db: Session, conversions: List[dict]) -> None:
+    """Store {"id", "converted", "sft_sha256"} mappings on their rlhf records; the caller commits"""
+    if conversions:
+        db.bulk_update_mappings(PreProcessingRecord, conversions)
+
+
+def reuse_copied_images(db: Session, batch: Batch, preprocessing_file_id: int, bucket: str) -> int:
+    """
+    Mark the rlhf records of a file whose images an earlier batch of the same workstream
+    and delivery date already copied to `bucket`; returns the number of records marked.
+    """
+    earlier = aliased(PreProcessingRecord)
+    statement = (
+        update(PreProcessingRecord)
+        .where(
+            PreProcessingRecord.batch_id == batch.id,
+            PreProcessingRecord.preprocessing_file_id == preprocessing_file_id,
+            PreProcessingRecord.section == RLHF_SECTION,
+            exists().where(_earlier_batch_record(earlier, batch), earlier.image_bucket == bucket),
+        )
+        .values(image_bucket=bucket)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(statement).rowcount
+
+
+def _pending_images_query(db: Session, batch_id, preprocessing_file_id: int):
+    return db.query(PreProcessingRecord.id, PreProcessingRecord.content, PreProcessingRecord.payload).filter(
+        PreProcessingRecord.batch_id == batch_id,
+        PreProcessingRecord.preprocessing_file_id == preprocessing_file_id,
+        PreProcessingRecord.section == RLHF_SECTION,
+        PreProcessingRecord.image_bucket.is_(None),
+    )
+
+
+def count_pending_images(db: Session, batch_id, preprocessing_file_id: int) -> int:
+    """Number of rlhf records of a file whose images have not been copied"""
+    return _pending_images_query(db, batch_id, preprocessing_file_id).count()
+
+
+def iter_pending_images(db: Session, batch_id, preprocessing_file_id: int) -> Iterator[Tuple[int, dict]]:
+    """Stream (record id, record) for the rlhf records of a file whose images have not been copied"""
+    query = _pending_images_query(db, batch_id, preprocessing_file_id).order_by(PreProcessingRecord.position)
+    for row in query.yield_per(STREAM_BATCH_SIZE):
+        yield row.id, load_record(row.content, row.payload)
+
+
+def mark_images_copied(db: Session, record_ids: Iterable[int], bucket: str) -> None:
+    """Record the bucket the images of the given records were copied to; the caller commits"""
+    record_ids = list(record_ids)
+    for start in range(0, len(record_ids), STREAM_BATCH_SIZE):
+        db.execute(
+            update(PreProcessingRecord)
+            .where(PreProcessingRecord.id.in_(record_ids[start : start + STREAM_BATCH_SIZE]))
+            .values(image_bucket=bucket)
+            .execution_options(synchronize_session=False)
+        )
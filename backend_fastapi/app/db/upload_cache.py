@@ -0,0 +1,83 @@
+from typing import Optional
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+from app.db.enums import StatusEnum
+from app.db.models import Batch, ConfigOption, DeliveredId, DeliveryJson, PreProcessingFile, ValidationError
+
+
+def _file_hashes(db: Session, batch_id) -> list:
+    return sorted(
+        content_sha256
+        for (content_sha256,) in db.query(PreProcessingFile.content_sha256).filter(PreProcessingFile.batch_id == batch_id)
+    )
+
+
+def _has_delivered_ids(db: Session, batch_id) -> bool:
+    """Whether any deliverable of the batch has been delivered since, which the validation would now reject"""
+    config_option = db.query(ConfigOption).filter_by(name="delivered_id_check").first()
+    if config_option and not config_option.value:
+        return False
+
+    deliverable_ids = select(func.jsonb_array_elements(DeliveryJson.content).op("->>")("deliverable_id")).where(
+        DeliveryJson.batch_id == batch_id
+    )
+    return db.query(DeliveredId.id).filter(DeliveredId.deliverable_id.in_(deliverable_ids)).first() is not None
+
+
+def find_identical_batch(db: Session, batch: Batch) -> Optional[Batch]:
+    """
+    Latest completed batch of the same workstream, delivery date and client built from
+    byte-identical uploads, or None.
+    """
+    hashes = _file_hashes(db, batch.id)
+    if not hashes or None in hashes:
+        return None
+
+    candidates = (
+        db.query(Batch)
+        .join(PreProcessingFile, PreProcessingFile.batch_id == Batch.id)
+        .filter(
+            Batch.id != batch.id,
+            Batch.workstream == batch.workstream,
+            Batch.delivery_date == batch.delivery_date,
+            Batch.client == batch.client,
+            Batch.status == StatusEnum.COMPLETED,
+            PreProcessingFile.content_sha256 == hashes[0],
+        )
+        .order_by(Batch.created_at.desc())
+        .all()
+    )
+    for candidate in candidates:
+        if _file_hashes(db, candidate.id) == hashes and not _has_delivered_ids(db, candidate.id):
+            return candidate
+    return None
+
+
+def copy_batch_results(db: Session, source: Batch, batch: Batch) -> None:
+    """Complete `batch` with the delivery, stats and validation errors of `source`"""
+    db.execute(
+        insert(DeliveryJson).from_select(
+            ["content", "batch_id"],
+            select(DeliveryJson.content, literal(batch.id, DeliveryJson.batch_id.type)).where(
+                DeliveryJson.batch_id == source.id
+            ),
+        )
+    )
+    db.execute(
+        insert(ValidationError).from_select(
+            ["batch_id", "type", "delivery_id", "error_message", "link", "created_at", "updated_at"],
+            select(
+                literal(batch.id, ValidationError.batch_id.type),
+                ValidationError.type,
+                ValidationError.delivery_id,
+                ValidationError.error_message,
+                ValidationError.link,
+                func.now(),
+                func.now(),
+            ).where(ValidationError.batch_id == source.id),
+        )
+    )
+    batch.stats = source.stats
+    batch.has_validation_error = source.has_validation_error
+    batch.status = StatusEnum.COMPLETED
+    db.commit()
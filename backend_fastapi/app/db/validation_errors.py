@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Any, Optional
+from app.db.bulk import CopyWriter
+from app.db.enums import ValidationErrorTypeEnum
+from app.db.models import ValidationError
+
+
+VALIDATION_ERROR_COLUMNS = ("batch_id", "type", "delivery_id", "error_message", "link", "created_at", "updated_at")
+
+
+class ValidationErrorWriter(CopyWriter):
+    """
+    Bulk-loads the validation errors of a batch into validation_errors, for validations
+    that can report thousands of them. Rows are spooled, so memory stays flat whatever
+    their number; copy() loads them in one COPY and the caller commits.
+    """
+
+    def __init__(self, batch_id):
+        super().__init__(ValidationError.__table__, VALIDATION_ERROR_COLUMNS)
+        self.batch_id = batch_id
+        # Set here as COPY bypasses the ORM defaults of TimeStampMixin
+        self.created_at = datetime.now()
+
+    def add(
+        self,
+        error_type: ValidationErrorTypeEnum,
+        error_message: Any,
+        delivery_id: Any = None,
+        link: Optional[str] = None,
+    ) -> None:
+        self.write(
+            (
+                self.batch_id,
+                # The column stores enum names, like the ORM does
+                error_type.name,
+                str(delivery_id) if delivery_id is not None else None,
+                str(error_message),
+                link,
+                self.created_at,
+                self.created_at,
+            )
+        )
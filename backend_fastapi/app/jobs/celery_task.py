@@ -1,19 +1,39 @@
-from uuid import UUID
-import hashlib
-import boto3
+import time
 from celery import Celery
 from celery.schedules import crontab
 import os
-from app.core.s3_client import S3Client
+from typing import Optional, Tuple
 from app.db.enums import StatusEnum, ValidationErrorTypeEnum
-from app.db.redis_client import redis_client
-from app.service.delivery_validation.parse_json_data import process_json_data
 from app.service.json_conversion.image_processor_image_eval import ImageProcessorImageEval
 from app.service.json_conversion.image_processor_rlhf_vison import ImageProcessor
-from app.db.models import Batch, ConfigOption, DeliveryJson, PreProcessingFile, PreProcessingFileJson, ValidationError
+from app.db.models import Batch, DeliveryJson, ValidationError
+from app.db.records import (
+    STREAM_BATCH_SIZE,
+    conversion_artifact,
+    conversion_bytes,
+    count_pending_images,
+    has_unresolved_images,
+    iter_conversion_inputs,
+    iter_pending_images,
+    mark_images_copied,
+    reuse_copied_images,
+    save_conversions,
+)
+from app.db.image_transfers import ImageTransferWriter
+from app.db.checkpoints import (
+    CONVERSION_STAGE,
+    NOT_COMPLETED,
+    VALIDATION_SHARD_STAGE,
+    clear_checkpoints,
+    get_checkpoint,
+    image_copy_stage,
+    mark_completed,
+)
+from app.db.validation_errors import ValidationErrorWriter
+from app.jobs.stage_metrics import record_stage
 from app.service.json_conversion import convert_rlhf_vision, convert_image_eval
+from app.service.json_conversion.image_transfer import transfer_summary
 from app.service.delivery_validation.validation import Validator
-from app.service.delivery_validation.enums import TaskType, ValidationType
 from app.service.json_conversion.rlhf_text import RLHFTextJSONProcessor
 from app.service.json_conversion.sft_reasoning import (
     authenticate_drive,
@@ -22,21 +42,19 @@ from app.service.json_conversion.sft_reasoning import (
     extract_file_id,
     process_file_content,
 )
-from .handler import process_s3file_job
+from .serialization import SERIALIZER_NAME, register_payload_serializer
 from sqlalchemy.orm import Session
-from app.db.database import SessionLocal, get_db
+from app.db.database import SessionLocal
 import json
 from app.config import settings
 import logging
 from .log_cleanup import cleanup_old_logs
+from app.utils.resumable_upload import cleanup_expired_uploads
 import re
 import traceback
 from app.db.enums import ClientEnum
 
 
-s3 = S3Client()
-
-
 redis_host = os.getenv("REDIS_HOST", "localhost")
 redis_port = os.getenv("REDIS_PORT", "6379")
 
@@ -49,78 +67,156 @@ celery_app = Celery(
     "worker",
     broker=f"redis://{redis_host}:{redis_port}/0",
     backend=f"redis://{redis_host}:{redis_port}/0",
+    include=["app.jobs.ingest", "app.jobs.validation"],
 )
 
 # Enable retry on startup to retain the old behavior
 celery_app.conf.update(broker_connection_retry_on_startup=True)
 
+# JSON stays accepted so messages published before a serializer change are still consumed
+register_payload_serializer()
+celery_app.conf.update(
+    task_serializer=settings.CELERY_SERIALIZER,
+    result_serializer=settings.CELERY_SERIALIZER,
+    accept_content=["json", SERIALIZER_NAME],
+    result_accept_content=["json", SERIALIZER_NAME],
+)
+
+# Image copies and Drive downloads mostly wait on the network, so they get their own queue
+# and a wide thread pool instead of holding prefork slots that conversions and validations need
+celery_app.conf.update(
+    task_default_queue=settings.CELERY_CPU_QUEUE,
+    task_routes={name: {"queue": settings.CELERY_IO_QUEUE} for name in settings.CELERY_IO_TASKS},
+)
+
 celery_app.conf.timezone = "UTC"
 celery_app.conf.beat_schedule = {
     "cleanup-logs-daily": {
         "task": "app.cleanup_old_logs_task",
         "schedule": crontab(hour=0, minute=0),
     },
+    "cleanup-expired-uploads-hourly": {
+        "task": "app.cleanup_expired_uploads_task",
+        "schedule": crontab(minute=30),
+    },
 }
 
 
-@celery_app.task()
-def worker():
-    logger.info("Worker started")
-    data = redis_client.rpop("update_s3file_webhooks")
-
-    if data:
-        logger.info("Job data retrieved from Redis: %s", data)
-        job = json.loads(data)
-
-        # Use a session context manager to handle the DB session
-        db: Session = next(get_db())  # Create a new database session
-        try:
-            logger.info("Processing job: %s", job)
-            process_s3file_job(job, db)  # Implement this function based on your logic
-            logger.info("Job processed successfully: %s", job)
-        except Exception as e:
-            logger.error("Error processing job: %s", e)
-    else:
-        logger.info("No job data found in Redis")
-
-    logger.info("Worker finished processing")
-
-
-@celery_app.task()
-def process_images_task(json_data, s3_folder, batch_id):
-    try:
-        db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        logger.info("Image Processing Started S3 folder: %s", s3_folder)
-        processor = ImageProcessor(json_data, s3_folder)
-        processor.process_all_items()
-        return "Image Processing Completed"
-    except Exception as e:
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.TASK_PROCESSING,
-            error_message=f"Error in task processing: {str(e)}",
+def convert_batch_records(db: Session, batch: Batch, processor) -> int:
+    """
+    Convert the rlhf records of a batch with `processor`, reusing the conversions stored
+    for identical records of earlier batches whose images were all found, and store the
+    result on each record.
+    Returns the number of records converted.
+    """
+    converted_count = 0
+    conversions = []
+    for item in iter_conversion_inputs(db, batch):
+        converted = item.converted
+        if converted is None or has_unresolved_images(converted):
+            converted = processor.process_record(item.rlhf, item.sft)
+        if converted is None:
+            continue
+
+        converted_count += 1
+        conversions.append({"id": item.id, "converted": converted, "sft_sha256": item.sft_sha256})
+        if len(conversions) >= STREAM_BATCH_SIZE:
+            save_conversions(db, conversions)
+            conversions = []
+
+    save_conversions(db, conversions)
+    db.commit()
+    return converted_count
+
+
+def copy_batch_images(db: Session, batch: Batch, preprocessing_file_id, processor) -> Tuple[int, int, dict]:
+    """
+    Copy the images of a file's rlhf records, skipping those an earlier batch already
+    copied; returns the number of records reused and copied, and the transfer_summary of the
+    image copies, whose results are stored in image_transfers. The file's image copy is
+    checkpointed once every record has its images, and skipped when resumed after that.
+    Records getting images invalidate an earlier conversion of the batch.
+    """
+    checkpoint_stage = image_copy_stage(preprocessing_file_id)
+    if get_checkpoint(db, batch.id, checkpoint_stage) is not NOT_COMPLETED:
+        return 0, 0, {}
+
+    reused = reuse_copied_images(db, batch, preprocessing_file_id, processor.s3_bucket)
+    db.commit()
+    if reused:
+        logger.info("Reusing images of %s records already copied to %s", reused, processor.s3_bucket)
+
+    started = time.monotonic()
+    copied = processor.process_records(iter_pending_images(db, batch.id, preprocessing_file_id))
+    transfers = transfer_summary(processor.results, time.monotonic() - started)
+    if transfers["failed"]:
+        logger.warning(
+            "%s of %s image copies failed for batch %s", transfers["failed"], transfers["images"], batch.id
         )
-        db.add(validation_error)
-        db.commit()
-        logger.error(f"Error in process_images_task: {str(e)}")
-        return
-    finally:
-        db.close()
 
+    with ImageTransferWriter(batch.id, preprocessing_file_id) as writer:
+        for result in processor.results:
+            writer.add(result)
+        writer.copy(db)
+    mark_images_copied(db, copied, processor.s3_bucket)
+    if reused or copied:
+        invalidate_conversion(db, batch)
+    if not count_pending_images(db, batch.id, preprocessing_file_id):
+        mark_completed(db, batch.id, checkpoint_stage)
+    db.commit()
+    return reused, len(copied), transfers
+
+
+def invalidate_conversion(db: Session, batch: Batch) -> None:
+    """
+    Drop the checkpointed conversion of a batch and the validation of it, as records got
+    images a conversion made before could not link to; the caller commits
+    """
+    clear_checkpoints(db, batch.id, CONVERSION_STAGE)
+    clear_checkpoints(db, batch.id, VALIDATION_SHARD_STAGE)
+    db.query(ValidationError).filter(
+        ValidationError.batch_id == batch.id, ValidationError.type.in_(VALIDATION_ISSUE_TYPES)
+    ).delete(synchronize_session=False)
+    batch.has_validation_error = (
+        db.query(ValidationError.id).filter(ValidationError.batch_id == batch.id).first() is not None
+    )
+
+
+def completed_conversion(db: Session, batch: Batch) -> Optional[dict]:
+    """
+    The conversion_artifact checkpointed by an earlier run of the batch's conversion, when
+    the stored conversions still match it; None when the batch must be converted again
+    """
+    artifact = get_checkpoint(db, batch.id, CONVERSION_STAGE)
+    if artifact is NOT_COMPLETED or artifact != conversion_artifact(db, batch.id):
+        return None
+    return artifact
+
+
+def checkpoint_conversion(db: Session, batch: Batch) -> dict:
+    """Checkpoint the batch's conversion and return its conversion_artifact for the validation step"""
+    artifact = conversion_artifact(db, batch.id)
+    mark_completed(db, batch.id, CONVERSION_STAGE, artifact)
+    db.commit()
+    return artifact
+
+
+def start_validation(batch_id, artifact: dict = None) -> str:
+    """
+    Hand a batch to the sharded validation stage of app.jobs.validation; `artifact` is the
+    conversion_artifact returned by the conversion step, if any
+    """
+    # Imported here: app.jobs.validation registers its tasks on celery_app from this module
+    from .validation import start_sharded_validation
 
-@celery_app.task()
-def process_images_task_image_eval(json_data, s3_folder, batch_id):
     try:
         db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        logger.info("Image Processing Started S3 folder: %s", s3_folder)
-        processor = ImageProcessorImageEval(json_data, s3_folder)
-        processor.process_all_items()
-        return "Image Processing Completed"
+        if start_sharded_validation(batch_id, artifact) is None:
+            return f"No data for Validations for batch {batch_id}"
+        return f"Validations Started for batch {batch_id}"
     except Exception as e:
+        logger.error(f"Validation failed: {str(e)}")
+        batch = db.query(Batch).filter(Batch.id == batch_id).one()
         batch.status = StatusEnum.FAILED
         batch.has_validation_error = True
         validation_error = ValidationError(
@@ -130,342 +226,192 @@ def process_images_task_image_eval(json_data, s3_folder, batch_id):
         )
         db.add(validation_error)
         db.commit()
-        logger.error(f"Error in process_images_task: {str(e)}")
-        return
     finally:
         db.close()
 
 
 @celery_app.task()
-def convert_to_apple_format_rlhf_vision(prev_result, batch_id):
-    try:
-        db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        folder_date = batch.delivery_date.strftime("%Y%m%d")
-        s3_prefix = f"s3://og82-drop-turing-deputy/2410-rlhf-vision/assets/{folder_date}"
-        images_folder = f"2410-rlhf-vision/assets/{folder_date}/"
-
-        processor = convert_rlhf_vision.JSONProcessor(s3_prefix, images_folder)
-        results = (
-            db.query(PreProcessingFileJson.content)
-            .join(
-                PreProcessingFile,
-                PreProcessingFile.id == PreProcessingFileJson.preprocessing_file_id,
+def process_images_task(preprocessing_file_id, s3_folder, batch_id):
+    with record_stage(batch_id, "image_copy") as stage:
+        try:
+            db = SessionLocal()
+            batch = db.query(Batch).filter(Batch.id == batch_id).one()
+            logger.info("Image Processing Started S3 folder: %s", s3_folder)
+            processor = ImageProcessor(s3_folder, db)
+            reused, copied, transfers = copy_batch_images(db, batch, preprocessing_file_id, processor)
+            stage.records = copied
+            stage.bytes_out = transfers.get("bytes")
+            stage.details.update(
+                preprocessing_file_id=preprocessing_file_id,
+                reused=reused,
+                existing_objects=len(processor.existing),
+                transfers=transfers,
             )
-            .filter(PreProcessingFile.batch_id == batch_id)
-            .all()
-        )
-        input_array = [json.loads(result.content) for result in results]
-        apple_json = processor.process_file(input_array)
-        if not apple_json:
+            return "Image Processing Completed"
+        except Exception as e:
+            stage.fail()
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
             validation_error = ValidationError(
                 batch_id=batch.id,
-                type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data generated in Apple format conversion; check JSON and its formatting.",
+                type=ValidationErrorTypeEnum.TASK_PROCESSING,
+                error_message=f"Error in task processing: {str(e)}",
             )
             db.add(validation_error)
             db.commit()
+            logger.error(f"Error in process_images_task: {str(e)}")
             return
-        return apple_json
-    except Exception as e:
-        logger.error(f"Error in convert_to_apple_format: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.JSON_FORMATTING,
-            error_message=f"Error in JSON formatting: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-        return
-    finally:
-        db.close()
+        finally:
+            db.close()
 
 
 @celery_app.task()
-def validations_rlhf_vision(prev_result, batch_id):
-    try:
-        db = SessionLocal()
-        if not prev_result:
-            return f"No data for Validations for batch {batch_id}"
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        assets = []
-        folder_date = batch.delivery_date.strftime("%Y%m%d")
-        images_folder = f"2410-rlhf-vision/assets/{folder_date}/"
-        apple_upload = db.query(ConfigOption).filter_by(name="enable_penguin_s3_upload").first()
-        apple_upload_value = apple_upload.value if apple_upload else False
-
-        if apple_upload_value:
-            s3._refresh_if_credentials_expired()
-            s3_client = s3.s3_client
-            aws_bucket_name = settings.AWS_BUCKET_NAME
-        else:
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=settings.DEV_AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.DEV_AWS_SECRET_ACCESS_KEY,
-            )
-            aws_bucket_name = settings.DEV_AWS_BUCKET_NAME
-
-        paginator = s3_client.get_paginator("list_objects_v2")
-        pages = paginator.paginate(Bucket=aws_bucket_name, Prefix=images_folder)
-        for page in pages:
-            if "Contents" not in page:
-                logger.error(f"No contents found in S3 folder: {images_folder}")
-                continue
-            for obj in page["Contents"]:
-                image = obj["Key"].split("/")[-1]
-                assets.append(image)
-
-        assets_path = f"s3://og82-drop-turing-deputy/2410-rlhf-vision/assets/{folder_date}/"
-        validator1 = Validator(prev_result, assets, assets_path)
-        dedup_result = validator1.deduplicate()
-        unique_data = dedup_result["data"]
-
-        validation_error_records = []
-
-        if dedup_result["errors"]:
-            for error in dedup_result["errors"]:
-                deliverable_id = UUID(error["deliverableId"])
-                messages = error["message"]
-                for message in messages:
-                    validation_error = ValidationError(
-                        batch_id=batch_id,
-                        delivery_id=deliverable_id,
-                        error_message=message,
-                        type=ValidationErrorTypeEnum.DUPLICATION,
-                    )
-                    validation_error_records.append(validation_error)
-
-        validator2 = Validator(unique_data, assets, assets_path)
-        errors = validator2.validate(TaskType.RLHF_IMAGE, ValidationType.SCHEMA)
-
-        error_delivery_ids = {error["deliverableId"] for error in errors}
-        filtered_data = [entry for entry in unique_data if entry["deliverable_id"] not in error_delivery_ids]
-
-        for error in errors:
-            deliverable_id = UUID(error["deliverableId"])
-            messages = error["message"]
-            for message in messages:
-                validation_error = ValidationError(
-                    batch_id=batch_id,
-                    delivery_id=deliverable_id,
-                    error_message=message,
-                    type=ValidationErrorTypeEnum.SCHEMA,
-                )
-                validation_error_records.append(validation_error)
-
-        validator3 = Validator(filtered_data, assets, assets_path)
-        s3_link_errors = validator3.validate(TaskType.RLHF_IMAGE, ValidationType.S3_LINK)
-
-        for error in s3_link_errors:
-            deliverable_id = UUID(error["deliverable_id"])
-            message = error["message"]
-            validation_error = ValidationError(
-                batch_id=batch_id,
-                delivery_id=deliverable_id,
-                error_message=message,
-                type=ValidationErrorTypeEnum.S3_LINK,
-            )
-            validation_error_records.append(validation_error)
-
-        s3_link_error_delivery_ids = {error["deliverable_id"] for error in s3_link_errors}
-        filtered_data2 = [
-            entry for entry in filtered_data if entry["deliverable_id"] not in s3_link_error_delivery_ids
-        ]
-
-        validator = Validator(filtered_data2, assets, "assets_path")
-        penguin_format_errors = validator.penguin_format_validate()
-        for error in penguin_format_errors:
-            deliverable_id = error["deliverableId"]
-            messages = error["message"]
-            for message in messages:
-                validation_error = ValidationError(
-                    batch_id=batch_id,
-                    delivery_id=deliverable_id,
-                    error_message=message,
-                    type=ValidationErrorTypeEnum.PENGUIN_FORMATTING,
-                )
-                validation_error_records.append(validation_error)
-
-        penguin_error_del_ids = {error["deliverableId"] for error in penguin_format_errors}
-        filtered_data2 = [entry for entry in filtered_data2 if entry["deliverable_id"] not in penguin_error_del_ids]
-
-        if validation_error_records:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.has_validation_error = True
-            db.add_all(validation_error_records)
-            db.commit()
-
-        if filtered_data2:
+def process_images_task_image_eval(preprocessing_file_id, s3_folder, batch_id):
+    with record_stage(batch_id, "image_copy") as stage:
+        try:
+            db = SessionLocal()
             batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.status = StatusEnum.COMPLETED
-            delivery = DeliveryJson(content=filtered_data2, batch_id=batch_id)
-            file_stats = process_json_data(filtered_data2, "rlhf-vision")
-            batch.stats = file_stats
-            db.add(delivery)
-            db.commit()
-        else:
+            logger.info("Image Processing Started S3 folder: %s", s3_folder)
+            processor = ImageProcessorImageEval(s3_folder)
+            reused, copied, transfers = copy_batch_images(db, batch, preprocessing_file_id, processor)
+            stage.records = copied
+            stage.bytes_out = transfers.get("bytes")
+            stage.details.update(
+                preprocessing_file_id=preprocessing_file_id,
+                reused=reused,
+                existing_objects=len(processor.existing),
+                transfers=transfers,
+            )
+            return "Image Processing Completed"
+        except Exception as e:
+            stage.fail()
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
             validation_error = ValidationError(
                 batch_id=batch.id,
-                type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data after validation",
+                type=ValidationErrorTypeEnum.TASK_PROCESSING,
+                error_message=f"Error in task processing: {str(e)}",
             )
             db.add(validation_error)
             db.commit()
-    except Exception as e:
-        logger.error(f"Validation failed: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.TASK_PROCESSING,
-            error_message=f"Error in task processing: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-    finally:
-        db.close()
-
-    return f"Validations Completed for batch {batch_id}"
+            logger.error(f"Error in process_images_task: {str(e)}")
+            return
+        finally:
+            db.close()
 
 
 @celery_app.task()
-def convert_to_apple_format_image_eval(prev_result, batch_id):
-    try:
-        db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        folder_date = batch.delivery_date.strftime("%Y%m%d")
-        s3_prefix = f"s3://og82-drop-turing-deputy/2410-eval-results/assets/{folder_date}"
-        images_folder = f"2410-eval-results/assets/{folder_date}/"
-
-        processor = convert_image_eval.JSONProcessor(s3_prefix, images_folder)
-        results = (
-            db.query(PreProcessingFileJson.content)
-            .join(
-                PreProcessingFile,
-                PreProcessingFile.id == PreProcessingFileJson.preprocessing_file_id,
-            )
-            .filter(PreProcessingFile.batch_id == batch_id)
-            .all()
-        )
-        input_array = [json.loads(result.content) for result in results]
-        apple_json = processor.process_file(input_array)
-        if not apple_json:
+def convert_to_apple_format_rlhf_vision(prev_result, batch_id):
+    with record_stage(batch_id, "conversion") as stage:
+        try:
+            db = SessionLocal()
+            batch = db.query(Batch).filter(Batch.id == batch_id).one()
+            # A resumed batch skips the conversion, and the S3 listing of the processor with it
+            artifact = completed_conversion(db, batch)
+            if artifact is not None:
+                stage.details["resumed"] = True
+                return artifact
+
+            folder_date = batch.delivery_date.strftime("%Y%m%d")
+            s3_prefix = f"s3://og82-drop-turing-deputy/2410-rlhf-vision/assets/{folder_date}"
+            images_folder = f"2410-rlhf-vision/assets/{folder_date}/"
+
+            processor = convert_rlhf_vision.JSONProcessor(s3_prefix, images_folder)
+
+            stage.records = convert_batch_records(db, batch, processor)
+            stage.bytes_in, stage.bytes_out = conversion_bytes(db, batch.id)
+            if not stage.records:
+                stage.fail()
+                batch.status = StatusEnum.FAILED
+                batch.has_validation_error = True
+                validation_error = ValidationError(
+                    batch_id=batch.id,
+                    type=ValidationErrorTypeEnum.JSON_FORMATTING,
+                    error_message="No data generated in Apple format conversion; check JSON and its formatting.",
+                )
+                db.add(validation_error)
+                db.commit()
+                return
+            return checkpoint_conversion(db, batch)
+        except Exception as e:
+            stage.fail()
+            logger.error(f"Error in convert_to_apple_format: {str(e)}")
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
             validation_error = ValidationError(
                 batch_id=batch.id,
                 type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data generated in Apple format conversion; check JSON and its formatting.",
+                error_message=f"Error in JSON formatting: {str(e)}",
             )
             db.add(validation_error)
             db.commit()
             return
-        return apple_json
-    except Exception as e:
-        logger.error(f"Error in convert_to_apple_format: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.JSON_FORMATTING,
-            error_message=f"Error in JSON formatting: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-        return
-    finally:
-        db.close()
+        finally:
+            db.close()
 
 
 @celery_app.task()
-def validations_image_eval(prev_result, batch_id):
-    try:
-        db = SessionLocal()
-        if not prev_result:
-            return f"No data for Validations for batch {batch_id}"
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        assets = []
-        images_folder = "2410-eval-results/assets/20241112/"
-        s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=settings.DEV_AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.DEV_AWS_SECRET_ACCESS_KEY,
-        )
-        paginator = s3_client.get_paginator("list_objects_v2")
-        pages = paginator.paginate(Bucket=settings.DEV_AWS_BUCKET_NAME, Prefix=images_folder)
-        for page in pages:
-            if "Contents" not in page:
-                print("content is not there")
-                continue
-            for obj in page["Contents"]:
-                image = obj["Key"].split("/")[-1]
-                assets.append(image)
-
-        validator1 = Validator(prev_result, assets, images_folder)
-        dedup_result = validator1.deduplicate()
-        unique_data = dedup_result["data"]
-
-        validation_error_records = []
-
-        if dedup_result["errors"]:
-            for error in dedup_result["errors"]:
-                deliverable_id = UUID(error["deliverableId"])
-                messages = error["message"]
-                for message in messages:
-                    validation_error = ValidationError(
-                        batch_id=batch_id,
-                        delivery_id=deliverable_id,
-                        error_message=message,
-                        type=ValidationErrorTypeEnum.DUPLICATION,
-                    )
-                    validation_error_records.append(validation_error)
-
-        if validation_error_records:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.has_validation_error = True
-            db.add_all(validation_error_records)
-            db.commit()
+def validations_rlhf_vision(prev_result, batch_id):
+    if not prev_result:
+        return f"No data for Validations for batch {batch_id}"
+    return start_validation(batch_id, prev_result)
 
-        # error_delivery_ids = {error["deliverableId"] for error in errors}
-        # filtered_data = [entry for entry in unique_data if entry["deliverable_id"] not in error_delivery_ids]
-        if unique_data:
+
+@celery_app.task()
+def convert_to_apple_format_image_eval(prev_result, batch_id):
+    with record_stage(batch_id, "conversion") as stage:
+        try:
+            db = SessionLocal()
             batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.status = StatusEnum.COMPLETED
-            delivery = DeliveryJson(content=unique_data, batch_id=batch_id)
-            db.add(delivery)
-            db.commit()
-        else:
+            # A resumed batch skips the conversion, and the S3 listing of the processor with it
+            artifact = completed_conversion(db, batch)
+            if artifact is not None:
+                stage.details["resumed"] = True
+                return artifact
+
+            folder_date = batch.delivery_date.strftime("%Y%m%d")
+            s3_prefix = f"s3://og82-drop-turing-deputy/2410-eval-results/assets/{folder_date}"
+            images_folder = f"2410-eval-results/assets/{folder_date}/"
+
+            processor = convert_image_eval.JSONProcessor(s3_prefix, images_folder)
+
+            stage.records = convert_batch_records(db, batch, processor)
+            stage.bytes_in, stage.bytes_out = conversion_bytes(db, batch.id)
+            if not stage.records:
+                stage.fail()
+                batch.status = StatusEnum.FAILED
+                batch.has_validation_error = True
+                validation_error = ValidationError(
+                    batch_id=batch.id,
+                    type=ValidationErrorTypeEnum.JSON_FORMATTING,
+                    error_message="No data generated in Apple format conversion; check JSON and its formatting.",
+                )
+                db.add(validation_error)
+                db.commit()
+                return
+            return checkpoint_conversion(db, batch)
+        except Exception as e:
+            stage.fail()
+            logger.error(f"Error in convert_to_apple_format: {str(e)}")
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
             validation_error = ValidationError(
                 batch_id=batch.id,
                 type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data after validation",
+                error_message=f"Error in JSON formatting: {str(e)}",
             )
             db.add(validation_error)
             db.commit()
-    except Exception as e:
-        logger.error(f"Validation failed: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.TASK_PROCESSING,
-            error_message=f"Error in task processing: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-    finally:
-        db.close()
+            return
+        finally:
+            db.close()
+
 
-    return f"Validations Completed for batch {batch_id}"
+@celery_app.task()
+def validations_image_eval(prev_result, batch_id):
+    if not prev_result:
+        return f"No data for Validations for batch {batch_id}"
+    return start_validation(batch_id, prev_result)
 
 
 @celery_app.task(name="app.cleanup_old_logs_task")
@@ -473,366 +419,189 @@ def cleanup_old_logs_task():
     cleanup_old_logs()
 
 
+@celery_app.task(name="app.cleanup_expired_uploads_task")
+def cleanup_expired_uploads_task():
+    removed = cleanup_expired_uploads()
+    logger.info("Removed %s expired resumable uploads", removed)
+
+
 @celery_app.task()
 def process_colab_link(links, ids, batch_id, client):
-    try:
-        db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        drive_service = authenticate_drive()
-
-        output_array = []
-        error_array = []
-
-        for idx, link in enumerate(links):
-            try:
-                print("idx", idx)
-                file_id = extract_file_id(link)
-                ipynb_content = download_ipynb(drive_service, file_id)
-                py_content = convert_ipynb_to_py(ipynb_content)
-
-                # Determine category and patterns
-                category_match = re.search(r"(?i)\*\*Category\:\*\*\s*-\s*([^\n]*)", py_content)
-                category = category_match.group(1).strip() if category_match else "General"
-
-                type = "General"
-                if category.lower() == "agent":
-                    type = "Agent"
-                elif category.lower() == "coding":
-                    if re.search(r"(?i)\*\*\[CHAIN", py_content) and re.search(r"(?i)\*\*\[THOUGHT", py_content):
-                        type = "Coding"
-
-                json_data = process_file_content(type, py_content, ids[idx], client, file_id)
-                output_array.append(json_data)
-            except Exception as e:
-                logger.error("colab file: " + link + " error trace: " + traceback.format_exc())
-                error_array.append({"link": link, "message": str(e)})
-
-        validation_error_records = []
-
-        for error in error_array:
-            link = error["link"]
-            message = error["message"]
-            validation_error = ValidationError(
-                batch_id=batch_id,
-                link=link,
-                error_message=message,
-                type=ValidationErrorTypeEnum.SCHEMA,
-            )
-            validation_error_records.append(validation_error)
-
-        # if duplicate_links:
-        #     validation_error = ValidationError(
-        #         batch_id=batch_id,
-        #         link=', '.join(duplicate_links),
-        #         error_message=f"The following links are duplicated in the CSV: {', '.join(duplicate_links)}",
-        #         type=ValidationErrorTypeEnum.DUPLICATION,
-        #     )
-        #     validation_error_records.append(validation_error)
-        # with open("output_array.json", "w") as file:
-        #     json.dump(output_array, file, indent=4)
-        assets = []
-        validator = Validator(output_array, assets, "assets_path")
-        dedup_result = validator.deduplicate()
-        unique_data = dedup_result["data"]
-        with open("output1.json", "w") as file:
-            json.dump(unique_data, file, indent=4)
-
-        if dedup_result["errors"]:
-            for error in dedup_result["errors"]:
-                deliverable_id = error["deliverableId"]
-                messages = error["message"]
-                for message in messages:
-                    validation_error = ValidationError(
-                        batch_id=batch_id,
-                        delivery_id=deliverable_id,
-                        error_message=message,
-                        type=ValidationErrorTypeEnum.DUPLICATION,
-                    )
-                    validation_error_records.append(validation_error)
-
-        if client == ClientEnum.PENGUIN.value:
-            validator = Validator(unique_data, assets, "assets_path")
-            schema_errors = validator.penguin_format_validate()
-            if len(schema_errors) > 0:
-                for error in schema_errors:
-                    deliverable_id = error["deliverableId"]
-                    messages = error["message"]
-                    for message in messages:
-                        validation_error = ValidationError(
-                            batch_id=batch_id,
-                            delivery_id=deliverable_id,
-                            error_message=message,
-                            type=ValidationErrorTypeEnum.PENGUIN_FORMATTING,
-                            link=f"https://colab.research.google.com/drive/{deliverable_id}",
-                        )
-                        validation_error_records.append(validation_error)
-
-                error_delivery_ids = {error["deliverableId"] for error in schema_errors}
-                unique_data = [entry for entry in unique_data if entry["deliverable_id"] not in error_delivery_ids]
-
-        if validation_error_records:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.has_validation_error = True
-            db.add_all(validation_error_records)
-            db.commit()
-
-        if unique_data:
-            with open("output.json", "w") as file:
-                json.dump(unique_data,file, indent=4)
+    with record_stage(batch_id, "colab_conversion") as stage:
+        try:
+            db = SessionLocal()
             batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.status = StatusEnum.COMPLETED
-            delivery = DeliveryJson(content=unique_data, batch_id=batch_id)
-            db.add(delivery)
-            db.commit()
-            return f"process_colab_link Completed for batch {batch_id}"
-        else:
+            drive_service = authenticate_drive()
+
+            output_array = []
+            error_array = []
+
+            for idx, link in enumerate(links):
+                try:
+                    print("idx", idx)
+                    file_id = extract_file_id(link)
+                    ipynb_content = download_ipynb(drive_service, file_id)
+                    py_content = convert_ipynb_to_py(ipynb_content)
+
+                    # Determine category and patterns
+                    category_match = re.search(r"(?i)\*\*Category\:\*\*\s*-\s*([^\n]*)", py_content)
+                    category = category_match.group(1).strip() if category_match else "General"
+
+                    type = "General"
+                    if category.lower() == "agent":
+                        type = "Agent"
+                    elif category.lower() == "coding":
+                        if re.search(r"(?i)\*\*\[CHAIN", py_content) and re.search(r"(?i)\*\*\[THOUGHT", py_content):
+                            type = "Coding"
+
+                    json_data = process_file_content(type, py_content, ids[idx], client, file_id)
+                    output_array.append(json_data)
+                except Exception as e:
+                    logger.error("colab file: " + link + " error trace: " + traceback.format_exc())
+                    error_array.append({"link": link, "message": str(e)})
+            stage.records = len(output_array)
+            stage.details["failed_links"] = len(error_array)
+
+            with ValidationErrorWriter(batch_id) as validation_errors:
+                for error in error_array:
+                    validation_errors.add(ValidationErrorTypeEnum.SCHEMA, error["message"], link=error["link"])
+
+                # if duplicate_links:
+                #     validation_errors.add(
+                #         ValidationErrorTypeEnum.DUPLICATION,
+                #         f"The following links are duplicated in the CSV: {', '.join(duplicate_links)}",
+                #         link=', '.join(duplicate_links),
+                #     )
+                # with open("output_array.json", "w") as file:
+                #     json.dump(output_array, file, indent=4)
+                assets = []
+                validator = Validator(output_array, assets, "assets_path")
+                dedup_result = validator.deduplicate()
+                unique_data = dedup_result["data"]
+                with open("output1.json", "w") as file:
+                    json.dump(unique_data, file, indent=4)
+
+                if dedup_result["errors"]:
+                    for error in dedup_result["errors"]:
+                        deliverable_id = error["deliverableId"]
+                        messages = error["message"]
+                        for message in messages:
+                            validation_errors.add(ValidationErrorTypeEnum.DUPLICATION, message, deliverable_id)
+
+                if client == ClientEnum.PENGUIN.value:
+                    validator = Validator(unique_data, assets, "assets_path")
+                    schema_errors = validator.penguin_format_validate()
+                    if len(schema_errors) > 0:
+                        for error in schema_errors:
+                            deliverable_id = error["deliverableId"]
+                            messages = error["message"]
+                            for message in messages:
+                                validation_errors.add(
+                                    ValidationErrorTypeEnum.PENGUIN_FORMATTING,
+                                    message,
+                                    deliverable_id,
+                                    link=f"https://colab.research.google.com/drive/{deliverable_id}",
+                                )
+
+                        error_delivery_ids = {error["deliverableId"] for error in schema_errors}
+                        unique_data = [entry for entry in unique_data if entry["deliverable_id"] not in error_delivery_ids]
+
+                if validation_errors.rows:
+                    batch = db.query(Batch).filter(Batch.id == batch_id).one()
+                    batch.has_validation_error = True
+                    validation_errors.copy(db)
+                    db.commit()
+
+            if unique_data:
+                with open("output.json", "w") as file:
+                    json.dump(unique_data,file, indent=4)
+                batch = db.query(Batch).filter(Batch.id == batch_id).one()
+                batch.status = StatusEnum.COMPLETED
+                delivery = DeliveryJson(content=unique_data, batch_id=batch_id)
+                db.add(delivery)
+                db.commit()
+                return f"process_colab_link Completed for batch {batch_id}"
+            else:
+                stage.fail()
+                batch.status = StatusEnum.FAILED
+                batch.has_validation_error = True
+                validation_error = ValidationError(
+                    batch_id=batch.id,
+                    type=ValidationErrorTypeEnum.JSON_FORMATTING,
+                    error_message="No data generated in Apple format conversion; check Colab and its formatting.",
+                )
+                db.add(validation_error)
+                db.commit()
+                return
+        except Exception as e:
+            logger.error(f"Error in process_colab_link: {str(e)}")
+            stage.fail()
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
             validation_error = ValidationError(
                 batch_id=batch.id,
                 type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data generated in Apple format conversion; check Colab and its formatting.",
+                error_message=f"Error in JSON formatting: {str(e)}",
             )
             db.add(validation_error)
             db.commit()
             return
-    except Exception as e:
-        logger.error(f"Error in process_colab_link: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.JSON_FORMATTING,
-            error_message=f"Error in JSON formatting: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-        return
-    finally:
-        db.close()
+        finally:
+            db.close()
 
 
 @celery_app.task()
 def validations_rlhf_text(prev_result, batch_id):
-    try:
-        db = SessionLocal()
-        if not prev_result:
-            return f"No data for Validations for batch {batch_id}"
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        assets = []
-
-        validator1 = Validator(prev_result, assets, "assets_path")
-        dedup_result = validator1.deduplicate()
-        unique_data = dedup_result["data"]
-
-        validation_error_records = []
-
-        if dedup_result["errors"]:
-            for error in dedup_result["errors"]:
-                deliverable_id = UUID(error["deliverableId"])
-                messages = error["message"]
-                for message in messages:
-                    validation_error = ValidationError(
-                        batch_id=batch_id,
-                        delivery_id=deliverable_id,
-                        error_message=message,
-                        type=ValidationErrorTypeEnum.DUPLICATION,
-                    )
-                    validation_error_records.append(validation_error)
-
-        validator2 = Validator(unique_data, assets, "assets_path")
-        errors = validator2.validate(TaskType.RLHF_IMAGE, ValidationType.SCHEMA)
-
-        error_delivery_ids = {error["deliverableId"] for error in errors}
-        filtered_data = [entry for entry in unique_data if entry["deliverable_id"] not in error_delivery_ids]
-
-        for error in errors:
-            deliverable_id = UUID(error["deliverableId"])
-            messages = error["message"]
-            for message in messages:
-                validation_error = ValidationError(
-                    batch_id=batch_id,
-                    delivery_id=deliverable_id,
-                    error_message=message,
-                    type=ValidationErrorTypeEnum.SCHEMA,
-                )
-                validation_error_records.append(validation_error)
-
-        if validation_error_records:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.has_validation_error = True
-            db.add_all(validation_error_records)
-            db.commit()
-
-        if filtered_data:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.status = StatusEnum.COMPLETED
-            delivery = DeliveryJson(content=filtered_data, batch_id=batch_id)
-            file_stats = process_json_data(filtered_data, "rlhf-vision")
-            batch.stats = file_stats
-            db.add(delivery)
-            db.commit()
-        else:
-            batch.status = StatusEnum.FAILED
-            batch.has_validation_error = True
-            validation_error = ValidationError(
-                batch_id=batch.id,
-                type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data after validation",
-            )
-            db.add(validation_error)
-            db.commit()
-    except Exception as e:
-        logger.error(f"Validation failed: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.TASK_PROCESSING,
-            error_message=f"Error in task processing: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-    finally:
-        db.close()
-
-    return f"Validations Completed for batch {batch_id}"
+    if not prev_result:
+        return f"No data for Validations for batch {batch_id}"
+    return start_validation(batch_id, prev_result)
 
 
 @celery_app.task()
 def convert_to_apple_format_rlhf_text(batch_id):
-    try:
-        db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        processor = RLHFTextJSONProcessor()
-        results = (
-            db.query(PreProcessingFileJson.content)
-            .join(
-                PreProcessingFile,
-                PreProcessingFile.id == PreProcessingFileJson.preprocessing_file_id,
-            )
-            .filter(PreProcessingFile.batch_id == batch_id)
-            .all()
-        )
-        input_array = [json.loads(result.content) for result in results]
-        apple_json = processor.process_file(input_array)
-        if not apple_json:
+    with record_stage(batch_id, "conversion") as stage:
+        try:
+            db = SessionLocal()
+            batch = db.query(Batch).filter(Batch.id == batch_id).one()
+            artifact = completed_conversion(db, batch)
+            if artifact is not None:
+                stage.details["resumed"] = True
+                return artifact
+
+            processor = RLHFTextJSONProcessor()
+
+            stage.records = convert_batch_records(db, batch, processor)
+            stage.bytes_in, stage.bytes_out = conversion_bytes(db, batch.id)
+            if not stage.records:
+                stage.fail()
+                batch.status = StatusEnum.FAILED
+                batch.has_validation_error = True
+                validation_error = ValidationError(
+                    batch_id=batch.id,
+                    type=ValidationErrorTypeEnum.JSON_FORMATTING,
+                    error_message="No data generated in Apple format conversion; check JSON and its formatting.",
+                )
+                db.add(validation_error)
+                db.commit()
+                return
+            return checkpoint_conversion(db, batch)
+        except Exception as e:
+            stage.fail()
+            logger.error(f"Error in convert_to_apple_format_rlhf_text: {str(e)}")
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
             validation_error = ValidationError(
                 batch_id=batch.id,
                 type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data generated in Apple format conversion; check JSON and its formatting.",
+                error_message=f"Error in JSON formatting: {str(e)}",
             )
             db.add(validation_error)
             db.commit()
             return
-        return apple_json
-    except Exception as e:
-        logger.error(f"Error in convert_to_apple_format_rlhf_text: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.JSON_FORMATTING,
-            error_message=f"Error in JSON formatting: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-        return
-    finally:
-        db.close()
+        finally:
+            db.close()
 
 
 @celery_app.task()
 def validations_sft_code_int(batch_id):
-    try:
-        db = SessionLocal()
-        batch = db.query(Batch).filter(Batch.id == batch_id).one()
-        result = (
-            db.query(PreProcessingFileJson.content)
-            .join(PreProcessingFile, PreProcessingFile.id == PreProcessingFileJson.preprocessing_file_id)
-            .filter(PreProcessingFile.batch_id == batch_id)
-            .one()
-        )
-
-        if not result:
-            return f"No data for Validations for batch {batch_id}"
-
-        apple_json = json.loads(result.content)
-
-        assets = []
-
-        validator1 = Validator(apple_json, assets, "assets_path")
-        dedup_result = validator1.deduplicate()
-        unique_data = dedup_result["data"]
-
-        validation_error_records = []
-
-        if dedup_result["errors"]:
-            for error in dedup_result["errors"]:
-                deliverable_id = error["deliverableId"]
-                messages = error["message"]
-                for message in messages:
-                    validation_error = ValidationError(
-                        batch_id=batch_id,
-                        delivery_id=deliverable_id,
-                        error_message=message,
-                        type=ValidationErrorTypeEnum.DUPLICATION,
-                    )
-                    validation_error_records.append(validation_error)
-
-        validator2 = Validator(unique_data, assets, "assets_path")
-        errors = validator2.validate(TaskType.SFT_CODE_INT, ValidationType.SCHEMA)
-        error_delivery_ids = {error["deliverableId"] for error in errors}
-        filtered_data = [entry for entry in unique_data if entry["deliverable_id"] not in error_delivery_ids]
-        for error in errors:
-            deliverable_id = error["deliverableId"]
-            messages = error["message"]
-            validation_error = ValidationError(
-                batch_id=batch_id,
-                delivery_id=deliverable_id,
-                error_message=messages,
-                type=ValidationErrorTypeEnum.SCHEMA,
-            )
-            validation_error_records.append(validation_error)
-
-        if validation_error_records:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.has_validation_error = True
-            db.add_all(validation_error_records)
-            db.commit()
-
-        if filtered_data:
-            batch = db.query(Batch).filter(Batch.id == batch_id).one()
-            batch.status = StatusEnum.COMPLETED
-            delivery = DeliveryJson(content=filtered_data, batch_id=batch_id)
-            file_stats = process_json_data(filtered_data, "2410-sft-code-int")
-            batch.stats = file_stats
-            db.add(delivery)
-            db.commit()
-        else:
-            batch.status = StatusEnum.FAILED
-            batch.has_validation_error = True
-            validation_error = ValidationError(
-                batch_id=batch.id,
-                type=ValidationErrorTypeEnum.JSON_FORMATTING,
-                error_message="No data after validation",
-            )
-            db.add(validation_error)
-            db.commit()
-    except Exception as e:
-        logger.error(f"Validation failed: {str(e)}")
-        batch.status = StatusEnum.FAILED
-        batch.has_validation_error = True
-        validation_error = ValidationError(
-            batch_id=batch.id,
-            type=ValidationErrorTypeEnum.TASK_PROCESSING,
-            error_message=f"Error in task processing: {str(e)}",
-        )
-        db.add(validation_error)
-        db.commit()
-    finally:
-        db.close()
-
-    return f"Validations Completed for batch {batch_id}"
+    return start_validation(batch_id)
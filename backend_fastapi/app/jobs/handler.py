@@ -96,7 +96,8 @@ def process_s3file_job(job, db: Session):
         raise HTTPException(status_code=400, detail="Invalid action specified.")
 
 def create_s3file(job, db: Session):
-    # Step 1: Download file content from S3
+    # Step 1: Download file content from S3, with the metadata of the object it came from
+    object_metadata = s3_client.head_file(job["s3key"])
     file_content = s3_client.download_file(job["s3key"])
     if not file_content:
         raise HTTPException(status_code=404, detail="File not found in S3.")
@@ -105,7 +106,7 @@ def create_s3file(job, db: Session):
     file_stats = process_json_data(file_content, job["workstream"])
 
     # Step 3: Create new S3 file entry in the database
-    new_s3_file = create_s3_file_entry(job, db)
+    new_s3_file = create_s3_file_entry(job, db, object_metadata)
 
     # Step 4: Save file content to the database
     save_file_content(new_s3_file.id, file_content, db)
@@ -120,13 +121,14 @@ def create_s3file(job, db: Session):
     # Step 7: Send Slack notification
     send_slack_notification(file_stats, job["s3key"])
 
-def create_s3_file_entry(job, db: Session) -> S3File:
+def create_s3_file_entry(job, db: Session, object_metadata=None) -> S3File:
     """Helper function to create and commit a new S3File entry."""
     new_s3_file = S3File(
         s3key=job["s3key"],
         file_url=job["file_url"],
         workstream=job["workstream"],
     )
+    set_object_metadata(new_s3_file, object_metadata)
     db.add(new_s3_file)
     db.commit()
     db.refresh(new_s3_file)
@@ -179,7 +181,35 @@ def process_deliverable_ids(file_content, job, db: Session):
     else:
         print("No new deliverables to insert.")
 
+def set_object_metadata(s3_file: S3File, object_metadata):
+    """Helper function to record the S3 object the file's content was read from."""
+    if object_metadata:
+        s3_file.etag = object_metadata["etag"]
+        s3_file.size = object_metadata["size"]
+        s3_file.version_id = object_metadata["version_id"]
+
+def is_unchanged(s3_file: S3File, object_metadata, job) -> bool:
+    """Check if the S3 object is the one the stored content and stats were computed from."""
+    return (
+        object_metadata is not None
+        and s3_file.etag is not None
+        and s3_file.etag == object_metadata["etag"]
+        and s3_file.size == object_metadata["size"]
+        and s3_file.version_id == object_metadata["version_id"]
+        # Stats depend on the workstream too
+        and s3_file.workstream == job["workstream"]
+    )
+
 def update_s3file(job, db: Session, existing_s3_file):
+    # A cheap HEAD first; nothing to do when the object did not change
+    object_metadata = s3_client.head_file(job["s3key"])
+    if is_unchanged(existing_s3_file, object_metadata, job):
+        if existing_s3_file.file_url != job["file_url"]:
+            existing_s3_file.file_url = job["file_url"]
+            db.commit()
+        print(f"File with key '{job['s3key']}' is unchanged. Skipping update.")
+        return
+
     # Download the updated JSON file content from S3
     file_content = s3_client.download_file(job["s3key"])
     if not file_content:
@@ -189,19 +219,21 @@ def update_s3file(job, db: Session, existing_s3_file):
     """Helper function to update the S3 file record."""
     existing_s3_file.file_url = job["file_url"]
     existing_s3_file.workstream = job["workstream"]
+    set_object_metadata(existing_s3_file, object_metadata)
 
     # Step 2: Update or insert file content
     update_or_insert_content(existing_s3_file.id, file_content, db)
 
-    # Step 3: Update or insert file stats
-    update_or_insert_stats(existing_s3_file.id, file_content, job["workstream"], db)
+    # Step 3: Update or insert file stats, computed once for the Slack notification too
+    file_stats = process_json_data(file_content, job["workstream"])
+    update_or_insert_stats(existing_s3_file.id, file_stats, db)
 
     # Step 4: Process deliverable IDs if applicable
     if is_valid_deliverable_content(file_content):
         process_deliverable_ids(file_content, job, db)
 
     # Step 5: Send Slack notification
-    send_slack_notification(process_json_data(file_content, job["workstream"]), job["s3key"])
+    send_slack_notification(file_stats, job["s3key"])
 
 
 
@@ -225,13 +257,12 @@ def update_or_insert_content(s3file_id: int, file_content: str, db: Session):
     db.commit()
 
 
-def update_or_insert_stats(s3file_id: int, file_content: str, workstream: str, db: Session):
+def update_or_insert_stats(s3file_id: int, file_stats: dict, db: Session):
     """Helper function to update or insert file stats."""
     existing_file_stats = (
         db.query(Stat).filter(Stat.s3file_id == s3file_id).first()
     )
-    file_stats = process_json_data(file_content, workstream)
-    
+
     if existing_file_stats:
         existing_file_stats.stats_data = file_stats
     else:
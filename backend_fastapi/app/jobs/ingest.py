@@ -0,0 +1,54 @@
+import logging
+from app.context.preprocessing_context import PreProcessingContextFactory
+from app.db.database import SessionLocal
+from app.db.enums import StatusEnum, ValidationErrorTypeEnum
+from app.db.models import Batch, ValidationError
+from app.jobs.stage_metrics import record_stage
+from app.utils.upload_spool import open_spooled_uploads, remove_batch_spool
+from .celery_task import celery_app
+
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task()
+def ingest_upload_task(batch_id):
+    """Parse and store the spooled uploads of a batch, then start its processing tasks"""
+    with record_stage(batch_id, "ingest") as stage:
+        try:
+            db = SessionLocal()
+            batch = db.query(Batch).filter(Batch.id == batch_id).one()
+            context = PreProcessingContextFactory.create_context(batch.workstream, db)
+            context.set_batch(batch)
+
+            uploads = open_spooled_uploads(batch_id)
+            stage.bytes_in = sum(upload.size for upload in uploads)
+            stage.details["files"] = len(uploads)
+            try:
+                context.process_files(uploads)
+            finally:
+                for upload in uploads:
+                    upload.file.close()
+
+            if batch.status == StatusEnum.FAILED:
+                stage.fail()
+            else:
+                context.execute_tasks()
+            db.commit()
+            return f"Ingestion Completed for batch {batch_id}"
+        except Exception as e:
+            logger.error(f"Error in ingest_upload_task: {str(e)}")
+            stage.fail()
+            db.rollback()
+            batch.status = StatusEnum.FAILED
+            batch.has_validation_error = True
+            validation_error = ValidationError(
+                batch_id=batch.id,
+                type=ValidationErrorTypeEnum.TASK_PROCESSING,
+                error_message=f"Error in task processing: {str(e)}",
+            )
+            db.add(validation_error)
+            db.commit()
+        finally:
+            remove_batch_spool(batch_id)
+            db.close()
@@ -0,0 +1,186 @@
+"""
+msgpack serializer for Celery task messages and results, zstd-compressed above a size
+threshold, with per-task payload metrics kept in Redis. The metrics are summed in memory
+and flushed to Redis on an interval, so encoding and decoding never wait on the network.
+"""
+import atexit
+import datetime
+import decimal
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict
+import msgpack
+from celery.signals import after_task_publish, task_prerun, task_success
+from kombu.serialization import register
+from app.config import settings
+from app.db.redis_client import redis_client
+from app.utils.compression import compress_payload, decompress_payload
+
+
+logger = logging.getLogger(__name__)
+
+SERIALIZER_NAME = "msgpack+zstd"
+CONTENT_TYPE = "application/x-msgpack+zstd"
+
+# First byte of every payload
+RAW = b"\x00"
+ZSTD = b"\x01"
+
+EXT_UUID = 1
+EXT_DATETIME = 2
+EXT_DATE = 3
+EXT_DECIMAL = 4
+
+METRICS_KEY_PREFIX = "celery_payload_metrics:"
+# Decoding happens before a message is matched to its task, so it is tracked under one key
+DECODE_METRICS_KEY = f"{METRICS_KEY_PREFIX}_decode"
+
+# Size and timing of the last payload encoded by this thread, for the signal handlers
+_local = threading.local()
+
+# Metrics added since the last flush, by key and field
+_pending: Dict[str, Dict[str, float]] = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _default(obj):
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(EXT_UUID, obj.bytes)
+    if isinstance(obj, datetime.datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, datetime.date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+    if isinstance(obj, decimal.Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode())
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+def _ext_hook(code, data):
+    if code == EXT_UUID:
+        return uuid.UUID(bytes=data)
+    if code == EXT_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode())
+    if code == EXT_DATE:
+        return datetime.date.fromisoformat(data.decode())
+    if code == EXT_DECIMAL:
+        return decimal.Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def encode(obj) -> bytes:
+    started = time.perf_counter()
+    packed = msgpack.packb(obj, default=_default, use_bin_type=True)
+    threshold = settings.CELERY_COMPRESSION_THRESHOLD_BYTES
+    if threshold and len(packed) >= threshold:
+        payload = ZSTD + compress_payload(packed)
+    else:
+        payload = RAW + packed
+    _local.last_encoded = (len(packed), len(payload), time.perf_counter() - started)
+    return payload
+
+
+def decode(payload: bytes):
+    started = time.perf_counter()
+    body = payload[1:]
+    if payload[:1] == ZSTD:
+        body = decompress_payload(body)
+    obj = msgpack.unpackb(body, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+    _record(DECODE_METRICS_KEY, "decoded", len(body), len(payload), time.perf_counter() - started)
+    return obj
+
+
+def _record(key: str, kind: str, raw_bytes: int, wire_bytes: int, seconds: float) -> None:
+    """Add one payload to the metrics of `key`, flushing them all when the interval is up"""
+    global _last_flush
+    with _pending_lock:
+        fields = _pending.setdefault(key, {})
+        for field, value in (
+            (kind, 1),
+            (f"{kind}_raw_bytes", raw_bytes),
+            (f"{kind}_bytes", wire_bytes),
+            (f"{kind}_seconds", seconds),
+        ):
+            fields[field] = fields.get(field, 0) + value
+        due = time.monotonic() - _last_flush >= settings.CELERY_PAYLOAD_METRICS_FLUSH_SECONDS
+        if due:
+            _last_flush = time.monotonic()
+    if due:
+        flush_payload_metrics()
+
+
+def flush_payload_metrics() -> None:
+    """Add the metrics summed since the last flush to Redis; metrics must never break messaging"""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return
+    try:
+        pipeline = redis_client.pipeline(transaction=False)
+        for key, fields in pending.items():
+            for field, value in fields.items():
+                if field.endswith("_seconds"):
+                    pipeline.hincrbyfloat(key, field, value)
+                else:
+                    pipeline.hincrby(key, field, value)
+        pipeline.execute()
+    except Exception as e:
+        logger.warning(f"Could not record Celery payload metrics: {str(e)}")
+
+
+def _forget_pending() -> None:
+    # A forked worker starts from nothing, with a lock no thread of its parent can hold;
+    # the parent flushes what it had summed
+    global _pending, _pending_lock, _last_flush
+    _pending = {}
+    _pending_lock = threading.Lock()
+    _last_flush = time.monotonic()
+
+
+os.register_at_fork(after_in_child=_forget_pending)
+atexit.register(flush_payload_metrics)
+
+
+def _record_last_encoded(task_name: str, kind: str) -> None:
+    last_encoded = getattr(_local, "last_encoded", None)
+    _local.last_encoded = None
+    if last_encoded is not None:
+        _record(f"{METRICS_KEY_PREFIX}{task_name}", kind, *last_encoded)
+
+
+@after_task_publish.connect
+def _on_task_published(sender=None, **kwargs):
+    # The message body is the last payload encoded before publishing
+    _record_last_encoded(sender, "published")
+
+
+@task_prerun.connect
+def _on_task_prerun(sender=None, **kwargs):
+    _local.last_encoded = None
+
+
+@task_success.connect
+def _on_task_success(sender=None, **kwargs):
+    # The result is stored, and so encoded, just before task_success is sent
+    if not sender.ignore_result:
+        _record_last_encoded(sender.name, "result")
+
+
+def register_payload_serializer() -> None:
+    register(SERIALIZER_NAME, encode, decode, content_type=CONTENT_TYPE, content_encoding="binary")
+
+
+def payload_metrics() -> dict:
+    """Payload counts, bytes before and after compression and encode/decode seconds, by task"""
+    metrics = {}
+    for key in redis_client.scan_iter(f"{METRICS_KEY_PREFIX}*"):
+        values = redis_client.hgetall(key)
+        metrics[key.decode()[len(METRICS_KEY_PREFIX):]] = {
+            field.decode(): float(value) if field.endswith(b"_seconds") else int(value)
+            for field, value in values.items()
+        }
+    return metrics
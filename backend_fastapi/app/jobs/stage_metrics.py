@@ -0,0 +1,151 @@
+"""
+Timing of the Celery pipeline stages of a batch, one batch_stage_metrics row per stage
+run, so the slow stage of a batch and regressions between batches can be seen.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+from celery import current_task
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.db.models import BatchStageMetric
+
+
+logger = logging.getLogger(__name__)
+
+# Interval at which the resident memory of the worker is sampled while a stage runs
+RSS_SAMPLE_SECONDS = 0.2
+
+
+class StageRun:
+    """Figures of one stage run, filled in by the stage as it goes"""
+
+    def __init__(self, batch_id, stage: str):
+        self.batch_id = batch_id
+        self.stage = stage
+        self.records: Optional[int] = None
+        self.bytes_in: Optional[int] = None
+        self.bytes_out: Optional[int] = None
+        self.details: dict = {}
+        self.failed = False
+
+    def fail(self) -> None:
+        """Mark the run failed, for stages that handle their own errors"""
+        self.failed = True
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident memory of the process now; None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _RssSampler:
+    """
+    Highest resident memory of the process sampled while a stage runs. Unlike ru_maxrss,
+    which never goes down, it is not the peak of an earlier stage of the same worker.
+    """
+
+    def __init__(self):
+        self.peak = _rss_bytes()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stage-rss-sampler", daemon=True)
+        if self.peak is not None:
+            self._thread.start()
+
+    def _sample(self) -> None:
+        rss = _rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self) -> None:
+        while not self._stopped.wait(RSS_SAMPLE_SECONDS):
+            self._sample()
+
+    def stop(self) -> Optional[int]:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._sample()
+        return self.peak
+
+
+@contextmanager
+def record_stage(batch_id, stage: str) -> Iterator[StageRun]:
+    """
+    Time the block as `stage` of a batch and store its figures when it ends. The row is
+    written on its own session, so it is kept whatever the stage commits or rolls back,
+    and a failure to write it is only logged.
+    """
+    run = StageRun(batch_id, stage)
+    started_at = datetime.now(timezone.utc)
+    sampler = _RssSampler()
+    try:
+        yield run
+    except BaseException:
+        run.failed = True
+        raise
+    finally:
+        peak_rss_bytes = sampler.stop()
+        _save_stage_run(run, started_at, datetime.now(timezone.utc), peak_rss_bytes)
+
+
+def _save_stage_run(run: StageRun, started_at: datetime, ended_at: datetime, peak_rss_bytes: Optional[int]) -> None:
+    db = SessionLocal()
+    try:
+        db.add(
+            BatchStageMetric(
+                batch_id=run.batch_id,
+                stage=run.stage,
+                task_id=current_task.request.id if current_task else None,
+                status="failed" if run.failed else "completed",
+                started_at=started_at,
+                ended_at=ended_at,
+                records=run.records,
+                bytes_in=run.bytes_in,
+                bytes_out=run.bytes_out,
+                peak_rss_bytes=peak_rss_bytes,
+                details=run.details or None,
+            )
+        )
+        db.commit()
+    except Exception as e:
+        logger.warning(f"Could not record stage {run.stage} of batch {run.batch_id}: {str(e)}")
+    finally:
+        db.close()
+
+
+def batch_timeline(db: Session, batch_id) -> List[dict]:
+    """The stage runs of a batch in the order they started"""
+    metrics = (
+        db.query(BatchStageMetric)
+        .filter(BatchStageMetric.batch_id == batch_id)
+        .order_by(BatchStageMetric.started_at, BatchStageMetric.id)
+        .all()
+    )
+    timeline = []
+    for metric in metrics:
+        seconds = (metric.ended_at - metric.started_at).total_seconds()
+        timeline.append(
+            {
+                "stage": metric.stage,
+                "task_id": metric.task_id,
+                "status": metric.status,
+                "started_at": metric.started_at,
+                "ended_at": metric.ended_at,
+                "seconds": seconds,
+                "records": metric.records,
+                "records_per_second": metric.records / seconds if metric.records and seconds else None,
+                "bytes_in": metric.bytes_in,
+                "bytes_out": metric.bytes_out,
+                "peak_rss_bytes": metric.peak_rss_bytes,
+                "details": metric.details,
+            }
+        )
+    return timeline
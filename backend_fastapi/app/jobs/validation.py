@@ -0,0 +1,276 @@
+"""
+Validation stage of the pre-processing pipelines, sharded across workers.
+
+The entries of a batch are split into shards by a hash of their deliverable id, so all
+copies of a deliverable id land in the same shard and each shard's deduplication is
+complete. Each shard walks its entries once through the workstream's ValidationPipeline,
+stores the validation errors and returns the record ids of the entries that passed; the merge task writes the DeliveryJson from those in upload order.
+"""
+import logging
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+import boto3
+from celery import chord
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.s3_client import S3Client
+from app.db.checkpoints import (
+    NOT_COMPLETED,
+    VALIDATION_SHARD_STAGE,
+    VALIDATION_STAGE,
+    clear_checkpoints,
+    get_checkpoint,
+    mark_completed,
+    validation_shard_stage,
+)
+from app.db.database import SessionLocal
+from app.db.enums import StatusEnum, ValidationErrorTypeEnum, WorkstreamEnum
+from app.db.models import Batch, ConfigOption, DeliveryJson, ValidationError
+from app.db.validation_errors import ValidationErrorWriter
+from app.db.records import conversion_artifact, count_validation_entries, iter_validation_entries
+from app.service.delivery_validation.deduplicate import DeDuplication
+from app.service.delivery_validation.enums import TaskType
+from app.service.delivery_validation.parse_json_data import StatsAccumulator
+from app.jobs.stage_metrics import record_stage
+from app.service.delivery_validation.pipeline import (
+    DeduplicationStage,
+    PenguinFormatStage,
+    RlhfSchemaStage,
+    S3LinkStage,
+    SftCodeIntSchemaStage,
+    ValidationIssue,
+    ValidationPipeline,
+    ValidationStage,
+)
+from .celery_task import celery_app
+
+
+logger = logging.getLogger(__name__)
+
+s3 = S3Client()
+
+
+def _rlhf_vision_assets(db: Session, batch: Batch) -> Tuple[List[str], str]:
+    """Names of the images already in the batch's S3 folder, and the path the entries must link them under"""
+    folder_date = batch.delivery_date.strftime("%Y%m%d")
+    images_folder = f"2410-rlhf-vision/assets/{folder_date}/"
+    apple_upload = db.query(ConfigOption).filter_by(name="enable_penguin_s3_upload").first()
+    apple_upload_value = apple_upload.value if apple_upload else False
+
+    if apple_upload_value:
+        s3._refresh_if_credentials_expired()
+        s3_client = s3.s3_client
+        aws_bucket_name = settings.AWS_BUCKET_NAME
+    else:
+        s3_client = boto3.client(
+            "s3",
+            aws_access_key_id=settings.DEV_AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.DEV_AWS_SECRET_ACCESS_KEY,
+        )
+        aws_bucket_name = settings.DEV_AWS_BUCKET_NAME
+
+    assets = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    pages = paginator.paginate(Bucket=aws_bucket_name, Prefix=images_folder)
+    for page in pages:
+        if "Contents" not in page:
+            logger.error(f"No contents found in S3 folder: {images_folder}")
+            continue
+        for obj in page["Contents"]:
+            assets.append(obj["Key"].split("/")[-1])
+
+    return assets, f"s3://og82-drop-turing-deputy/2410-rlhf-vision/assets/{folder_date}/"
+
+
+def _rlhf_vision_stages(db: Session, batch: Batch) -> List[ValidationStage]:
+    assets, assets_path = _rlhf_vision_assets(db, batch)
+    return [
+        DeduplicationStage(),
+        RlhfSchemaStage(),
+        S3LinkStage(TaskType.RLHF_IMAGE, assets, assets_path),
+        PenguinFormatStage(),
+    ]
+
+
+class ShardedValidation(NamedTuple):
+    # Whether the entries are the stored conversions of rlhf records rather than bare records
+    converted: bool
+    stages: Callable[[Session, Batch], List[ValidationStage]]
+    # Task name StatsAccumulator computes the batch stats for, if any
+    stats_task: Optional[str]
+    # Whether deliverable ids are UUIDs, stored in their canonical form on validation errors
+    uuid_ids: bool = True
+
+
+SHARDED_VALIDATIONS = {
+    WorkstreamEnum.RLHF_VISION: ShardedValidation(True, _rlhf_vision_stages, "rlhf-vision"),
+    WorkstreamEnum.IMAGE_EVAL: ShardedValidation(True, lambda db, batch: [DeduplicationStage()], None),
+    WorkstreamEnum.RLHF_TEXT: ShardedValidation(
+        True, lambda db, batch: [DeduplicationStage(), RlhfSchemaStage()], "rlhf-vision"
+    ),
+    WorkstreamEnum.SFT_CODE_INT: ShardedValidation(
+        False, lambda db, batch: [DeduplicationStage(), SftCodeIntSchemaStage()], "2410-sft-code-int", uuid_ids=False
+    ),
+}
+
+
+def _write_issues(writer: ValidationErrorWriter, issues: List[ValidationIssue], uuid_ids: bool) -> None:
+    """One validation error per message of each issue"""
+    for issue in issues:
+        # Penguin formatting errors always kept the deliverable id as given
+        delivery_id = issue.deliverable_id
+        if uuid_ids and issue.error_type != ValidationErrorTypeEnum.PENGUIN_FORMATTING:
+            delivery_id = UUID(delivery_id)
+        for message in issue.messages:
+            writer.add(issue.error_type, message, delivery_id)
+
+
+def _fail_batch(db: Session, batch: Batch, error_type: ValidationErrorTypeEnum, error_message: str) -> None:
+    batch.status = StatusEnum.FAILED
+    batch.has_validation_error = True
+    db.add(ValidationError(batch_id=batch.id, type=error_type, error_message=error_message))
+    db.commit()
+
+
+def start_sharded_validation(batch_id, artifact: Optional[dict] = None) -> Optional[str]:
+    """
+    Launch the validation of a batch as a chord of shard tasks merged by
+    merge_validation_shards; returns the chord id, or None when there is nothing to validate.
+    With the `artifact` of the conversion step, the stored conversions are checked against
+    it first.
+    """
+    db = SessionLocal()
+    try:
+        batch = db.query(Batch).filter(Batch.id == batch_id).one()
+        validation = SHARDED_VALIDATIONS[batch.workstream]
+        if artifact is not None:
+            current = conversion_artifact(db, batch_id)
+            if current != artifact:
+                raise ValueError(f"Converted data of batch {batch_id} changed after conversion: {artifact} != {current}")
+        count = count_validation_entries(db, batch_id, validation.converted)
+    finally:
+        db.close()
+    if not count:
+        return None
+
+    shards = max(1, min(settings.VALIDATION_SHARDS, count // settings.VALIDATION_SHARD_MIN_RECORDS))
+    logger.info("Validating %s entries of batch %s in %s shards", count, batch_id, shards)
+    header = [validate_shard.s(batch_id, shard, shards) for shard in range(shards)]
+    return chord(header)(merge_validation_shards.s(batch_id)).id
+
+
+@celery_app.task()
+def validate_shard(batch_id, shard, shards):
+    """
+    Validate one shard of a batch and store its errors; returns {"ids": [...], "errors": n}
+    with the record ids of the entries that passed, or None when the shard failed.
+    """
+    with record_stage(batch_id, "validation_shard") as stage:
+        stage.details["shard"] = f"{shard}/{shards}"
+        try:
+            db = SessionLocal()
+            batch = db.query(Batch).filter(Batch.id == batch_id).one()
+            validation = SHARDED_VALIDATIONS[batch.workstream]
+
+            # A shard completed by an earlier run of the batch already stored its errors
+            checkpoint_stage = validation_shard_stage(shard, shards)
+            result = get_checkpoint(db, batch_id, checkpoint_stage)
+            if result is not NOT_COMPLETED:
+                stage.details["resumed"] = True
+                return result
+
+            record_ids = {}
+            entries = []
+            for record_id, entry in iter_validation_entries(db, batch_id, validation.converted, shard, shards):
+                # Dedup keeps the first entry of a deliverable id, which is also the first record
+                record_ids.setdefault(entry.get("deliverable_id"), record_id)
+                entries.append(entry)
+
+            pipeline = ValidationPipeline(validation.stages(db, batch))
+            passed, issues = pipeline.run(entries)
+            with ValidationErrorWriter(batch_id) as writer:
+                _write_issues(writer, issues, validation.uuid_ids)
+                error_count = writer.copy(db)
+            result = {
+                "ids": [record_ids[entry.get("deliverable_id")] for entry in passed],
+                "errors": error_count,
+            }
+            mark_completed(db, batch_id, checkpoint_stage, result)
+            db.commit()
+            stage.records = len(entries)
+            stage.details.update(validators=pipeline.seconds, passed=len(passed), errors=error_count)
+            return result
+        except Exception as e:
+            # Returned rather than raised so the merge still runs and reports the batch
+            logger.error(f"Validation of shard {shard}/{shards} failed: {str(e)}")
+            stage.fail()
+            db.rollback()
+            _fail_batch(db, batch, ValidationErrorTypeEnum.TASK_PROCESSING, f"Error in task processing: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+
+@celery_app.task()
+def merge_validation_shards(shard_results, batch_id):
+    """Combine the shard results of a batch and write its DeliveryJson and stats"""
+    with record_stage(batch_id, "validation_merge") as stage:
+        try:
+            db = SessionLocal()
+            batch = db.query(Batch).filter(Batch.id == batch_id).one()
+            if get_checkpoint(db, batch_id, VALIDATION_STAGE) is not NOT_COMPLETED:
+                stage.details["resumed"] = True
+                return f"Validations Completed for batch {batch_id}"
+            if any(result is None for result in shard_results):
+                stage.fail()
+                return f"Validations Failed for batch {batch_id}"
+
+            validation = SHARDED_VALIDATIONS[batch.workstream]
+            passed_ids = {record_id for result in shard_results for record_id in result["ids"]}
+            stats = StatsAccumulator(validation.stats_task) if validation.stats_task else None
+
+            # The stats are gathered as the passed entries are read back, rather than in a second pass
+            entries = []
+            seen = set()
+            with ValidationErrorWriter(batch_id) as writer:
+                for _, entry in iter_validation_entries(db, batch_id, validation.converted, ids=passed_ids):
+                    # Shards are keyed by deliverable id, so this only guards against entries they disagree on
+                    deliverable_id = entry.get("deliverable_id")
+                    if deliverable_id in seen:
+                        writer.add(
+                            ValidationErrorTypeEnum.DUPLICATION,
+                            DeDuplication().format_duplicate_message("internal"),
+                            deliverable_id,
+                        )
+                        continue
+                    seen.add(deliverable_id)
+                    entries.append(entry)
+                    if stats:
+                        stats.add(entry)
+                error_count = writer.copy(db)
+            stage.records = len(entries)
+            stage.details["errors"] = error_count
+            if error_count or any(result["errors"] for result in shard_results):
+                batch.has_validation_error = True
+
+            if entries:
+                batch.status = StatusEnum.COMPLETED
+                db.add(DeliveryJson(content=entries, batch_id=batch_id))
+                if stats:
+                    batch.stats = stats.result()
+                # Committed with the DeliveryJson, so a resumed batch is never delivered twice
+                mark_completed(db, batch_id, VALIDATION_STAGE)
+                clear_checkpoints(db, batch_id, VALIDATION_SHARD_STAGE)
+                db.commit()
+            else:
+                stage.fail()
+                _fail_batch(db, batch, ValidationErrorTypeEnum.JSON_FORMATTING, "No data after validation")
+        except Exception as e:
+            logger.error(f"Validation failed: {str(e)}")
+            stage.fail()
+            db.rollback()
+            _fail_batch(db, batch, ValidationErrorTypeEnum.TASK_PROCESSING, f"Error in task processing: {str(e)}")
+        finally:
+            db.close()
+
+    return f"Validations Completed for batch {batch_id}"
@@ -0,0 +1,185 @@
+"""
+Long-running consumer of the S3 file webhook jobs.
+
+The webhook router appends one entry per changed file to a Redis stream. Consumers read
+it through a consumer group in batches, process up to WEBHOOK_CONSUMER_CONCURRENCY jobs
+at once and acknowledge each job only once it is processed. Entries left pending by a
+consumer that died are reclaimed after WEBHOOK_STREAM_CLAIM_IDLE_MS; a job failing
+WEBHOOK_STREAM_MAX_DELIVERIES times is moved to a dead-letter stream.
+
+Run with `python -m app.jobs.webhook_consumer`; several consumers can share the group.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import redis
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.redis_client import redis_client
+from app.jobs.handler import process_s3file_job
+
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_STREAM = "update_s3file_webhooks_stream"
+WEBHOOK_DEAD_LETTER_STREAM = "update_s3file_webhooks_dead"
+WEBHOOK_GROUP = "s3file_webhook_consumers"
+# List the jobs were pushed to before the stream; drained into it on startup
+LEGACY_WEBHOOK_QUEUE = "update_s3file_webhooks"
+# Wait after the consumer loop fails, doubled on each failure in a row
+RETRY_BASE_SECONDS = 1
+RETRY_MAX_SECONDS = 60
+
+# Pops a job off the legacy list and appends it to the stream in one step, so no job is lost between the two
+MOVE_LEGACY_JOB = redis_client.register_script(
+    """
+    local job = redis.call('RPOP', KEYS[1])
+    if not job then
+        return 0
+    end
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], '*', 'job', job)
+    return 1
+    """
+)
+
+Entry = Tuple[bytes, dict]
+
+
+def enqueue_webhook_jobs(jobs: List[dict]) -> None:
+    """Append jobs to the webhook stream in one round trip"""
+    pipeline = redis_client.pipeline(transaction=False)
+    for job in jobs:
+        pipeline.xadd(
+            WEBHOOK_STREAM, {"job": json.dumps(job)}, maxlen=settings.WEBHOOK_STREAM_MAXLEN, approximate=True
+        )
+    pipeline.execute()
+
+
+def _ensure_group() -> None:
+    try:
+        redis_client.xgroup_create(WEBHOOK_STREAM, WEBHOOK_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _drain_legacy_queue() -> None:
+    moved = 0
+    while MOVE_LEGACY_JOB(keys=[LEGACY_WEBHOOK_QUEUE, WEBHOOK_STREAM], args=[settings.WEBHOOK_STREAM_MAXLEN]):
+        moved += 1
+    if moved:
+        logger.info("Moved %s webhook jobs from the legacy queue to the stream", moved)
+
+
+class WebhookConsumer:
+    def __init__(self, name: str = None):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=settings.WEBHOOK_CONSUMER_CONCURRENCY)
+        self.stopping = threading.Event()
+
+    def stop(self, *args) -> None:
+        """Finish the jobs in hand and return from run()"""
+        self.stopping.set()
+
+    def run(self) -> None:
+        """
+        Consume until stopped. Errors, such as Redis being unreachable, are logged and the
+        loop carries on after a backoff; unacknowledged entries are read again later.
+        """
+        started = False
+        failures = 0
+        logger.info("Webhook consumer %s starting", self.name)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    if not started:
+                        _ensure_group()
+                        _drain_legacy_queue()
+                        started = True
+                    entries = self._reclaim() or self._read()
+                    if entries:
+                        self._process_batch(entries)
+                    failures = 0
+                except redis.RedisError as e:
+                    failures += 1
+                    logger.error("Webhook consumer %s Redis error: %s", self.name, e)
+                    self._backoff(failures)
+                except Exception:
+                    failures += 1
+                    logger.exception("Webhook consumer %s failed", self.name)
+                    self._backoff(failures)
+        finally:
+            self.executor.shutdown(wait=True)
+            logger.info("Webhook consumer %s stopped", self.name)
+
+    def _backoff(self, failures: int) -> None:
+        # Returns early when the consumer is stopped meanwhile
+        self.stopping.wait(min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (failures - 1)))
+
+    def _reclaim(self) -> List[Entry]:
+        """Take over entries another consumer read but did not acknowledge in time"""
+        _, entries, *_ = redis_client.xautoclaim(
+            WEBHOOK_STREAM,
+            WEBHOOK_GROUP,
+            self.name,
+            min_idle_time=settings.WEBHOOK_STREAM_CLAIM_IDLE_MS,
+            start_id="0-0",
+            count=settings.WEBHOOK_STREAM_BATCH_SIZE,
+        )
+        # Entries trimmed from the stream while pending come back without fields; nothing is left to process
+        trimmed = [entry_id for entry_id, fields in entries if not fields]
+        if trimmed:
+            redis_client.xack(WEBHOOK_STREAM, WEBHOOK_GROUP, *trimmed)
+        return [(entry_id, fields) for entry_id, fields in entries if fields]
+
+    def _read(self) -> List[Entry]:
+        response = redis_client.xreadgroup(
+            WEBHOOK_GROUP,
+            self.name,
+            {WEBHOOK_STREAM: ">"},
+            count=settings.WEBHOOK_STREAM_BATCH_SIZE,
+            block=settings.WEBHOOK_STREAM_BLOCK_MS,
+        )
+        return response[0][1] if response else []
+
+    def _process_batch(self, entries: List[Entry]) -> None:
+        results = self.executor.map(self._process_entry, entries)
+        acked = [entry_id for (entry_id, _), done in zip(entries, results) if done]
+        if acked:
+            redis_client.xack(WEBHOOK_STREAM, WEBHOOK_GROUP, *acked)
+
+    def _process_entry(self, entry: Entry) -> bool:
+        """Process one job; returns whether its entry can be acknowledged"""
+        entry_id, fields = entry
+        db = SessionLocal()
+        try:
+            job = json.loads(fields[b"job"])
+            process_s3file_job(job, db)
+            logger.info("Job processed successfully: %s", job)
+            return True
+        except Exception as e:
+            logger.error("Error processing webhook job %s: %s", entry_id, e)
+            return self._dead_letter_if_exhausted(entry_id, fields, e)
+        finally:
+            db.close()
+
+    def _dead_letter_if_exhausted(self, entry_id: bytes, fields: dict, error: Exception) -> bool:
+        """Move a job out of the stream once it failed too often; left pending otherwise, to be retried"""
+        pending = redis_client.xpending_range(WEBHOOK_STREAM, WEBHOOK_GROUP, min=entry_id, max=entry_id, count=1)
+        if pending and pending[0]["times_delivered"] < settings.WEBHOOK_STREAM_MAX_DELIVERIES:
+            return False
+        redis_client.xadd(WEBHOOK_DEAD_LETTER_STREAM, {**fields, "error": str(error), "entry_id": entry_id})
+        return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    consumer = WebhookConsumer()
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+    consumer.run()
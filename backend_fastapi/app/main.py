@@ -28,6 +28,7 @@ from app.db.activity_listener import setup_activity_logging
 import psutil
 from slowapi.middleware import SlowAPIMiddleware
 from app.middleware.limiter import init_limiter
+from app.middleware.admission import UploadAdmissionMiddleware
 
 
 setup_logging()
@@ -47,6 +48,9 @@ app = FastAPI(
 
 app.add_middleware(SlowAPIMiddleware)
 
+# Added before CORS so its 429 responses still carry the CORS headers
+app.add_middleware(UploadAdmissionMiddleware)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from app.config import settings
+from app.db.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+SIZES_KEY = "upload_admission:sizes"
+EXPIRY_KEY = "upload_admission:expiry"
+DETAILS_KEY = "upload_admission:details"
+POLL_INTERVAL_SECONDS = 0.5
+
+# (method, path) of the requests whose body counts against the budget
+ADMISSION_ROUTES = [
+    ("POST", re.compile(r"^/api/processor/$")),
+    ("POST", re.compile(r"^/api/processor/async/$")),
+    ("PUT", re.compile(r"^/api/processor/uploads/[^/]+$")),
+]
+
+# Drops expired reservations, then reserves the requested bytes if they fit in the budget.
+# A request is always admitted when nothing else is in flight, so one upload larger than
+# the budget can still go through on its own.
+RESERVE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+for _, id in ipairs(expired) do
+    redis.call('HDEL', KEYS[1], id)
+    redis.call('HDEL', KEYS[3], id)
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+
+local reserved = 0
+for _, size in ipairs(redis.call('HVALS', KEYS[1])) do
+    reserved = reserved + tonumber(size)
+end
+
+local requested = tonumber(ARGV[2])
+if reserved > 0 and reserved + requested > tonumber(ARGV[3]) then
+    return 0
+end
+
+redis.call('HSET', KEYS[1], ARGV[1], requested)
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[6])
+redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+return 1
+"""
+
+
+class UploadAdmissionController:
+    """
+    Byte budget shared by every API worker through Redis. Each admitted upload reserves
+    its declared size until its response is sent; reservations of requests that never
+    release them expire after UPLOAD_ADMISSION_TTL_SECONDS.
+    """
+
+    def __init__(self, redis, budget_bytes: int, ttl_seconds: int, max_wait_seconds: float):
+        self.redis = redis
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._reserve = redis.register_script(RESERVE_SCRIPT)
+
+    def reserve(self, size: int, path: str) -> Optional[str]:
+        """Reserve `size` bytes; returns the reservation id, or None when the budget is exhausted"""
+        reservation_id = uuid.uuid4().hex
+        now = time.time()
+        details = json.dumps({"path": path, "started_at": now})
+        admitted = self._reserve(
+            keys=[SIZES_KEY, EXPIRY_KEY, DETAILS_KEY],
+            args=[reservation_id, size, self.budget_bytes, now, now + self.ttl_seconds, details],
+        )
+        return reservation_id if admitted else None
+
+    async def acquire(self, size: int, path: str) -> Optional[str]:
+        """Reserve `size` bytes, waiting up to max_wait_seconds for the budget to free up"""
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            reservation_id = await run_in_threadpool(self.reserve, size, path)
+            if reservation_id or time.monotonic() >= deadline:
+                return reservation_id
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    def release(self, reservation_id: str) -> None:
+        pipeline = self.redis.pipeline()
+        pipeline.hdel(SIZES_KEY, reservation_id)
+        pipeline.hdel(DETAILS_KEY, reservation_id)
+        pipeline.zrem(EXPIRY_KEY, reservation_id)
+        pipeline.execute()
+
+    def snapshot(self) -> dict:
+        """Current reservations, for monitoring"""
+        now = time.time()
+        sizes = self.redis.hgetall(SIZES_KEY)
+        details = self.redis.hgetall(DETAILS_KEY)
+        expiry = dict(self.redis.zrangebyscore(EXPIRY_KEY, now, "+inf", withscores=True))
+
+        reservations = []
+        for reservation_id, expires_at in expiry.items():
+            if reservation_id not in sizes:
+                continue
+            detail = json.loads(details.get(reservation_id, b"{}"))
+            reservations.append(
+                {
+                    "id": reservation_id.decode(),
+                    "bytes": int(sizes[reservation_id]),
+                    "path": detail.get("path"),
+                    "started_at": detail.get("started_at"),
+                    "expires_at": expires_at,
+                }
+            )
+
+        reserved_bytes = sum(reservation["bytes"] for reservation in reservations)
+        return {
+            "budget_bytes": self.budget_bytes,
+            "reserved_bytes": reserved_bytes,
+            "available_bytes": max(self.budget_bytes - reserved_bytes, 0),
+            "reservations": reservations,
+        }
+
+
+upload_admission = UploadAdmissionController(
+    redis_client,
+    budget_bytes=settings.UPLOAD_ADMISSION_BUDGET_BYTES,
+    ttl_seconds=settings.UPLOAD_ADMISSION_TTL_SECONDS,
+    max_wait_seconds=settings.UPLOAD_ADMISSION_MAX_WAIT_SECONDS,
+)
+
+
+class UploadAdmissionMiddleware:
+    """
+    Admits upload requests against the shared byte budget based on their declared
+    Content-Length, before their body is read. Requests that do not fit within the wait
+    time are rejected with 429 and Retry-After.
+    """
+
+    def __init__(self, app, controller: UploadAdmissionController = upload_admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_upload(scope):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is None or not content_length.isdigit():
+            response = JSONResponse({"detail": "Content-Length is required for uploads."}, status_code=411)
+            await response(scope, receive, send)
+            return
+
+        reservation_id = await self.controller.acquire(int(content_length), scope["path"])
+        if reservation_id is None:
+            logger.warning(f"Upload of {content_length} bytes to {scope['path']} rejected: admission budget exhausted")
+            response = JSONResponse(
+                {
+                    "detail": "Our servers are currently experiencing heavy traffic. Please try again in a few minutes. We apologize for the inconvenience!"
+                },
+                status_code=429,
+                headers={"Retry-After": str(settings.UPLOAD_ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await run_in_threadpool(self.controller.release, reservation_id)
+
+    @staticmethod
+    def _is_upload(scope) -> bool:
+        return any(scope["method"] == method and path.match(scope["path"]) for method, path in ADMISSION_ROUTES)
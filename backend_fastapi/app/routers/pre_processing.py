@@ -1,28 +1,39 @@
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 import io
 import logging
 from typing import List, Dict, Any, Optional
 import uuid
 import boto3
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Request, Form, Query
+from fastapi import APIRouter, Depends, File, Header, HTTPException, UploadFile, Request, Form, Query
 from sqlalchemy.orm import Session
 from app.auth.jwt import create_access_token
 from app.core.s3_client import S3Client
 from app.jobs.celery_task import process_colab_link
+from app.jobs.ingest import ingest_upload_task
+from app.jobs.serialization import payload_metrics
+from app.jobs.stage_metrics import batch_timeline
+from app.db.image_transfers import batch_transfer_report
 from app.service.delivery_validation.validation import Validator
 from app.middleware.limiter import limiter
 from app.context.preprocessing_context import PreProcessingContextFactory
 from app.db.database import get_db
-from app.db.enums import StatusEnum, WorkstreamEnum, ClientEnum
-from app.db.models import Batch, DeliveryJson, PreProcessingFile, PreProcessingFileJson, User, ValidationError, ConfigOption, ActivityLog
-from app.middleware.memory_check import memory_check_middleware
+from app.db.redis_client import redis_client
+from app.db.enums import StatusEnum, ValidationErrorTypeEnum, WorkstreamEnum, ClientEnum
+from app.db.models import Batch, BatchCheckpoint, BatchStageMetric, DeliveryJson, PreProcessingFile, PreProcessingFileJson, PreProcessingRecord, User, ValidationError, ConfigOption, ActivityLog
+from app.middleware.admission import upload_admission
 from app.schemas.pre_processing import (
+    BatchImageTransfersResponse,
     BatchResponse,
+    BatchTimelineResponse,
     PaginatedS3FilesResponse,
     PreProcessingFileResponse,
     PreProcessingFileUploadRequest,
+    ResumableUploadCreateRequest,
+    ResumableUploadFinalizeRequest,
+    ResumableUploadResponse,
     ValidationErrorResponse,
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, JSONResponse
 import asyncio
 import json
@@ -45,6 +56,18 @@ from app.service.json_conversion.sft_reasoning import (
     validate_notebook_json,
 )
 from app.utils.error_handler_for_colab import handle_error_for_colab_link
+from app.utils.resumable_upload import (
+    MAX_UPLOAD_SIZE,
+    ResumableUploadError,
+    discard_upload,
+    get_upload,
+    initiate_upload,
+    release_upload,
+    spool_upload,
+    verify_upload,
+    write_chunk,
+)
+from app.utils.upload_spool import open_spooled_uploads, remove_batch_spool, spool_uploads
 from app.auth.dependencies import user_session
 from sqlalchemy import asc, desc
 
@@ -72,88 +95,104 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def validate_upload_request(files: List[UploadFile], request_data: PreProcessingFileUploadRequest, db: Session) -> None:
+    if not files or len(files) < 1:
+        raise HTTPException(status_code=400, detail="At least one file is required.")
+
+    # Check total file size (500MB = 500 * 1024 * 1024 bytes)
+    MAX_TOTAL_SIZE = 800 * 1024 * 1024  # 500MB in bytes
+    total_size = 0
+
+    for file in files:
+        # Get file size from the file object
+        file.file.seek(0, 2)  # Seek to end of file
+        file_size = file.file.tell()  # Get current position (file size)
+        file.file.seek(0)  # Reset file position to beginning
+
+        total_size += file_size
+
+        if total_size > MAX_TOTAL_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Total file size exceeds maximum limit of 500MB. Current total: {total_size / (1024 * 1024):.2f}MB",
+            )
+
+    validate_delivery_date(request_data, db)
+
+
+def validate_delivery_date(request_data: PreProcessingFileUploadRequest, db: Session) -> None:
+    upload_date_restriction = db.query(ConfigOption).filter_by(name="upload_date_restriction").first()
+    upload_date_restriction_value = upload_date_restriction.value if upload_date_restriction else False
+
+    if upload_date_restriction_value:
+    # Validate delivery date range
+        current_date = datetime.now().date()
+        delivery_date = request_data.delivery_date
+        date_diff = abs((delivery_date - current_date).days)
+
+        if date_diff > 7:
+            raise HTTPException(
+                status_code=400, detail="Delivery date must be within 1 week before or after the current date"
+            )
+
+
+def create_upload_batch(batch_id: uuid.UUID, request_data: PreProcessingFileUploadRequest, db: Session) -> Batch:
+    client_enum = ClientEnum.PENGUIN if not request_data.client else ClientEnum(request_data.client)
+    name = PreProcessingContextFactory.get_batch_name(request_data.workstream, request_data.delivery_date)
+
+    batch = Batch(
+        id=batch_id,
+        workstream=request_data.workstream,
+        user_email=request_data.user_email,
+        user_name=request_data.user_name,
+        delivery_date=request_data.delivery_date,
+        name=name,
+        client=client_enum.value
+    )
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+    return batch
+
+
 @router.post("/")
 # @limiter.limit("1/5minute")  # Allow 1 request every 5 minutes per IP address
-@memory_check_middleware(min_memory_gb=1)
 async def upload_json(
     request: Request,
     files: List[UploadFile] = File(...),
     request_data: PreProcessingFileUploadRequest = Depends(),
     db: Session = Depends(get_db),
 ):
+    batch_id = uuid.uuid4()
     try:
-        if not files or len(files) < 1:
-            raise HTTPException(status_code=400, detail="At least one file is required.")
-
-        # Check total file size (500MB = 500 * 1024 * 1024 bytes)
-        MAX_TOTAL_SIZE = 800 * 1024 * 1024  # 500MB in bytes
-        total_size = 0
-
-        for file in files:
-            # Get file size from the file object
-            file.file.seek(0, 2)  # Seek to end of file
-            file_size = file.file.tell()  # Get current position (file size)
-            file.file.seek(0)  # Reset file position to beginning
-
-            total_size += file_size
-
-            if total_size > MAX_TOTAL_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Total file size exceeds maximum limit of 500MB. Current total: {total_size / (1024 * 1024):.2f}MB",
-                )
-
-        upload_date_restriction = db.query(ConfigOption).filter_by(name="upload_date_restriction").first()
-        upload_date_restriction_value = upload_date_restriction.value if upload_date_restriction else False
-
-        if upload_date_restriction_value:
-        # Validate delivery date range
-            current_date = datetime.now().date()
-            delivery_date = request_data.delivery_date
-            date_diff = abs((delivery_date - current_date).days)
-
-            if date_diff > 7:
-                raise HTTPException(
-                    status_code=400, detail="Delivery date must be within 1 week before or after the current date"
-                )
-
-        client_enum = ClientEnum.PENGUIN if not request_data.client else ClientEnum(request_data.client)
+        validate_upload_request(files, request_data, db)
 
         # Create context using factory
         context = PreProcessingContextFactory.create_context(request_data.workstream, db)
 
         # Create and set batch
-        batch_id = uuid.uuid4()
-        name = PreProcessingContextFactory.get_batch_name(request_data.workstream, request_data.delivery_date)
-
-        batch = Batch(
-            id=batch_id,
-            workstream=request_data.workstream,
-            user_email=request_data.user_email,
-            user_name=request_data.user_name,
-            delivery_date=request_data.delivery_date,
-            name=name,
-            client=client_enum.value
-        )
-        db.add(batch)
-        db.commit()
-        db.refresh(batch)
+        batch = create_upload_batch(batch_id, request_data, db)
         context.set_batch(batch)
 
-        # Process files using the selected strategy
-        for file in files:
-            await context.process_file(file)
+        # Process files using the selected strategy; they are parsed in parallel from the spool
+        await run_in_threadpool(spool_uploads, batch_id, files)
+        uploads = open_spooled_uploads(batch_id)
+        try:
+            await run_in_threadpool(context.process_files, uploads)
+        finally:
+            for upload in uploads:
+                upload.file.close()
 
         if not batch.status == StatusEnum.FAILED:
             # Execute tasks using strategy
-            await context.execute_tasks()
+            await run_in_threadpool(context.execute_tasks)
 
         db.commit()
         detail = {
             "batch_id": str(batch_id),
-            "batch":name, 
+            "batch": batch.name,
             "status": batch.status.value,
-            "client": client_enum.value
+            "client": batch.client
         }
         add_to_activity_log(db, user_session.get("user_id"), "UPLOAD", detail, "activity")
         return {"message": "JSON data stored successfully"}
@@ -172,10 +211,166 @@ async def upload_json(
             except ValueError:
                 pass
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        remove_batch_spool(batch_id)
+        db.close()
+
+
+@router.post("/async/", status_code=202)
+def upload_json_async(
+    files: List[UploadFile] = File(...),
+    request_data: PreProcessingFileUploadRequest = Depends(),
+    db: Session = Depends(get_db),
+):
+    """
+    Spool the uploaded files to disk and return the batch right away; a Celery worker
+    parses and stores them and starts the processing tasks of the batch.
+    """
+    batch_id = uuid.uuid4()
+    try:
+        validate_upload_request(files, request_data, db)
+        # Fail fast on unsupported workstreams, before anything is spooled
+        PreProcessingContextFactory.create_context(request_data.workstream, db)
+
+        spool_uploads(batch_id, files)
+        batch = create_upload_batch(batch_id, request_data, db)
+        ingest_upload_task.delay(batch_id)
+
+        detail = {
+            "batch_id": str(batch_id),
+            "batch": batch.name,
+            "status": batch.status.value,
+            "client": batch.client
+        }
+        add_to_activity_log(db, user_session.get("user_id"), "UPLOAD", detail, "activity")
+        return {"message": "JSON data accepted for processing", **detail}
+    except HTTPException as he:
+        remove_batch_spool(batch_id)
+        raise he
+    except Exception as e:
+        db.rollback()
+        remove_batch_spool(batch_id)
+        logger.error(f"Error in upload_json_async: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     finally:
         db.close()
 
 
+@router.post("/uploads/", response_model=ResumableUploadResponse, status_code=201)
+def create_resumable_upload(request_data: ResumableUploadCreateRequest):
+    """Start a resumable upload of one file; its chunks are sent with PUT /uploads/{upload_id}"""
+    try:
+        return initiate_upload(request_data.filename, request_data.size, request_data.content_type, request_data.sha256)
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.get("/uploads/{upload_id}", response_model=ResumableUploadResponse)
+def get_resumable_upload(upload_id: str):
+    """Current offset of an upload, i.e. where an interrupted transfer resumes"""
+    try:
+        return get_upload(upload_id)
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.put("/uploads/{upload_id}", response_model=ResumableUploadResponse)
+async def put_resumable_upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(...),
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256"),
+):
+    """Append the request body at `offset`; X-Chunk-SHA256 is the hex SHA-256 of the body"""
+    data = bytearray()
+    async for chunk in request.stream():
+        data.extend(chunk)
+        if len(data) > settings.RESUMABLE_UPLOAD_MAX_CHUNK_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Chunk exceeds the maximum size of {settings.RESUMABLE_UPLOAD_MAX_CHUNK_SIZE} bytes.",
+            )
+
+    try:
+        return await run_in_threadpool(write_chunk, upload_id, offset, bytes(data), chunk_sha256)
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+def _release_uploads(batch_id, upload_ids):
+    """Undo a failed finalize: the spooled links go, the uploads stay for another attempt"""
+    remove_batch_spool(batch_id)
+    for upload_id in upload_ids:
+        release_upload(upload_id, batch_id)
+
+
+@router.post("/uploads/finalize", status_code=202)
+def finalize_resumable_uploads(request_data: ResumableUploadFinalizeRequest, db: Session = Depends(get_db)):
+    """
+    Create a batch from completed uploads, in the given order, and hand it to the same
+    ingestion as POST /async/.
+    """
+    batch_id = uuid.uuid4()
+    spooled = []
+    try:
+        if not request_data.upload_ids:
+            raise HTTPException(status_code=400, detail="At least one file is required.")
+        validate_delivery_date(request_data, db)
+        # Fail fast on unsupported workstreams, before anything is spooled
+        PreProcessingContextFactory.create_context(request_data.workstream, db)
+
+        # Every upload is checked before any is spooled
+        total_size = sum(verify_upload(upload_id)["size"] for upload_id in request_data.upload_ids)
+        if total_size > MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Total file size exceeds maximum limit of 500MB. Current total: {total_size / (1024 * 1024):.2f}MB",
+            )
+        for upload_id in request_data.upload_ids:
+            spool_upload(upload_id, batch_id)
+            spooled.append(upload_id)
+
+        batch = create_upload_batch(batch_id, request_data, db)
+        ingest_upload_task.delay(batch_id)
+        # The batch holds its own links to the data now; before this a failed finalize leaves the uploads to retry
+        for upload_id in spooled:
+            discard_upload(upload_id)
+
+        detail = {
+            "batch_id": str(batch_id),
+            "batch": batch.name,
+            "status": batch.status.value,
+            "client": batch.client
+        }
+        add_to_activity_log(db, user_session.get("user_id"), "UPLOAD", detail, "activity")
+        return {"message": "JSON data accepted for processing", **detail}
+    except HTTPException as he:
+        _release_uploads(batch_id, spooled)
+        raise he
+    except ResumableUploadError as e:
+        _release_uploads(batch_id, spooled)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        _release_uploads(batch_id, spooled)
+        logger.error(f"Error in finalize_resumable_uploads: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        db.close()
+
+
+@router.get("/admission/")
+def get_upload_admission():
+    """Upload bytes currently admitted against the admission budget"""
+    return upload_admission.snapshot()
+
+
+@router.get("/celery-payloads/")
+def get_celery_payload_metrics():
+    """Bytes and encode/decode time of the Celery messages and results of each task"""
+    return payload_metrics()
+
+
 # Define the generator function for SSE
 async def event_stream(progress_percentage):
     while progress_percentage < 100:
@@ -464,6 +659,109 @@ def get_errors_by_batch(batch_id: uuid.UUID, db: Session = Depends(get_db)):
     )
 
 
+def _last_batch_activity(db: Session, batch: Batch) -> datetime:
+    """When the batch row last changed, or one of its stages last ended"""
+    # TimeStampMixin stores naive local times
+    times = [(batch.updated_at or batch.created_at).astimezone(timezone.utc)]
+    times.append(db.query(func.max(BatchStageMetric.ended_at)).filter(BatchStageMetric.batch_id == batch.id).scalar())
+    times.append(db.query(func.max(BatchCheckpoint.completed_at)).filter(BatchCheckpoint.batch_id == batch.id).scalar())
+    return max(time for time in times if time is not None)
+
+
+@router.post("/resume/", status_code=202)
+def resume_batch(batch_id: uuid.UUID, db: Session = Depends(get_db)):
+    """
+    Restart the processing of a failed or interrupted batch from its stored records. Stages
+    that completed before are skipped, so images are not copied and records not converted again.
+    A batch in progress is only taken as interrupted after BATCH_RESUME_STALE_SECONDS without progress.
+    """
+    # Held while the batch is checked and restarted, so two requests cannot both resume it
+    lock = redis_client.lock(f"batch_resume:{batch_id}", timeout=60)
+    if not lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Batch is already being resumed.")
+    try:
+        return _resume_batch(batch_id, db)
+    finally:
+        lock.release()
+
+
+def _resume_batch(batch_id: uuid.UUID, db: Session):
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Batch with id {batch_id} not found")
+    if batch.status == StatusEnum.COMPLETED:
+        raise HTTPException(status_code=400, detail="Batch is already completed.")
+    if batch.status == StatusEnum.IN_PROGRESS:
+        idle = (datetime.now(timezone.utc) - _last_batch_activity(db, batch)).total_seconds()
+        if idle < settings.BATCH_RESUME_STALE_SECONDS:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Batch is still in progress; it can be resumed after {settings.BATCH_RESUME_STALE_SECONDS} seconds without progress.",
+            )
+    if not db.query(PreProcessingRecord.id).filter(PreProcessingRecord.batch_id == batch_id).first():
+        raise HTTPException(status_code=400, detail="Batch has no stored records to resume from; upload it again.")
+
+    try:
+        # The errors of the interrupted run go; those of stages that completed stay
+        db.query(ValidationError).filter(
+            ValidationError.batch_id == batch_id,
+            ValidationError.type.in_([ValidationErrorTypeEnum.TASK_PROCESSING, ValidationErrorTypeEnum.TASK_CREATION]),
+        ).delete(synchronize_session=False)
+        batch.status = StatusEnum.IN_PROGRESS
+        batch.has_validation_error = (
+            db.query(ValidationError.id).filter(ValidationError.batch_id == batch_id).first() is not None
+        )
+        db.commit()
+
+        context = PreProcessingContextFactory.create_context(batch.workstream, db)
+        context.set_batch(batch)
+        context.resume()
+        db.commit()
+
+        detail = {
+            "batch_id": str(batch_id),
+            "batch": batch.name,
+            "status": batch.status.value,
+            "client": batch.client
+        }
+        add_to_activity_log(db, user_session.get("user_id"), "RESUME", detail, "activity")
+        return {"message": "Batch processing resumed", **detail}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in resume_batch: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/timeline/", response_model=BatchTimelineResponse)
+def get_batch_timeline(batch_id: uuid.UUID, db: Session = Depends(get_db)):
+    """
+    Get the timing, record counts, bytes and peak memory of each pipeline stage run for a batch.
+    """
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Batch with id {batch_id} not found")
+
+    stages = batch_timeline(db, batch_id)
+    total_seconds = 0.0
+    if stages:
+        started_at = min(stage["started_at"] for stage in stages)
+        ended_at = max(stage["ended_at"] for stage in stages)
+        total_seconds = (ended_at - started_at).total_seconds()
+    return BatchTimelineResponse(batch_id=batch_id, total_seconds=total_seconds, stages=stages)
+
+
+@router.get("/image-transfers/", response_model=BatchImageTransfersResponse)
+def get_batch_image_transfers(batch_id: uuid.UUID, db: Session = Depends(get_db)):
+    """
+    Get the outcome and throughput of the image copies of a batch, with the copies still failing.
+    """
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Batch with id {batch_id} not found")
+
+    return BatchImageTransfersResponse(batch_id=batch_id, **batch_transfer_report(db, batch_id))
+
+
 @router.get("/delivery-file/", dependencies=[Depends(has_permission("download_from_s3"))])
 def get_delivery_file(batch_id: uuid.UUID, db: Session = Depends(get_db)):
     """
@@ -16,7 +16,6 @@ from app.db.models import FileContent, ActivityLog
 from app.db.models import S3File as S3FileModel
 import json
 from app.db.redis_client import redis_client
-from app.jobs.celery_task import worker
 from sqlalchemy import asc, desc
 import logging
 from app.auth.dependencies import has_permission, user_session
@@ -1,8 +1,6 @@
 from fastapi import APIRouter, Header, HTTPException
 from app.schemas.s3file import WebhookPayload
-import json
-from app.db.redis_client import redis_client
-from app.jobs.celery_task import worker
+from app.jobs.webhook_consumer import enqueue_webhook_jobs
 import logging
 from dotenv import load_dotenv
 import os
@@ -29,18 +27,13 @@ def update_s3file_webhook(s3files: WebhookPayload, x_webhook_token: str = Header
 
     logger.info("Received webhook payload: %s", s3files)
 
-    # Push each job to Redis
-    for s3file in s3files.changes:
-        job_data = s3file.dict()  # Serialize the necessary data
-        # Convert the dictionary to a JSON string
-        job_data_json = json.dumps(job_data)
-        logger.debug("Pushing job data to Redis: %s", job_data_json)
-
-        try:
-            redis_client.lpush("update_s3file_webhooks", job_data_json)
-            worker.delay()  # Assuming this is a Celery task
-            logger.info("Job added to Redis for file: %s", s3file)
-        except Exception as e:
-            logger.error("Failed to push job data to Redis: %s", e)
+    # Append every job to the webhook stream; the webhook consumers process them
+    jobs = [s3file.dict() for s3file in s3files.changes]
+    try:
+        enqueue_webhook_jobs(jobs)
+        logger.info("%s jobs added to Redis", len(jobs))
+    except Exception as e:
+        logger.error("Failed to push job data to Redis: %s", e)
+        raise HTTPException(status_code=503, detail="Could not queue the jobs")
 
     return {"message": "Jobs added successfully"}
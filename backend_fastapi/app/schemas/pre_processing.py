@@ -22,6 +22,27 @@ class PreProcessingFileUploadRequest(BasePydantic):
     client: str
 
 
+class ResumableUploadCreateRequest(BasePydantic):
+    filename: str
+    size: int
+    content_type: Optional[str] = "application/json"
+    sha256: Optional[str] = None
+
+
+class ResumableUploadResponse(BasePydantic):
+    upload_id: str
+    filename: str
+    content_type: Optional[str]
+    size: int
+    offset: int
+    sha256: Optional[str]
+    max_chunk_size: int
+
+
+class ResumableUploadFinalizeRequest(PreProcessingFileUploadRequest):
+    upload_ids: List[str]
+
+
 class PreProcessingFileResponse(BasePydantic):
     id: int
     name: str
@@ -75,3 +96,49 @@ class ValidationError(BasePydantic):
 class ValidationErrorResponse(BasePydantic):
     summary: ValidationErrorSummary
     errors: List[ValidationError]
+
+
+class BatchStageMetricResponse(BasePydantic):
+    stage: str
+    task_id: Optional[str]
+    status: str
+    started_at: datetime
+    ended_at: datetime
+    seconds: float
+    records: Optional[int]
+    records_per_second: Optional[float]
+    bytes_in: Optional[int]
+    bytes_out: Optional[int]
+    peak_rss_bytes: Optional[int]
+    details: Optional[Dict[str, Any]]
+
+
+class BatchTimelineResponse(BasePydantic):
+    batch_id: UUID
+    # From the start of the first stage to the end of the last
+    total_seconds: float
+    stages: List[BatchStageMetricResponse]
+
+
+class ImageTransferFailure(BasePydantic):
+    source: str
+    s3_key: str
+    attempts: int
+    error_class: Optional[str]
+    error_message: Optional[str]
+
+
+class BatchImageTransfersResponse(BasePydantic):
+    batch_id: UUID
+    # By the last copy of each image
+    images: int
+    copied: int
+    skipped: int
+    failed: int
+    retried: int
+    # Of all the copies made for the batch, from the first to the last
+    bytes: int
+    seconds: float
+    images_per_second: Optional[float]
+    mb_per_second: Optional[float]
+    failures: List[ImageTransferFailure]
@@ -46,18 +46,23 @@ class DeDuplication:
 
     #     return unique_data.to_dict(orient="records"), internal_duplicates
 
-    def compare_with_postgres(self, unique_data):
+    def delivered_ids(self, deliverable_ids):
+        """The given deliverable IDs already delivered, or None when the delivered_id_check option is off"""
         db: Session = next(get_db())
         config_option = db.query(ConfigOption).filter_by(name="delivered_id_check").first()
         delivered_id_check = config_option.value if config_option else True
         logger.info(f"delivered_id_check: {'true' if delivered_id_check else 'false'}")
         if not delivered_id_check:
-            return unique_data, []
-        deliverable_ids = [data["deliverable_id"] for data in unique_data]
+            return None
         existing_ids = (
             db.query(DeliveredId.deliverable_id).filter(DeliveredId.deliverable_id.in_(deliverable_ids)).all()
         )
-        existing_ids = {id_[0] for id_ in existing_ids}
+        return {id_[0] for id_ in existing_ids}
+
+    def compare_with_postgres(self, unique_data):
+        existing_ids = self.delivered_ids([data["deliverable_id"] for data in unique_data])
+        if existing_ids is None:
+            return unique_data, []
 
         filtered_data = []
         db_duplicates = []
@@ -1,28 +1,39 @@
 import json
 import os
+from functools import lru_cache
 import jsonschema
 
 
+@lru_cache(maxsize=None)
+def deliverable_schema_validator():
+    """Validator for deliverable_v1.schema.json, loaded and checked once per process"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(script_dir, "deliverable_v1.schema.json")
+    with open(file_path, "r") as f:
+        schema = json.loads(f.read())
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
 class PenguinFormattingValidator:
     def __init__(self, data):
         self.data = data
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(script_dir, "deliverable_v1.schema.json")
-        with open(file_path, "r") as f:
-            self.schema = json.loads(f.read())
+        self.schema_validator = deliverable_schema_validator()
+        self.schema = self.schema_validator.schema
 
     def validate(self):
         errors = []
         for task in self.data:
-            delivery_id = task.get("deliverable_id")
-            try:
-                # schema validation
-                jsonschema.validate(
-                    instance=task,
-                    schema=self.schema,
-                )
-            except jsonschema.exceptions.ValidationError as e:
-                errors.append({"deliverableId": delivery_id, "message": [str(e)]})
-            except Exception as e:
-                errors.append({"deliverableId": delivery_id, "message": [str(e)]})
+            messages = self.validate_entry(task)
+            if messages:
+                errors.append({"deliverableId": task.get("deliverable_id"), "message": messages})
         return errors
+
+    def validate_entry(self, task):
+        try:
+            # schema validation; same error jsonschema.validate would raise, without re-checking the schema
+            error = jsonschema.exceptions.best_match(self.schema_validator.iter_errors(task))
+            return [str(error)] if error else []
+        except Exception as e:
+            return [str(e)]
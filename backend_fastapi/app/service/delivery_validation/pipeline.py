@@ -0,0 +1,131 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from app.db.enums import ValidationErrorTypeEnum
+from app.service.delivery_validation.deduplicate import DeDuplication
+from app.service.delivery_validation.enums import TaskType
+from app.service.delivery_validation.penguin_json_validator import PenguinFormattingValidator
+from app.service.delivery_validation.rlhf_validator import RlhfValidator
+from app.service.delivery_validation.s3_link_validator import S3LinkValidator
+from app.service.delivery_validation.sft_code_int_validator import SftCodeIntValidation
+
+
+class ValidationIssue(NamedTuple):
+    error_type: ValidationErrorTypeEnum
+    deliverable_id: Any
+    messages: List[str]
+
+
+class ValidationStage(ABC):
+    """One check of a ValidationPipeline"""
+
+    error_type: ValidationErrorTypeEnum
+
+    def prepare(self, entries: Sequence[dict]) -> None:
+        """Called once with every entry before the pass, for lookups that are cheaper in bulk"""
+
+    @abstractmethod
+    def check(self, entry: dict) -> List[str]:
+        """Error messages of one entry; empty when it passes"""
+
+
+class DeduplicationStage(ValidationStage):
+    """Internal duplicates and deliverable ids already delivered, as DeDuplication.validate reports them"""
+
+    error_type = ValidationErrorTypeEnum.DUPLICATION
+
+    def __init__(self):
+        self.de_duplication = DeDuplication()
+        self.seen = set()
+        self.delivered: Optional[set] = None
+
+    def prepare(self, entries):
+        deliverable_ids = {entry.get("deliverable_id") for entry in entries}
+        self.delivered = self.de_duplication.delivered_ids(list(deliverable_ids))
+
+    def check(self, entry):
+        deliverable_id = entry.get("deliverable_id")
+        if deliverable_id in self.seen:
+            return [self.de_duplication.format_duplicate_message("internal")]
+        self.seen.add(deliverable_id)
+        if self.delivered is not None and deliverable_id in self.delivered:
+            return [self.de_duplication.format_duplicate_message("database")]
+        return []
+
+
+class RlhfSchemaStage(ValidationStage):
+    error_type = ValidationErrorTypeEnum.SCHEMA
+
+    def __init__(self):
+        self.validator = RlhfValidator(None)
+
+    def check(self, entry):
+        return self.validator.validate_entry(entry)
+
+
+class S3LinkStage(ValidationStage):
+    error_type = ValidationErrorTypeEnum.S3_LINK
+
+    def __init__(self, task_type: TaskType, assets: List[str], assets_path: str):
+        self.task_type = task_type
+        self.validator = S3LinkValidator(None, assets, assets_path)
+
+    def check(self, entry):
+        return [error["message"] for error in self.validator.validate_entry(entry, self.task_type)]
+
+
+class PenguinFormatStage(ValidationStage):
+    error_type = ValidationErrorTypeEnum.PENGUIN_FORMATTING
+
+    def __init__(self):
+        self.validator = PenguinFormattingValidator(None)
+
+    def check(self, entry):
+        return self.validator.validate_entry(entry)
+
+
+class SftCodeIntSchemaStage(ValidationStage):
+    error_type = ValidationErrorTypeEnum.SCHEMA
+
+    def __init__(self):
+        self.validator = SftCodeIntValidation(None)
+
+    def check(self, entry):
+        return [error["message"] for error in self.validator.validate_record(entry)]
+
+
+class ValidationPipeline:
+    """
+    Runs entries through an ordered list of stages in a single pass. An entry stops at
+    the first stage it fails, so later stages only see entries that passed the earlier
+    ones, as when each validator ran over the output of the previous one.
+    """
+
+    def __init__(self, stages: Iterable[ValidationStage]):
+        self.stages = list(stages)
+        # Seconds spent in each stage by the last run, by stage class name
+        self.seconds = {}
+
+    def run(self, entries: Sequence[dict]) -> Tuple[List[dict], List[ValidationIssue]]:
+        """Returns the entries that passed every stage, in order, and the issues of the others"""
+        seconds = [0.0] * len(self.stages)
+        for index, stage in enumerate(self.stages):
+            started = time.perf_counter()
+            stage.prepare(entries)
+            seconds[index] += time.perf_counter() - started
+
+        passed = []
+        issues = []
+        for entry in entries:
+            for index, stage in enumerate(self.stages):
+                started = time.perf_counter()
+                messages = stage.check(entry)
+                seconds[index] += time.perf_counter() - started
+                if messages:
+                    issues.append(ValidationIssue(stage.error_type, entry.get("deliverable_id"), messages))
+                    break
+            else:
+                passed.append(entry)
+
+        self.seconds = {type(stage).__name__: round(spent, 3) for stage, spent in zip(self.stages, seconds)}
+        return passed, issues
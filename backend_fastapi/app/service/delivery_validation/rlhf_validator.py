@@ -24,15 +24,18 @@ class RlhfValidator:
     def validate(self):
         errors = []
         for entry in self.data:
-            errors_list = []
-            delivery_id = entry.get("deliverable_id")
-            errors_list.extend(self.validate_deliverable_id(entry))
-            errors_list.extend(self.validate_notes(entry))
-            errors_list.extend(self.validate_messages(entry))
+            errors_list = self.validate_entry(entry)
             if errors_list:
-                errors.append({"deliverableId": delivery_id, "message": errors_list})
+                errors.append({"deliverableId": entry.get("deliverable_id"), "message": errors_list})
         return errors
 
+    def validate_entry(self, entry):
+        errors_list = []
+        errors_list.extend(self.validate_deliverable_id(entry))
+        errors_list.extend(self.validate_notes(entry))
+        errors_list.extend(self.validate_messages(entry))
+        return errors_list
+
     def validate_deliverable_id(self, entry):
         errors = []
         if "deliverable_id" not in entry:
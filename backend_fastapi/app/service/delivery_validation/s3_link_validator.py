@@ -5,23 +5,30 @@ class S3LinkValidator:
     def __init__(self, data, assets, assets_path) -> None:
         self.data = data
         self.assets = assets
+        # Membership is checked once per image; a list lookup made that quadratic
+        self.asset_names = set(assets)
         self.assets_path = assets_path
 
     def validate(self, task_type):
         errors = []
         for entry in self.data:
-            deliverable_id = entry["deliverable_id"]
-            images = self.get_image_urls(entry, task_type)
-            for image_url in images:
-                self.validate_prifix_link(deliverable_id, image_url, errors)
-                self.validate_image(deliverable_id, image_url, errors)
+            errors.extend(self.validate_entry(entry, task_type))
+        return errors
+
+    def validate_entry(self, entry, task_type):
+        errors = []
+        deliverable_id = entry["deliverable_id"]
+        images = self.get_image_urls(entry, task_type)
+        for image_url in images:
+            self.validate_prifix_link(deliverable_id, image_url, errors)
+            self.validate_image(deliverable_id, image_url, errors)
         return errors
 
     def validate_image(self, deliverable_id, image_url, errors):
         image_name = self.get_image_name(image_url)
         # model eval file contains "no image" which can be ignored
         if not image_name == "no image":
-            if image_name not in self.assets:
+            if image_name not in self.asset_names:
                 similar_images = self.find_similar_images(image_name, self.assets)
                 if similar_images:
                     errors.append(
@@ -76,4 +83,4 @@ class S3LinkValidator:
         # Get the base name without extension & case insensitive comparision
         base_name = image_name.split(".")[0].lower()
         matching_files = [file for file in assets if file.lower().startswith(base_name)]
-        return matching_files.join(" ") if matching_files else None
+        return " ".join(matching_files) if matching_files else None
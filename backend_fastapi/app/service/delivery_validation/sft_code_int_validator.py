@@ -9,41 +9,46 @@ class SftCodeIntValidation:
         records_to_be_removed = []
         print('sft code int validation started')
         for record in self.json_data:
-            try:
-                delivery_id = record['deliverable_id']
-                
-                # Check task category list count matches user message count
-                task_category_list_count = len(record["notes"]["task_category_list"])
-                user_message_count = sum(1 for message in record["messages"] if message.get("role") == "user")
+            records_to_be_removed.extend(self.validate_record(record))
+        return records_to_be_removed
+
+    def validate_record(self, record):
+        records_to_be_removed = []
+        try:
+            delivery_id = record['deliverable_id']
+
+            # Check task category list count matches user message count
+            task_category_list_count = len(record["notes"]["task_category_list"])
+            user_message_count = sum(1 for message in record["messages"] if message.get("role") == "user")
 
-                if task_category_list_count != user_message_count:
-                    records_to_be_removed.append({
-                        "deliverableId": delivery_id,
-                        "message": f"Task category list count ({task_category_list_count}) does not match user message count ({user_message_count})."
-                    })
+            if task_category_list_count != user_message_count:
+                records_to_be_removed.append({
+                    "deliverableId": delivery_id,
+                    "message": f"Task category list count ({task_category_list_count}) does not match user message count ({user_message_count})."
+                })
 
-                # Build sequence list
-                sequence_list = []
-                for message in record['messages']:
-                    if message['role'] == 'user':
-                        sequence_list.append('User')
-                    elif message['role'] == 'assistant' and message.get('contents') is not None:
-                        sequence_list.append('Assistant')
-                    elif message['role'] == 'assistant' and message.get('content') is None:
-                        sequence_list.append('Code Block')
-                    elif message['role'] == 'tool':
-                        sequence_list.append('Code Output')
+            # Build sequence list
+            sequence_list = []
+            for message in record['messages']:
+                if message['role'] == 'user':
+                    sequence_list.append('User')
+                elif message['role'] == 'assistant' and message.get('contents') is not None:
+                    sequence_list.append('Assistant')
+                elif message['role'] == 'assistant' and message.get('content') is None:
+                    sequence_list.append('Code Block')
+                elif message['role'] == 'tool':
+                    sequence_list.append('Code Output')
 
-                # Check task sequence
-                is_success, message = self.check_task_sequence(sequence_list)
-                if not is_success:
-                    records_to_be_removed.append({
-                        "deliverableId": delivery_id,
-                        "message": message
-                    })
+            # Check task sequence
+            is_success, message = self.check_task_sequence(sequence_list)
+            if not is_success:
+                records_to_be_removed.append({
+                    "deliverableId": delivery_id,
+                    "message": message
+                })
 
-            except Exception as e:
-                print(f"Exception occurred: {e} - FAILED_VALIDATION:")
+        except Exception as e:
+            print(f"Exception occurred: {e} - FAILED_VALIDATION:")
         return records_to_be_removed
 
     def check_task_sequence(self, task_sequence):
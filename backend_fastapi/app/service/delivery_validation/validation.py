@@ -1,3 +1,4 @@
+from functools import cached_property
 from app.service.delivery_validation.penguin_json_validator import PenguinFormattingValidator
 from app.service.delivery_validation.rlhf_validator import RlhfValidator
 from app.service.delivery_validation.rlhf_imagegen import RlhfImageGenValidator
@@ -15,13 +16,35 @@ class Validator:
         self.assets = assets  # array of image names
         self.assets_path = assets_path
         # self.rlhf_image_gen_validator = RlhfImageGenValidator(self.data)
-        self.rlhf_text_vision = RlhfValidator(self.data)
-        self.eval_image_gen_validatior = EvalImageGenValidator(self.data)
-        self.de_duplication = DeDuplication()
-        self.sft_app_tool_validator = SftSchemaValidator()
-        self.s3_link_validator = S3LinkValidator(data, assets, assets_path)
-        self.sft_code_int_validator = SftCodeIntValidation(data)
-        self.penguin_format_validator = PenguinFormattingValidator(data)
+
+    # Sub-validators are built on first use; a Validator typically runs only one of them
+    @cached_property
+    def rlhf_text_vision(self):
+        return RlhfValidator(self.data)
+
+    @cached_property
+    def eval_image_gen_validatior(self):
+        return EvalImageGenValidator(self.data)
+
+    @cached_property
+    def de_duplication(self):
+        return DeDuplication()
+
+    @cached_property
+    def sft_app_tool_validator(self):
+        return SftSchemaValidator()
+
+    @cached_property
+    def s3_link_validator(self):
+        return S3LinkValidator(self.data, self.assets, self.assets_path)
+
+    @cached_property
+    def sft_code_int_validator(self):
+        return SftCodeIntValidation(self.data)
+
+    @cached_property
+    def penguin_format_validator(self):
+        return PenguinFormattingValidator(self.data)
 
     # validate at a time for 1 JSON
     def validate(self, task_type, validation_type):
@@ -0,0 +1,265 @@
+"""
+asyncio engine of the GCS to S3 image copies, selected with IMAGE_COPY_BACKEND=asyncio.
+
+Each worker process runs one event loop in a background thread; the tasks of the process
+hand it their records and wait for the result, so up to IMAGE_COPY_MAX_CONCURRENCY copies
+of all its tasks are in flight at once on a single aiohttp session.
+
+Blobs are downloaded from the GCS JSON API with the service account's token and uploaded
+to S3 through presigned URLs, part by part for images of IMAGE_TRANSFER_PART_SIZE bytes or
+more, so the transfers themselves never block a thread. Only the short multipart create,
+complete and abort calls, and token refreshes, go through boto3 and google-auth in threads.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from itertools import islice
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+import aiohttp
+from google.api_core import exceptions as google_exceptions
+from google.auth.transport.requests import Request
+from app.config import settings
+from app.core.clients import gcs_credentials
+from app.service.json_conversion.image_transfer import (
+    COPIED,
+    FAILED,
+    MIN_PART_SIZE,
+    SKIPPED,
+    TransferError,
+    TransferResult,
+    already_copied,
+    error_class,
+    is_transient,
+    retry_delay,
+)
+
+
+logger = logging.getLogger(__name__)
+
+GCS_OBJECT_URL = "https://storage.googleapis.com/storage/v1/b/{bucket}/o/{name}"
+# Lifetime of the presigned S3 URLs, each used right after being signed
+PRESIGNED_URL_EXPIRES_SECONDS = 15 * 60
+
+# (bucket_name, source_blob_name, s3_key) of one image
+Transfer = Tuple[str, str, str]
+
+
+async def _read_part(stream: aiohttp.StreamReader, size: int) -> bytes:
+    """Up to `size` bytes of the stream; fewer only at its end"""
+    chunks = []
+    length = 0
+    while length < size:
+        chunk = await stream.read(size - length)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        length += len(chunk)
+    return b"".join(chunks)
+
+
+class AsyncImageTransfer:
+    """State of the engine, created on and only used from the event loop thread"""
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(settings.IMAGE_COPY_MAX_CONCURRENCY)
+        # A copy holds one GCS and one S3 connection
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=2 * settings.IMAGE_COPY_MAX_CONCURRENCY),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300),
+        )
+        self.credentials = gcs_credentials()
+        self.token_lock = asyncio.Lock()
+
+    async def _gcs_headers(self) -> dict:
+        async with self.token_lock:
+            if not self.credentials.valid:
+                await asyncio.to_thread(self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def _gcs_metadata(self, bucket_name, source_blob_name) -> dict:
+        url = GCS_OBJECT_URL.format(bucket=bucket_name, name=quote(source_blob_name, safe=""))
+        async with self.session.get(url, headers=await self._gcs_headers()) as response:
+            if response.status != 200:
+                # The exception the GCS client raises for the status, e.g. NotFound
+                raise google_exceptions.from_http_status(response.status, await response.text())
+            return await response.json()
+
+    async def _put(self, url, body: bytes) -> str:
+        async with self.session.put(url, data=body) as response:
+            if response.status != 200:
+                raise TransferError(response.status, await response.text())
+            return response.headers["ETag"]
+
+    async def _upload(self, stream: aiohttp.StreamReader, s3_client, s3_bucket, s3_key) -> int:
+        """Upload the stream to `s3_key`; returns the bytes uploaded"""
+        part_size = max(settings.IMAGE_TRANSFER_PART_SIZE, MIN_PART_SIZE)
+        part = await _read_part(stream, part_size)
+        if len(part) < part_size:
+            url = s3_client.generate_presigned_url(
+                "put_object", Params={"Bucket": s3_bucket, "Key": s3_key}, ExpiresIn=PRESIGNED_URL_EXPIRES_SECONDS
+            )
+            await self._put(url, part)
+            return len(part)
+
+        upload = await asyncio.to_thread(s3_client.create_multipart_upload, Bucket=s3_bucket, Key=s3_key)
+        upload_id = upload["UploadId"]
+        uploaded = 0
+        try:
+            parts = []
+            while part:
+                part_number = len(parts) + 1
+                url = s3_client.generate_presigned_url(
+                    "upload_part",
+                    Params={"Bucket": s3_bucket, "Key": s3_key, "UploadId": upload_id, "PartNumber": part_number},
+                    ExpiresIn=PRESIGNED_URL_EXPIRES_SECONDS,
+                )
+                parts.append({"ETag": await self._put(url, part), "PartNumber": part_number})
+                uploaded += len(part)
+                part = await _read_part(stream, part_size)
+            await asyncio.to_thread(
+                s3_client.complete_multipart_upload,
+                Bucket=s3_bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await asyncio.to_thread(s3_client.abort_multipart_upload, Bucket=s3_bucket, Key=s3_key, UploadId=upload_id)
+            raise
+        return uploaded
+
+    async def _copy_blob(self, transfer: Transfer, s3_client, s3_bucket, existing) -> Tuple[str, Optional[int]]:
+        """One attempt at a copy; returns its status and the bytes uploaded"""
+        bucket_name, source_blob_name, s3_key = transfer
+        metadata = await self._gcs_metadata(bucket_name, source_blob_name)
+        if existing is not None and already_copied(
+            existing.get(s3_key), metadata["size"], metadata.get("md5Hash"), metadata.get("contentEncoding")
+        ):
+            logger.info(f"File {source_blob_name} already in {s3_bucket} as {s3_key}")
+            return SKIPPED, None
+
+        # Gzip-encoded blobs are served decompressed, as the threads engine stores them
+        url = GCS_OBJECT_URL.format(bucket=bucket_name, name=quote(source_blob_name, safe=""))
+        async with self.session.get(url, params={"alt": "media"}, headers=await self._gcs_headers()) as response:
+            if response.status != 200:
+                raise google_exceptions.from_http_status(response.status, await response.text())
+            uploaded = await self._upload(response.content, s3_client, s3_bucket, s3_key)
+
+        logger.info(f"File {source_blob_name} from uploaded to {s3_key} in {s3_bucket}")
+        return COPIED, uploaded
+
+    async def gcloud_to_s3(self, transfer: Transfer, s3_client, s3_bucket, existing: Dict[str, dict]) -> TransferResult:
+        """Counterpart of image_transfer.gcloud_to_s3, retrying transient errors the same way"""
+        bucket_name, source_blob_name, s3_key = transfer
+        source = f"gs://{bucket_name}/{source_blob_name}"
+        started_at = datetime.now(timezone.utc)
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                # The slot is released while waiting to retry
+                async with self.semaphore:
+                    status, uploaded = await self._copy_blob(transfer, s3_client, s3_bucket, existing)
+                return TransferResult(source, s3_key, status, started_at, time.monotonic() - start, attempt, uploaded)
+            except Exception as e:
+                transient = is_transient(e) or isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError))
+                if transient and attempt < settings.IMAGE_TRANSFER_MAX_ATTEMPTS:
+                    logger.warning(f"Retrying {source} after attempt {attempt} failed: {e}")
+                    await asyncio.sleep(retry_delay(attempt))
+                    continue
+                logger.warning(f"Error: {e}")
+                return TransferResult(
+                    source,
+                    s3_key,
+                    FAILED,
+                    started_at,
+                    time.monotonic() - start,
+                    attempt,
+                    error_class=error_class(e),
+                    error_message=str(e),
+                )
+
+    async def copy_records(self, records, s3_client, s3_bucket, existing) -> Tuple[list, List[TransferResult]]:
+        """
+        Copy the images of the (key, transfers) pairs of the `records` iterator, which is read in
+        a thread as IMAGE_COPY_MAX_CONCURRENCY workers take records from a queue of as many
+        """
+        size = settings.IMAGE_COPY_MAX_CONCURRENCY
+        queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        copied = []
+        results = []
+
+        async def copy_next_records():
+            while True:
+                record = await queue.get()
+                if record is None:
+                    return
+                key, transfers = record
+                record_results = await asyncio.gather(
+                    *(self.gcloud_to_s3(transfer, s3_client, s3_bucket, existing) for transfer in transfers)
+                )
+                if all(result.ok for result in record_results):
+                    copied.append(key)
+                results.extend(record_results)
+
+        workers = [asyncio.create_task(copy_next_records()) for _ in range(size)]
+        try:
+            # The iterator may be a database cursor, so it is read off the loop
+            while True:
+                chunk = await asyncio.to_thread(list, islice(records, size))
+                if not chunk:
+                    break
+                for record in chunk:
+                    await queue.put(record)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+        return copied, results
+
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_engine: Optional[AsyncImageTransfer] = None
+
+
+def _engine_loop() -> asyncio.AbstractEventLoop:
+    """The event loop of the process, started on first use and again in a forked child"""
+    global _loop, _loop_pid, _engine
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="image-copy-engine", daemon=True).start()
+            _loop, _loop_pid, _engine = loop, os.getpid(), None
+    return _loop
+
+
+async def _copy_records(records, s3_client, s3_bucket, existing) -> Tuple[list, List[TransferResult]]:
+    global _engine
+    # Created on the loop, which the semaphore and session are bound to
+    if _engine is None:
+        _engine = AsyncImageTransfer()
+    return await _engine.copy_records(records, s3_client, s3_bucket, existing)
+
+
+def copy_records(
+    records: Iterable[Tuple[object, List[Transfer]]], s3_client, s3_bucket, existing: Dict[str, dict] = None
+) -> Tuple[list, List[TransferResult]]:
+    """
+    Copy the images of (key, transfers) pairs on the engine's loop, from any thread, reading
+    them as the copies progress; returns the keys of the records whose images were all
+    copied, and the result of every copy
+    """
+    future = asyncio.run_coroutine_threadsafe(
+        _copy_records(iter(records), s3_client, s3_bucket, existing), _engine_loop()
+    )
+    return future.result()
@@ -66,47 +66,32 @@ class JSONProcessor:
             logger.error(f"Error in get_assets: {str(e)}")
             raise
 
-    def process_file(self, input_array):
-        output_data = []
+    def process_record(self, rlhf, matching_sft):
+        """Convert one rlhf record with its matching sft entry; returns None when it cannot be converted"""
+        del_id = None
         try:
-            for input_data in input_array:
-                sft_array, rlhf_array = input_data["sft"], input_data["rlhf"]
-                output = []
-
-                for rlhf in rlhf_array:
-                    try:
-                        turing_task_url = rlhf["metadata"].get("turing_task_url")
-                        del_id = self.extract_uuid(turing_task_url)
-                        print("del_id", del_id)
-                        if del_id is None:
-                            print(f"Invalid turing_task_url: {turing_task_url}")
-                            continue  # Skip this iteration if del_id is None
-
-                        # Initialize numeric_value here
-                        numeric_value = ""
-                        for msg in rlhf["messages"]:
-                            if msg["role"] == "user":
-                                numeric_value = self.extract_numeric_prefix(msg["text"])
-
-                        matching_sft = next(
-                            (sft for sft in sft_array if sft["colabLink"] == turing_task_url),
-                            None,
-                        )
-
-                        if matching_sft:
-                            annotator_id = matching_sft["humanUser"].get("id")
-                            main_branch = self.create_json_entry(rlhf, del_id, annotator_id)
-                            self.add_msg_branch(main_branch, rlhf, del_id, numeric_value)
-                            output.append(main_branch)
-                        else:
-                            print(f"Matching sft not found - {del_id}")
-                    except Exception as e:
-                        print(f"Error in Delivery: {del_id} - {e}")
-
-                output_data.extend(output)
-            return output_data
+            turing_task_url = rlhf["metadata"].get("turing_task_url")
+            del_id = self.extract_uuid(turing_task_url)
+            print("del_id", del_id)
+            if del_id is None:
+                print(f"Invalid turing_task_url: {turing_task_url}")
+                return
+
+            # Initialize numeric_value here
+            numeric_value = ""
+            for msg in rlhf["messages"]:
+                if msg["role"] == "user":
+                    numeric_value = self.extract_numeric_prefix(msg["text"])
+
+            if matching_sft:
+                annotator_id = matching_sft["humanUser"].get("id")
+                main_branch = self.create_json_entry(rlhf, del_id, annotator_id)
+                self.add_msg_branch(main_branch, rlhf, del_id, numeric_value)
+                return main_branch
+            else:
+                print(f"Matching sft not found - {del_id}")
         except Exception as e:
-            print(f"Error processing JSON: {e}")
+            print(f"Error in Delivery: {del_id} - {e}")
 
     def create_json_entry(self, rlhf, del_id, annotator_id):
         prompt = None
@@ -58,38 +58,21 @@ class JSONProcessor:
             logger.error(f"Failed to get assets: {str(e)}")
             raise
 
-    def process_file(self, input_array):
-        output_data = []
-
+    def process_record(self, rlhf, matching_sft):
+        """Convert one rlhf record with its matching sft entry; returns None when it cannot be converted"""
+        del_id = None
         try:
-            for input_data in input_array:
-                sft_array, rlhf_array = input_data["sft"], input_data["rlhf"]
-                output = []
-                matching_sft_count = 0
-
-                for rlhf in rlhf_array:
-                    try:
-                        turing_task_url = rlhf["metadata"].get("turing_task_url")
-                        del_id = self.extract_uuid(turing_task_url)
-                        matching_sft = next(
-                            (sft for sft in sft_array if sft["colabLink"] == turing_task_url),
-                            None,
-                        )
-
-                        if matching_sft:
-                            matching_sft_count += 1
-                            annotator_id = matching_sft["humanUser"].get("id")
-                            main_branch, user_index = self.create_json_entry(rlhf, del_id, annotator_id)
-                            while user_index < len(rlhf["messages"]):
-                                user_index = self.add_one_turn(main_branch, rlhf, user_index, del_id)
-                            output.append(main_branch)
-                    except Exception as e:
-                        print(f"Error processing del_id: {del_id} - {e}")
-
-                output_data.extend(output)
-            return output_data
+            turing_task_url = rlhf["metadata"].get("turing_task_url")
+            del_id = self.extract_uuid(turing_task_url)
+
+            if matching_sft:
+                annotator_id = matching_sft["humanUser"].get("id")
+                main_branch, user_index = self.create_json_entry(rlhf, del_id, annotator_id)
+                while user_index < len(rlhf["messages"]):
+                    user_index = self.add_one_turn(main_branch, rlhf, user_index, del_id)
+                return main_branch
         except Exception as e:
-            print(f"Error processing JSON: {e}")
+            print(f"Error processing del_id: {del_id} - {e}")
 
     def get_assets(self):
         logger.info(f"Starting get_assets for bucket: {self.s3_bucket_name}")
@@ -1,76 +1,48 @@
-import gzip
-import io
 import re
-import boto3
-from google.cloud import storage
-from google.api_core.exceptions import Forbidden, NotFound
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.core.clients import dev_s3_client, gcs_client, penguin_s3
+from app.service.json_conversion import async_image_transfer
+from app.service.json_conversion.image_transfer import existing_objects, gcloud_to_s3, submit_records
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from app.core.s3_client import S3Client
-from app.db.database import SessionLocal
+from concurrent.futures import ThreadPoolExecutor
 from app.db.models import ConfigOption
 
 
-s3 = S3Client()
-
-
 class ImageProcessor:
-    def __init__(self, json_data, s3_folder):
-        self.json_data = json_data
+    def __init__(self, s3_folder, db: Session):
         self.s3_folder = s3_folder
         self.gcs_client = self.initialize_gcs_client()
-        db = SessionLocal()
+        # Objects already in s3_folder, listed when the records are processed
+        self.existing = {}
+        # TransferResult of each image copied by process_records
+        self.results = []
         apple_upload = db.query(ConfigOption).filter_by(name="enable_penguin_s3_upload").first()
         apple_upload_value = apple_upload.value if apple_upload else False
 
         if apple_upload_value:
+            s3 = penguin_s3()
             s3._refresh_if_credentials_expired()
             self.s3_client = s3.s3_client
             self.s3_bucket = settings.AWS_BUCKET_NAME
         else:
-            self.s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=settings.DEV_AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.DEV_AWS_SECRET_ACCESS_KEY,
-            )
+            self.s3_client = dev_s3_client()
             self.s3_bucket = settings.DEV_AWS_BUCKET_NAME
 
     def initialize_gcs_client(self):
-        return storage.Client.from_service_account_json("turing-gpt.json")
+        return gcs_client()
 
     def gcloud_to_s3(self, bucket_name, source_blob_name, s3_key):
-        buffer = io.BytesIO()
-
-        try:
-            bucket = self.gcs_client.bucket(bucket_name)
-            blob = bucket.blob(source_blob_name)
-
-            with blob.open("rb") as file_stream:
-                if blob.content_encoding == "gzip":
-                    with gzip.GzipFile(fileobj=file_stream) as decompressed_file:
-                        buffer.write(decompressed_file.read())
-                else:
-                    buffer.write(file_stream.read())
-            buffer.seek(0)
-
-            self.s3_client.upload_fileobj(buffer, self.s3_bucket, s3_key)
-            print(f"File {source_blob_name} from uploaded to {s3_key} in {self.s3_bucket}")
-
-        except NotFound:
-            print(f"Error: The object {source_blob_name} was not found in {bucket_name}")
-        except Forbidden as e:
-            print(f"Access Denied: {e}")
-        except Exception as e:
-            print(f"Error: {e}")
-        finally:
-            buffer.close()
+        return gcloud_to_s3(
+            self.gcs_client, bucket_name, source_blob_name, self.s3_client, self.s3_bucket, s3_key, self.existing
+        )
 
     def extract_uuid(self, url):
         match = re.search(r"([a-f0-9\-]{36})", url)
         return match.group(0) if match else None
 
-    def process_item(self, item):
+    def item_transfers(self, item):
+        """(bucket_name, source_blob_name, s3_key) of the image of an item"""
         turing_task_url = item["metadata"].get("turing_task_url")
         deliverable_id = self.extract_uuid(turing_task_url)
         gcs_url = item["messages"][1]["images_list"][0]["uri"]
@@ -86,14 +58,40 @@ class ImageProcessor:
             gcs_url = gcs_url.replace("gcs://", "gs://")
         bucket_name, source_blob_name = gcs_url[5:].split("/", 1)
 
-        self.gcloud_to_s3(bucket_name, source_blob_name, s3_key)
+        return [(bucket_name, source_blob_name, s3_key)]
 
-    def process_all_items(self):
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(self.process_item, item) for item in self.json_data]
+    def process_item(self, item):
+        results = [self.gcloud_to_s3(*transfer) for transfer in self.item_transfers(item)]
+        self.results.extend(results)
+        return all(result.ok for result in results)
+
+    def record_transfers(self, records):
+        """(key, transfers) of each record; a record whose images cannot be read is left out, as not copied"""
+        for key, item in records:
+            try:
+                transfers = self.item_transfers(item)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                continue
+            yield key, transfers
+
+    def process_records(self, records):
+        """Copy the images of (key, item) pairs; returns the keys of the items whose images were all copied"""
+        self.existing = existing_objects(self.s3_client, self.s3_bucket, self.s3_folder)
+        self.results = []
+        if settings.IMAGE_COPY_BACKEND == "asyncio":
+            copied, self.results = async_image_transfer.copy_records(
+                self.record_transfers(records), self.s3_client, self.s3_bucket, self.existing
+            )
+            return copied
 
-            for future in as_completed(futures):
+        copied = []
+        with ThreadPoolExecutor(max_workers=settings.IMAGE_COPY_WORKERS) as executor:
+            # Two records per worker in flight, so the records stream in as the copies finish
+            for key, future in submit_records(executor, self.process_item, records, 2 * settings.IMAGE_COPY_WORKERS):
                 try:
-                    future.result()  # Check for exceptions
+                    if future.result():  # Check for exceptions
+                        copied.append(key)
                 except Exception as e:
                     print(f"An error occurred: {e}")
+        return copied
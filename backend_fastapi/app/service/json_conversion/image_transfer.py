@@ -0,0 +1,264 @@
+"""
+Streaming copy of images from Google Cloud Storage to S3, shared by the image processors.
+
+Blobs are read IMAGE_TRANSFER_PART_SIZE bytes at a time, gunzipped on the fly when stored
+gzip-encoded, and fed to an S3 multipart upload of parts of the same size, so the memory a
+copy holds is a few parts whatever the size of the image.
+
+Before a batch is copied, existing_objects lists the keys already in its S3 folder once;
+images whose key is there with the same content, from an earlier attempt, are not copied again.
+
+Each copy returns a TransferResult. Transient errors (throttling, 5xx, dropped connections)
+are retried up to IMAGE_TRANSFER_MAX_ATTEMPTS times with exponential backoff.
+"""
+import base64
+import gzip
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+from google.api_core import exceptions as google_exceptions
+from requests import exceptions as requests_exceptions
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts under 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+COPIED = "copied"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+TRANSIENT_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_S3_ERROR_CODES = {"RequestTimeout", "SlowDown", "InternalError", "ServiceUnavailable", "Throttling"}
+
+
+class TransferResult(NamedTuple):
+    source: str
+    s3_key: str
+    # COPIED, SKIPPED (already in S3) or FAILED
+    status: str
+    started_at: datetime
+    seconds: float
+    attempts: int
+    # Bytes uploaded, once copied
+    bytes: Optional[int] = None
+    # Class name of the last error, e.g. NotFound or SlowDown, once failed
+    error_class: Optional[str] = None
+    error_message: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != FAILED
+
+
+class TransferError(Exception):
+    """Unexpected HTTP response of GCS or S3"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a copy that failed with `error` may succeed when tried again"""
+    if isinstance(error, (google_exceptions.TooManyRequests, google_exceptions.ServerError)):
+        return True
+    if isinstance(error, TransferError):
+        return error.status in TRANSIENT_HTTP_STATUSES
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in TRANSIENT_S3_ERROR_CODES
+    return isinstance(
+        error,
+        (
+            HTTPClientError,
+            BotocoreConnectionError,
+            requests_exceptions.ConnectionError,
+            requests_exceptions.Timeout,
+            ConnectionError,
+            TimeoutError,
+        ),
+    )
+
+
+def error_class(error: Exception) -> str:
+    # S3 errors are all ClientError; their code tells them apart
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") or type(error).__name__
+    return type(error).__name__
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait after failed attempt number `attempt`, doubling each time, with jitter"""
+    delay = min(settings.IMAGE_TRANSFER_RETRY_MAX_SECONDS, settings.IMAGE_TRANSFER_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+class _ForwardOnlyReader:
+    """
+    Read-only view of a stream. boto3 sizes and re-reads seekable inputs, which gzip
+    streams can only do by decompressing again; without seek it reads them once, part by part.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def transfer_config() -> TransferConfig:
+    part_size = max(settings.IMAGE_TRANSFER_PART_SIZE, MIN_PART_SIZE)
+    concurrency = max(settings.IMAGE_TRANSFER_CONCURRENCY, 1)
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=concurrency,
+        # Images are already copied in parallel; one part at a time keeps each copy to a single buffer
+        use_threads=concurrency > 1,
+    )
+
+
+def existing_objects(s3_client, s3_bucket, prefix) -> Dict[str, dict]:
+    """Size and ETag of every object under `prefix`, by key, from one listing"""
+    objects = {}
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=s3_bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            objects[obj["Key"]] = {"size": obj["Size"], "etag": obj["ETag"].strip('"')}
+    return objects
+
+
+def already_copied(s3_object: Optional[dict], size, md5_hash, content_encoding) -> bool:
+    """
+    Whether the S3 object listed for a blob's key holds the blob's content, given the blob's
+    size, base64 MD5 and content encoding
+    """
+    if s3_object is None:
+        return False
+    # Gzip-encoded blobs are stored decompressed, whose size GCS does not know. S3 never shows
+    # an upload that did not complete, so an object under the key is a finished copy.
+    if content_encoding == "gzip":
+        return s3_object["size"] > 0
+    if s3_object["size"] != int(size):
+        return False
+    # The ETag of a single-part upload is the MD5 of the object; multipart ETags are not
+    etag = s3_object["etag"]
+    if "-" in etag or not md5_hash:
+        return True
+    return base64.b64decode(md5_hash).hex() == etag
+
+
+def _copy_blob(gcs_client, bucket_name, source_blob_name, s3_client, s3_bucket, s3_key, existing):
+    """One attempt at a copy; returns its status and the bytes uploaded"""
+    bucket = gcs_client.bucket(bucket_name)
+    blob = bucket.blob(source_blob_name)
+    # Loads the size, hash and encoding of the blob before anything is read
+    blob.reload()
+
+    if existing is not None and already_copied(existing.get(s3_key), blob.size, blob.md5_hash, blob.content_encoding):
+        logger.info(f"File {source_blob_name} already in {s3_bucket} as {s3_key}")
+        return SKIPPED, None
+
+    # The reader fetches one part-sized range per request instead of its 40 MiB default
+    with blob.open("rb", chunk_size=max(settings.IMAGE_TRANSFER_PART_SIZE, MIN_PART_SIZE)) as file_stream:
+        if blob.content_encoding == "gzip":
+            with gzip.GzipFile(fileobj=file_stream) as decompressed_file:
+                reader = _ForwardOnlyReader(decompressed_file)
+                s3_client.upload_fileobj(reader, s3_bucket, s3_key, Config=transfer_config())
+        else:
+            reader = _ForwardOnlyReader(file_stream)
+            s3_client.upload_fileobj(reader, s3_bucket, s3_key, Config=transfer_config())
+
+    logger.info(f"File {source_blob_name} from uploaded to {s3_key} in {s3_bucket}")
+    return COPIED, reader.bytes_read
+
+
+def gcloud_to_s3(
+    gcs_client, bucket_name, source_blob_name, s3_client, s3_bucket, s3_key, existing: Dict[str, dict] = None
+) -> TransferResult:
+    """
+    Stream one GCS blob to `s3_key` in `s3_bucket`, unless `existing`, the listing of
+    existing_objects, shows it already there. Transient errors are retried; the result
+    tells whether the image is in S3.
+    """
+    source = f"gs://{bucket_name}/{source_blob_name}"
+    started_at = datetime.now(timezone.utc)
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            status, copied_bytes = _copy_blob(
+                gcs_client, bucket_name, source_blob_name, s3_client, s3_bucket, s3_key, existing
+            )
+            return TransferResult(source, s3_key, status, started_at, time.monotonic() - start, attempt, copied_bytes)
+        except Exception as e:
+            if is_transient(e) and attempt < settings.IMAGE_TRANSFER_MAX_ATTEMPTS:
+                logger.warning(f"Retrying {source} after attempt {attempt} failed: {e}")
+                time.sleep(retry_delay(attempt))
+                continue
+            if isinstance(e, google_exceptions.NotFound):
+                logger.warning(f"Error: The object {source_blob_name} was not found in {bucket_name}")
+            elif isinstance(e, google_exceptions.Forbidden):
+                logger.warning(f"Access Denied: {e}")
+            else:
+                logger.warning(f"Error: {e}")
+            return TransferResult(
+                source,
+                s3_key,
+                FAILED,
+                started_at,
+                time.monotonic() - start,
+                attempt,
+                error_class=error_class(e),
+                error_message=str(e),
+            )
+
+
+def submit_records(
+    executor: Executor, process_item: Callable, records: Iterable[Tuple[object, dict]], window: int
+) -> Iterator[Tuple[object, Future]]:
+    """
+    Run `process_item` on the items of (key, item) pairs with at most `window` of them in
+    flight, reading the records only as earlier ones finish; yields (key, future) as they complete
+    """
+    records = iter(records)
+    pending: Dict[Future, object] = {}
+    while True:
+        for key, item in records:
+            pending[executor.submit(process_item, item)] = key
+            if len(pending) >= window:
+                break
+        if not pending:
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
+
+
+def transfer_summary(results, seconds: float) -> dict:
+    """Counts, bytes and throughput of the results of copies that took `seconds` overall"""
+    copied = [result for result in results if result.status == COPIED]
+    total_bytes = sum(result.bytes or 0 for result in copied)
+    return {
+        "images": len(results),
+        "copied": len(copied),
+        "skipped": sum(1 for result in results if result.status == SKIPPED),
+        "failed": sum(1 for result in results if result.status == FAILED),
+        "retried": sum(1 for result in results if result.attempts > 1),
+        "bytes": total_bytes,
+        "seconds": seconds,
+        "images_per_second": len(copied) / seconds if seconds else None,
+        "mb_per_second": total_bytes / (1024 * 1024) / seconds if seconds else None,
+    }
@@ -1,13 +1,72 @@
 from abc import ABC, abstractmethod
+import os
 from fastapi import UploadFile
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple, Type
 import uuid
 from celery import Task
 from sqlalchemy.orm import Session
-from app.db.models import Batch, PreProcessingFile
+from app.db.bulk import copy_csv
+from app.db.enums import StatusEnum, ValidationErrorTypeEnum
+from app.db.models import Batch, PreProcessingFile, PreProcessingRecord, ValidationError
+from app.db.records import RECORD_COLUMNS, RECORDS_SECTION, RLHF_SECTION, SFT_SECTION, RecordWriter
+from app.db.upload_cache import copy_batch_results, find_identical_batch
+from app.utils.compression import decompressing_reader
+from app.utils.json_stream import HashingReader, JSONRecordStream
+from app.utils.process_pool import map_in_pool
+from .record_checks import UUID_PATTERN, RecordCheckSummary
+
+
+JSON_CONTENT_TYPES = {"application/json", "application/gzip", "application/x-gzip", "application/zstd"}
+JSON_EXTENSIONS = (".json", ".json.gz", ".json.zst")
+CONTENT_ENCODINGS = {"gzip", "x-gzip", "zstd"}
+
+
+class ParsedUpload(NamedTuple):
+    # CSV of the pre_processing_records rows of the file, written by a RecordWriter
+    rows_path: Optional[str]
+    sha256: Optional[str]
+    error: Optional[str]
+    # (task url, message) of malformed records, set when the file failed its structural checks
+    record_errors: List[Tuple[Optional[str], str]] = []
+
+
+def parse_upload(strategy_class: Type["PreProcessingStrategy"], path: str, batch_id, preprocessing_file_id: int) -> ParsedUpload:
+    """
+    Decode, hash and validate one upload on disk into a CSV of its records next to it.
+    Runs on the process pool, so errors are returned rather than raised.
+    """
+    strategy = strategy_class()
+    rows_path = f"{path}.rows.csv"
+    checks = RecordCheckSummary()
+    try:
+        with open(path, "rb") as fp:
+            reader = HashingReader(decompressing_reader(fp))
+            stream = JSONRecordStream(reader)
+            with RecordWriter(batch_id, preprocessing_file_id, path=rows_path) as writer:
+                for key, record in stream:
+                    section = key if key is not None else RECORDS_SECTION
+                    task_url = strategy.get_task_url(section, record)
+                    checks.add(task_url, strategy.check_record(section, record))
+                    # Mostly broken files stop here instead of being read in full
+                    if checks.too_broken():
+                        break
+                    writer.add(section, record, task_url)
+            if checks.too_broken(final=True):
+                os.remove(rows_path)
+                return ParsedUpload(None, None, checks.message(), checks.errors)
+            strategy.validate_json(stream.outline())
+        return ParsedUpload(rows_path, reader.hexdigest(), None)
+    except Exception as e:
+        if os.path.exists(rows_path):
+            os.remove(rows_path)
+        return ParsedUpload(None, None, str(e))
 
 
 class PreProcessingStrategy(ABC):
+    def __init__(self):
+        # Uploads parsed by process_files, by PreProcessingFile id, until _store_records loads them
+        self._parsed_uploads: Dict[int, ParsedUpload] = {}
+
     @abstractmethod
     def validate_files(self, files: List[UploadFile], batch: Batch) -> None:
         """Validate the uploaded files"""
@@ -15,20 +74,20 @@ class PreProcessingStrategy(ABC):
 
     @abstractmethod
     def validate_json(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process and validate the JSON data"""
+        """Validate the top-level outline of the JSON data"""
         pass
 
     @abstractmethod
-    def create_tasks(self, json_data: Dict[str, Any], batch: Batch) -> Task:
+    def create_tasks(self, file_record: PreProcessingFile, batch: Batch) -> Task:
         """Create celery tasks for processing"""
         pass
 
     @abstractmethod
-    async def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
+    def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
         """Execute the processing tasks"""
         pass
 
-    async def _store_file(self, file: UploadFile, batch: Batch, db: Session) -> PreProcessingFile:
+    def _store_file(self, file: UploadFile, batch: Batch, db: Session) -> PreProcessingFile:
         """Store file metadata in the database"""
         files = PreProcessingFile(
             batch_id=batch.id,
@@ -38,15 +97,122 @@ class PreProcessingStrategy(ABC):
         db.commit()
         return files
 
-    async def process_file(self, file: UploadFile, batch: Batch, db: Session) -> Task:
-        """Process the uploaded file and return a task"""
-        json_record = await self._store_file(file, batch, db)
+    def is_supported_upload(self, file: UploadFile) -> bool:
+        """JSON, as is or gzip/zstd compressed; compressed files often arrive as application/octet-stream"""
+        content_encoding = (file.headers.get("content-encoding") or "").lower()
+        return (
+            file.content_type in JSON_CONTENT_TYPES
+            or (file.filename or "").lower().endswith(JSON_EXTENSIONS)
+            or content_encoding in CONTENT_ENCODINGS
+        )
 
-        self.validate_files([file], batch, db)
+    def check_record(self, section: str, record: Any) -> List[str]:
+        """Structural problems of one record, checked while the upload streams in; none by default"""
+        return []
 
-        return await self._process_file(file, batch, db, json_record)
+    def get_task_url(self, section: str, record: Any) -> Optional[str]:
+        """Key matching the records of a file to each other, e.g. an rlhf task to its sft entry"""
+        if not isinstance(record, dict):
+            return None
+        if section == RLHF_SECTION:
+            metadata = record.get("metadata")
+            task_url = metadata.get("turing_task_url") if isinstance(metadata, dict) else None
+        elif section == SFT_SECTION:
+            task_url = record.get("colabLink")
+        else:
+            task_url = record.get("deliverable_id")
+        return str(task_url) if task_url is not None else None
+
+    def _store_records(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> None:
+        """Load the records parsed for the file by process_files into pre_processing_records"""
+        parsed = self._parsed_uploads.pop(file_record.id)
+        try:
+            with open(parsed.rows_path, encoding="utf-8", newline="") as fp:
+                copy_csv(db, PreProcessingRecord.__table__, RECORD_COLUMNS, fp)
+        finally:
+            os.remove(parsed.rows_path)
+        file_record.content_sha256 = parsed.sha256
+        db.commit()
+
+    def reuse_identical_batch(self, batch: Batch, db: Session) -> bool:
+        """Complete the batch from an earlier one built from the same uploads; returns whether it was reused"""
+        source = find_identical_batch(db, batch)
+        if source is None:
+            return False
+
+        copy_batch_results(db, source, batch)
+        return True
+
+    def process_files(self, files: List[UploadFile], batch: Batch, db: Session) -> List[Task]:
+        """
+        Process the uploaded files of a batch and return their tasks. The files must be on
+        disk, e.g. reopened with open_spooled_uploads. They are decoded and validated in
+        parallel, then stored one at a time in upload order; every file that fails gets
+        its own validation error.
+        """
+        file_records = []
+        for file in files:
+            file_records.append(self._store_file(file, batch, db))
+            self.validate_files([file], batch, db)
+        if batch.status == StatusEnum.FAILED:
+            return []
+
+        jobs = [(type(self), file.file.name, batch.id, file_record.id) for file, file_record in zip(files, file_records)]
+        parsed_uploads = map_in_pool(
+            parse_upload, jobs, on_broken=lambda job, e: ParsedUpload(None, None, f"Parsing process failed: {e}")
+        )
+
+        failed = [(file, parsed) for file, parsed in zip(files, parsed_uploads) if parsed.error is not None]
+        if failed:
+            batch.status = StatusEnum.FAILED
+            batch.has_validation_error = True
+            for file, parsed in failed:
+                if parsed.record_errors:
+                    self._add_record_errors(file, parsed, batch, db)
+                    continue
+                db.add(
+                    ValidationError(
+                        batch_id=batch.id,
+                        type=ValidationErrorTypeEnum.JSON_FORMATTING,
+                        error_message=f"Error in JSON decoding of {file.filename}: {parsed.error}",
+                    )
+                )
+            db.commit()
+            for parsed in parsed_uploads:
+                if parsed.rows_path is not None:
+                    os.remove(parsed.rows_path)
+            return []
+
+        tasks = []
+        for file, file_record, parsed in zip(files, file_records, parsed_uploads):
+            self._parsed_uploads[file_record.id] = parsed
+            task = self._process_file(file, batch, db, file_record)
+            if task:
+                tasks.append(task)
+        return tasks
+
+    def _add_record_errors(self, file: UploadFile, parsed: ParsedUpload, batch: Batch, db: Session) -> None:
+        """Validation errors of a file rejected by its structural checks: a summary, then the first malformed records"""
+        db.add(
+            ValidationError(
+                batch_id=batch.id,
+                type=ValidationErrorTypeEnum.RECORD_STRUCTURE,
+                error_message=f"{file.filename}: {parsed.error}",
+            )
+        )
+        for task_url, message in parsed.record_errors:
+            match = UUID_PATTERN.search(task_url or "")
+            db.add(
+                ValidationError(
+                    batch_id=batch.id,
+                    type=ValidationErrorTypeEnum.RECORD_STRUCTURE,
+                    delivery_id=match.group(0) if match else None,
+                    error_message=message,
+                    link=task_url,
+                )
+            )
 
     @abstractmethod
-    async def _process_file(self, file: UploadFile, batch: Batch, db: Session, json_record: PreProcessingFile) -> Task:
+    def _process_file(self, file: UploadFile, batch: Batch, db: Session, json_record: PreProcessingFile) -> Task:
         """Internal method to process the file after validation"""
         pass
@@ -1,16 +1,17 @@
-import json
 from fastapi import UploadFile, HTTPException
 from typing import List, Dict, Any
 import uuid
 from celery import Task, chain, group
 from app.db.enums import StatusEnum, ValidationErrorTypeEnum
-from app.db.models import Batch, PreProcessingFile, PreProcessingFileJson, ValidationError
+from app.db.models import Batch, PreProcessingFile, ValidationError
+from app.db.records import RLHF_SECTION, SFT_SECTION
 from app.jobs.celery_task import (
     convert_to_apple_format_image_eval,
     process_images_task_image_eval,
     validations_image_eval,
 )
 from .base import PreProcessingStrategy
+from .record_checks import check_image_eval_record, check_sft_record
 from app.db.database import SessionLocal
 import logging
 from sqlalchemy.orm import Session
@@ -23,7 +24,7 @@ logger = logging.getLogger(__name__)
 class ImageEvalPreProcessingStrategy(PreProcessingStrategy):
     def validate_files(self, files: List[UploadFile], batch: Batch, db: Session) -> None:
         for file in files:
-            if file.content_type != "application/json":
+            if not self.is_supported_upload(file):
                 batch.status = StatusEnum.FAILED
                 batch.has_validation_error = True
                 validation_error = ValidationError(
@@ -42,12 +43,19 @@ class ImageEvalPreProcessingStrategy(PreProcessingStrategy):
             )
         return json_data
 
-    def create_tasks(self, json_data: Dict[str, Any], batch: Batch) -> Task:
+    def check_record(self, section: str, record: Any) -> List[str]:
+        if section == RLHF_SECTION:
+            return check_image_eval_record(record)
+        if section == SFT_SECTION:
+            return check_sft_record(record)
+        return []
+
+    def create_tasks(self, file_record: PreProcessingFile, batch: Batch) -> Task:
         try:
             db = SessionLocal()
             folder_date = batch.delivery_date.strftime("%Y%m%d")
             return process_images_task_image_eval.s(
-                json_data["rlhf"], f"2410-eval-results/assets/{folder_date}/", batch.id
+                file_record.id, f"2410-eval-results/assets/{folder_date}/", batch.id
             )
         except Exception as e:
             batch.status = StatusEnum.FAILED
@@ -61,7 +69,7 @@ class ImageEvalPreProcessingStrategy(PreProcessingStrategy):
             db.commit()
             logger.error(f"Error creating tasks: {e}")
 
-    async def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
+    def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
         try:
             db = SessionLocal()
             parallel_group = group(parallel_tasks)
@@ -82,25 +90,14 @@ class ImageEvalPreProcessingStrategy(PreProcessingStrategy):
             db.commit()
             logger.error(f"Error in task creation: {e}")
 
-    async def _process_file(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> Task:
+    def _process_file(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> Task:
         if batch.status == StatusEnum.FAILED:
             return
 
-        contents = await file.read()
         try:
-            data = contents.decode("utf-8")
-            json_data = json.loads(data)
-
-            json_data = self.validate_json(json_data)
-
-            json_data_record = PreProcessingFileJson(
-                content=data,
-                preprocessing_file_id=file_record.id,
-            )
-            db.add(json_data_record)
-            db.commit()
+            self._store_records(file, batch, db, file_record)
 
-            task = self.create_tasks(json_data, batch)
+            task = self.create_tasks(file_record, batch)
             return task
 
         except Exception as e:
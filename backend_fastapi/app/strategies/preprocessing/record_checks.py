@@ -0,0 +1,166 @@
+"""
+Structural checks run on every record while an upload streams in, so a batch of mostly
+malformed records fails before its images are copied. They only look at the shape the
+converters and image processors rely on; content is left to the delivery validations.
+"""
+import re
+from typing import Any, List, Optional, Tuple
+from app.config import settings
+
+
+UUID_PATTERN = re.compile(r"([a-f0-9\-]{36})")
+# Record errors stored for a failed file; the rest are only counted
+MAX_REPORTED_RECORD_ERRORS = 20
+
+
+def check_rlhf_vision_record(record: Any) -> List[str]:
+    if not isinstance(record, dict):
+        return ["Record is not an object."]
+
+    problems = _check_task_url(record)
+    messages = record.get("messages")
+    if not isinstance(messages, list) or not messages:
+        problems.append("Missing messages.")
+        return problems
+    if not all(isinstance(message, dict) for message in messages):
+        problems.append("Every message must be an object.")
+        return problems
+
+    index = 1 if messages[0].get("role") == "system" else 0
+    if index >= len(messages):
+        problems.append("No user message.")
+    while index < len(messages):
+        problems.extend(_check_turn(messages, index))
+        index += 2
+
+    # The image processors read the image of the first turn from the second message
+    images = messages[1].get("images_list") if len(messages) > 1 else None
+    if not (isinstance(images, list) and images and isinstance(images[0], dict) and images[0].get("uri")):
+        problems.append("messages[1] has no images_list[0].uri.")
+    return problems
+
+
+def _check_task_url(record: dict) -> List[str]:
+    metadata = record.get("metadata")
+    turing_task_url = metadata.get("turing_task_url") if isinstance(metadata, dict) else None
+    if not isinstance(turing_task_url, str) or not turing_task_url:
+        return ["Missing metadata.turing_task_url."]
+    if not UUID_PATTERN.search(turing_task_url):
+        return ["metadata.turing_task_url does not contain a task id."]
+    return []
+
+
+def _check_turn(messages: List[dict], index: int) -> List[str]:
+    user = messages[index]
+    if user.get("role") != "user":
+        return [f"messages[{index}] should be a user message."]
+    if not isinstance(user.get("prompt_evaluation"), list):
+        return [f"messages[{index}] has no prompt_evaluation."]
+    if index + 1 >= len(messages):
+        return [f"messages[{index}] has no answer."]
+
+    answer = messages[index + 1]
+    signal = answer.get("signal")
+    response_options = answer.get("response_options")
+    problems = []
+    if not isinstance(signal, dict) or not isinstance(signal.get("human_evals"), list):
+        problems.append(f"messages[{index + 1}] has no signal.human_evals.")
+    if not isinstance(response_options, list) or len(response_options) < 2:
+        problems.append(f"messages[{index + 1}] needs at least two response_options.")
+    elif not all(isinstance(option, dict) and "model_id" in option and "text" in option for option in response_options[:2]):
+        problems.append(f"messages[{index + 1}] response_options need a model_id and a text.")
+    return problems
+
+
+def check_image_eval_record(record: Any) -> List[str]:
+    if not isinstance(record, dict):
+        return ["Record is not an object."]
+
+    problems = _check_task_url(record)
+    messages = record.get("messages")
+    if not isinstance(messages, list) or not messages:
+        problems.append("Missing messages.")
+        return problems
+    if not all(isinstance(message, dict) for message in messages):
+        problems.append("Every message must be an object.")
+        return problems
+
+    # The image processor names each image after the numeric prefix of the user text
+    for index, message in enumerate(messages):
+        if message.get("role") == "user" and not isinstance(message.get("text"), str):
+            problems.append(f"messages[{index}] has no text.")
+        elif message.get("role") == "assistant":
+            problems.extend(_check_image_options(message, index))
+
+    # The converter reads the prompt from messages[1] and its evaluations from messages[2]
+    if len(messages) < 3:
+        problems.append("Needs the prompt in messages[1] and its answer in messages[2].")
+        return problems
+    answer = messages[2]
+    signal = answer.get("signal")
+    human_evals = signal.get("human_evals") if isinstance(signal, dict) else None
+    response_options = answer.get("response_options")
+    if not isinstance(human_evals, list):
+        problems.append("messages[2] has no signal.human_evals.")
+    elif isinstance(response_options, list) and len(response_options) < len(human_evals):
+        problems.append("messages[2] has fewer response_options than human_evals.")
+    return problems
+
+
+def _check_image_options(message: dict, index: int) -> List[str]:
+    response_options = message.get("response_options")
+    if not isinstance(response_options, list):
+        return [f"messages[{index}] has no response_options."]
+    if not all(
+        isinstance(option, dict) and isinstance(option.get("model_id"), str) and isinstance(option.get("text"), str)
+        for option in response_options
+    ):
+        return [f"messages[{index}] response_options need a model_id and a text."]
+    # Each text is an image in GCS, or "no image"
+    for option in response_options:
+        url = option["text"]
+        if url != "no image" and not (url.startswith(("gs://", "gcs://")) and "/" in url.split("://", 1)[1]):
+            return [f"messages[{index}] has a response image that is not a GCS object URL."]
+    return []
+
+
+def check_sft_record(record: Any) -> List[str]:
+    if not isinstance(record, dict):
+        return ["Record is not an object."]
+
+    problems = []
+    if not record.get("colabLink"):
+        problems.append("Missing colabLink.")
+    if not isinstance(record.get("humanUser"), dict):
+        problems.append("Missing humanUser.")
+    return problems
+
+
+class RecordCheckSummary:
+    """Tally of the records of one file failing their structural check"""
+
+    def __init__(self):
+        self.checked = 0
+        self.broken = 0
+        # (task url, message) of the first broken records
+        self.errors: List[Tuple[Optional[str], str]] = []
+
+    def add(self, task_url: Optional[str], problems: List[str]) -> None:
+        self.checked += 1
+        if not problems:
+            return
+        self.broken += 1
+        if len(self.errors) < MAX_REPORTED_RECORD_ERRORS:
+            self.errors.append((task_url, " ".join(problems)))
+
+    def too_broken(self, final: bool = False) -> bool:
+        """
+        Whether the share of broken records is over PRE_VALIDATION_MAX_BROKEN_RATIO. Until
+        the file is read in full, judged only once PRE_VALIDATION_MIN_RECORDS were checked.
+        """
+        if not self.broken or (not final and self.checked < settings.PRE_VALIDATION_MIN_RECORDS):
+            return False
+        return self.broken / self.checked > settings.PRE_VALIDATION_MAX_BROKEN_RATIO
+
+    def message(self) -> str:
+        return f"{self.broken} of {self.checked} records checked are malformed; the file was rejected before processing."
@@ -1,4 +1,3 @@
-import json
 import logging
 from fastapi import UploadFile, HTTPException
 from typing import List, Dict, Any
@@ -8,7 +7,7 @@ from app.db.enums import StatusEnum, ValidationErrorTypeEnum
 from app.db.models import Batch, ValidationError
 from app.jobs.celery_task import convert_to_apple_format_rlhf_text, validations_rlhf_text
 from .base import PreProcessingStrategy
-from app.db.models import PreProcessingFile, PreProcessingFileJson
+from app.db.models import PreProcessingFile
 from sqlalchemy.orm import Session
 
 
@@ -19,7 +18,7 @@ logger = logging.getLogger(__name__)
 class RLHFTextPreProcessingStrategy(PreProcessingStrategy):
     def validate_files(self, files: List[UploadFile], batch: Batch, db: Session) -> None:
         for file in files:
-            if file.content_type != "application/json":
+            if not self.is_supported_upload(file):
                 batch.status = StatusEnum.FAILED
                 batch.has_validation_error = True
                 validation_error = ValidationError(
@@ -39,10 +38,10 @@ class RLHFTextPreProcessingStrategy(PreProcessingStrategy):
 
         return json_data
 
-    def create_tasks(self, json_data: Dict[str, Any], batch: Batch) -> Task:
+    def create_tasks(self, file_record: PreProcessingFile, batch: Batch) -> Task:
         pass
 
-    async def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
+    def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
         try:
             db = SessionLocal()
             sequential_tasks = chain(convert_to_apple_format_rlhf_text.s(batch.id), validations_rlhf_text.s(batch.id))
@@ -59,23 +58,12 @@ class RLHFTextPreProcessingStrategy(PreProcessingStrategy):
             db.commit()
             logger.error(f"Error in executing tasks: {e}")
 
-    async def _process_file(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> Task:
+    def _process_file(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> Task:
         if batch.status == StatusEnum.FAILED:
             return
 
-        contents = await file.read()
         try:
-            data = contents.decode("utf-8")
-            json_data = json.loads(data)
-
-            json_data = self.validate_json(json_data)
-
-            json_data_record = PreProcessingFileJson(
-                content=data,
-                preprocessing_file_id=file_record.id,
-            )
-            db.add(json_data_record)
-            db.commit()
+            self._store_records(file, batch, db, file_record)
             return
 
         except Exception as e:
@@ -1,4 +1,3 @@
-import json
 import logging
 from fastapi import UploadFile, HTTPException
 from typing import List, Dict, Any
@@ -6,9 +5,11 @@ from celery import Task, chain, group
 from app.db.database import SessionLocal
 from app.db.enums import StatusEnum, ValidationErrorTypeEnum
 from app.db.models import Batch, ValidationError
+from app.db.records import RLHF_SECTION, SFT_SECTION
 from app.jobs.celery_task import process_images_task, convert_to_apple_format_rlhf_vision, validations_rlhf_vision
 from .base import PreProcessingStrategy
-from app.db.models import PreProcessingFile, PreProcessingFileJson
+from .record_checks import check_rlhf_vision_record, check_sft_record
+from app.db.models import PreProcessingFile
 from sqlalchemy.orm import Session
 
 
@@ -19,7 +20,7 @@ logger = logging.getLogger(__name__)
 class RLHFPreProcessingStrategy(PreProcessingStrategy):
     def validate_files(self, files: List[UploadFile], batch: Batch, db: Session) -> None:
         for file in files:
-            if file.content_type != "application/json":
+            if not self.is_supported_upload(file):
                 batch.status = StatusEnum.FAILED
                 batch.has_validation_error = True
                 validation_error = ValidationError(
@@ -39,11 +40,18 @@ class RLHFPreProcessingStrategy(PreProcessingStrategy):
 
         return json_data
 
-    def create_tasks(self, json_data: Dict[str, Any], batch: Batch) -> Task:
+    def check_record(self, section: str, record: Any) -> List[str]:
+        if section == RLHF_SECTION:
+            return check_rlhf_vision_record(record)
+        if section == SFT_SECTION:
+            return check_sft_record(record)
+        return []
+
+    def create_tasks(self, file_record: PreProcessingFile, batch: Batch) -> Task:
         try:
             db = SessionLocal()
             folder_date = batch.delivery_date.strftime("%Y%m%d")
-            return process_images_task.s(json_data["rlhf"], f"2410-rlhf-vision/assets/{folder_date}/", batch.id)
+            return process_images_task.s(file_record.id, f"2410-rlhf-vision/assets/{folder_date}/", batch.id)
         except Exception as e:
             batch.status = StatusEnum.FAILED
             batch.has_validation_error = True
@@ -56,7 +64,7 @@ class RLHFPreProcessingStrategy(PreProcessingStrategy):
             db.commit()
             logger.error(f"Error creating tasks: {e}")
 
-    async def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
+    def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
         try:
             db = SessionLocal()
             parallel_group = group(parallel_tasks)
@@ -77,25 +85,14 @@ class RLHFPreProcessingStrategy(PreProcessingStrategy):
             db.commit()
             logger.error(f"Error in executing tasks: {e}")
 
-    async def _process_file(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> Task:
+    def _process_file(self, file: UploadFile, batch: Batch, db: Session, file_record: PreProcessingFile) -> Task:
         if batch.status == StatusEnum.FAILED:
             return
 
-        contents = await file.read()
         try:
-            data = contents.decode("utf-8")
-            json_data = json.loads(data)
-
-            json_data = self.validate_json(json_data)
-
-            json_data_record = PreProcessingFileJson(
-                content=data,
-                preprocessing_file_id=file_record.id,
-            )
-            db.add(json_data_record)
-            db.commit()
+            self._store_records(file, batch, db, file_record)
 
-            task = self.create_tasks(json_data, batch)
+            task = self.create_tasks(file_record, batch)
             return task
 
         except Exception as e:
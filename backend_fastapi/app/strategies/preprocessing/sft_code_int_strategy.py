@@ -1,13 +1,10 @@
 import logging
-import json
 from fastapi import UploadFile
 from typing import List, Dict, Any
-import uuid
 from celery import Task
 from app.db.database import SessionLocal
 from app.db.enums import StatusEnum, ValidationErrorTypeEnum
-from app.db.models import Batch, PreProcessingFile, PreProcessingFileJson
-from app.db.models import Batch, ValidationError
+from app.db.models import Batch, PreProcessingFile, ValidationError
 from app.jobs.celery_task import validations_sft_code_int
 from .base import PreProcessingStrategy
 from sqlalchemy.orm import Session
@@ -20,7 +17,7 @@ logger = logging.getLogger(__name__)
 class SFTCodeIntPreProcessingStrategy(PreProcessingStrategy):
     def validate_files(self, files: List[UploadFile],  batch: Batch, db: Session) -> None:
         for file in files:
-            if file.content_type != "application/json":
+            if not self.is_supported_upload(file):
                 batch.status = StatusEnum.FAILED
                 batch.has_validation_error = True
                 validation_error = ValidationError(
@@ -35,10 +32,10 @@ class SFTCodeIntPreProcessingStrategy(PreProcessingStrategy):
         pass
 
 
-    def create_tasks(self, json_data: Dict[str, Any], batch_id: uuid.UUID) -> Task:
+    def create_tasks(self, file_record: PreProcessingFile, batch: Batch) -> Task:
         pass
 
-    async def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
+    def execute_tasks(self, batch: Batch, parallel_tasks: List[Task]) -> None:
         try:
             db = SessionLocal()
             validations_sft_code_int.apply_async(args=[batch.id])
@@ -54,23 +51,12 @@ class SFTCodeIntPreProcessingStrategy(PreProcessingStrategy):
             db.commit()
             logger.error(f"Error in executing tasks: {e}")
 
-    async def _process_file(self, file: UploadFile, batch: Batch, db: Session, json_record: PreProcessingFile) -> Task:
+    def _process_file(self, file: UploadFile, batch: Batch, db: Session, json_record: PreProcessingFile) -> Task:
         if batch.status == StatusEnum.FAILED:
             return
 
-        contents = await file.read()
         try:
-            data = contents.decode("utf-8")
-            json_data = json.loads(data)
-
-            json_data = self.validate_json(json_data)
-
-            json_data_record = PreProcessingFileJson(
-                content=data,
-                preprocessing_file_id=json_record.id,
-            )
-            db.add(json_data_record)
-            db.commit()
+            self._store_records(file, batch, db, json_record)
             return
 
         except Exception as e:
@@ -27,13 +27,13 @@ class SFTReasoningPreProcessingStrategy(PreProcessingStrategy):
         logger.info("process_json")
         return []
 
-    def create_tasks(self, json_data: Dict[str, Any], batch_id: uuid.UUID) -> Task:
+    def create_tasks(self, file_record: PreProcessingFile, batch: Batch) -> Task:
         logger.info("create_tasks")
         return
 
-    async def execute_tasks(self, batch_id: uuid.UUID, parallel_tasks: List[Task]) -> None:
+    def execute_tasks(self, batch_id: uuid.UUID, parallel_tasks: List[Task]) -> None:
         logger.info("execute_tasks")
         return
 
-    async def _process_file(self, file: UploadFile, batch: Batch, db: Session, json_record: PreProcessingFile) -> Task:
+    def _process_file(self, file: UploadFile, batch: Batch, db: Session, json_record: PreProcessingFile) -> Task:
         pass
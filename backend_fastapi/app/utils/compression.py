@@ -0,0 +1,59 @@
+import gzip
+import threading
+from typing import BinaryIO, Optional
+import zstandard
+
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Level 3 is zstd's default: close to the best ratio on JSON at a fraction of the cost
+PAYLOAD_COMPRESSION_LEVEL = 3
+
+# zstd contexts must not be shared between threads, and uploads are ingested on the API threadpool
+_local = threading.local()
+
+
+def _compressor() -> zstandard.ZstdCompressor:
+    if not hasattr(_local, "compressor"):
+        _local.compressor = zstandard.ZstdCompressor(level=PAYLOAD_COMPRESSION_LEVEL)
+    return _local.compressor
+
+
+def _decompressor() -> zstandard.ZstdDecompressor:
+    if not hasattr(_local, "decompressor"):
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return _local.decompressor
+
+
+def detect_encoding(fp: BinaryIO) -> Optional[str]:
+    """Compression of a seekable binary file from its magic bytes, or None when it is not compressed"""
+    position = fp.tell()
+    head = fp.read(len(ZSTD_MAGIC))
+    fp.seek(position)
+    if head.startswith(GZIP_MAGIC):
+        return GZIP
+    if head.startswith(ZSTD_MAGIC):
+        return ZSTD
+    return None
+
+
+def decompressing_reader(fp: BinaryIO) -> BinaryIO:
+    """Wrap a seekable binary file so gzip or zstd content is decompressed as it is read"""
+    encoding = detect_encoding(fp)
+    if encoding == GZIP:
+        return gzip.GzipFile(fileobj=fp, mode="rb")
+    if encoding == ZSTD:
+        return zstandard.ZstdDecompressor().stream_reader(fp, read_across_frames=True, closefd=False)
+    return fp
+
+
+def compress_payload(data: bytes) -> bytes:
+    return _compressor().compress(data)
+
+
+def decompress_payload(data: bytes) -> bytes:
+    return _decompressor().decompress(data)
@@ -0,0 +1,192 @@
+import codecs
+import hashlib
+import json
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+# Characters that may follow a value
+VALUE_DELIMITERS = WHITESPACE + ",]}"
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class HashingReader:
+    """Wraps a binary file object and hashes the bytes read through it"""
+
+    def __init__(self, fp: BinaryIO):
+        self._fp = fp
+        self._hash = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._fp.read(size)
+        self._hash.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class JSONRecordStream:
+    """
+    Incrementally walks a JSON document read from a binary file object and yields
+    the items of its top-level arrays one at a time, so only the current record
+    is held in memory.
+
+    Two layouts are supported:
+      - an object whose values are arrays, e.g. {"rlhf": [...], "sft": [...]},
+        which yields (key, record) pairs
+      - a bare top-level array, e.g. [...], which yields (None, record) pairs
+
+    Top-level object values that are not arrays are decoded whole and kept in
+    `extra`; the keys of array values are kept, in order, in `arrays`.
+    """
+
+    def __init__(self, fp: BinaryIO, chunk_size: int = CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buf = ""
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+        self.is_array = False
+        self.arrays: List[str] = []
+        self.counts: Dict[Optional[str], int] = {}
+        self.extra: Dict[str, Any] = {}
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], Any]]:
+        self._skip_whitespace()
+        char = self._peek()
+        if char == "[":
+            self.is_array = True
+            self._pos += 1
+            for record in self._iter_array(None):
+                yield None, record
+        elif char == "{":
+            self._pos += 1
+            yield from self._iter_object()
+        else:
+            raise JSONStreamError("Expecting a JSON object or array at the top level")
+
+        self._skip_whitespace()
+        if self._peek():
+            raise JSONStreamError(f"Extra data after the top-level value at position {self._position()}")
+
+    def outline(self) -> Dict[str, Any]:
+        """Top-level structure of the document: array keys map to their item count"""
+        outline = {key: self.counts.get(key, 0) for key in self.arrays}
+        outline.update(self.extra)
+        return outline
+
+    def _iter_object(self) -> Iterator[Tuple[str, Any]]:
+        self._skip_whitespace()
+        if self._peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise JSONStreamError(f"Expecting property name at position {self._position()}")
+            self._skip_whitespace()
+            self._expect(":")
+            self._skip_whitespace()
+
+            if self._peek() == "[":
+                self._pos += 1
+                self.arrays.append(key)
+                for record in self._iter_array(key):
+                    yield key, record
+            else:
+                self.extra[key] = self._decode_value()
+
+            self._skip_whitespace()
+            char = self._peek()
+            if char != ",":
+                self._expect("}")
+                return
+            self._pos += 1
+            self._skip_whitespace()
+
+    def _iter_array(self, key: Optional[str]) -> Iterator[Any]:
+        self.counts.setdefault(key, 0)
+        self._skip_whitespace()
+        if self._peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            record = self._decode_value()
+            self.counts[key] += 1
+            yield record
+
+            self._skip_whitespace()
+            char = self._peek()
+            if char != ",":
+                self._expect("]")
+                return
+            self._pos += 1
+            self._skip_whitespace()
+
+    def _decode_value(self) -> Any:
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise JSONStreamError(f"Invalid JSON: {e.msg} at position {self._offset + e.pos}") from e
+                # Grow geometrically so a large record is re-scanned a bounded number of times
+                self._fill(len(self._buf) - self._pos)
+                continue
+
+            # raw_decode reads the longest number the buffer holds, so "1." or "1e" of a number
+            # split across chunks decodes as 1; a number must end at a delimiter, or at the end of input
+            if not self._eof and isinstance(value, (int, float)) and not isinstance(value, bool):
+                if end == len(self._buf) or self._buf[end] not in VALUE_DELIMITERS:
+                    self._fill(len(self._buf) - self._pos)
+                    continue
+
+            # A literal ending exactly at the buffer edge may continue in the next chunk
+            if end == len(self._buf) and not self._eof:
+                self._fill()
+                continue
+
+            self._pos = end
+            return value
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise JSONStreamError(f"Expecting '{char}' at position {self._position()}")
+        self._pos += 1
+
+    def _peek(self) -> str:
+        while self._pos >= len(self._buf) and not self._eof:
+            self._fill()
+        return self._buf[self._pos] if self._pos < len(self._buf) else ""
+
+    def _position(self) -> int:
+        return self._offset + self._pos
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or self._eof:
+                return
+            self._fill()
+
+    def _fill(self, at_least: int = 0) -> None:
+        chunk = self._fp.read(max(self._chunk_size, at_least))
+        if not chunk:
+            self._eof = True
+            text = self._text_decoder.decode(b"", final=True)
+        else:
+            text = self._text_decoder.decode(chunk)
+        self._buf = self._buf[self._pos :] + text
+        self._offset += self._pos
+        self._pos = 0
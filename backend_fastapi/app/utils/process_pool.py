@@ -0,0 +1,71 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Pool shared by the process, created on first use. None when parallelism is disabled
+    or this process cannot start children, as in Celery's daemonic prefork workers.
+    """
+    global _pool
+    if settings.PRE_PROCESSING_PARSE_WORKERS <= 1 or multiprocessing.current_process().daemon:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the API forks from a threaded process
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PRE_PROCESSING_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def map_in_pool(
+    fn: Callable, jobs: Sequence[tuple], on_broken: Optional[Callable[[tuple, BaseException], Any]] = None
+) -> List:
+    """
+    Run fn(*job) for every job, on the process pool when there is more than one; results are
+    in job order. A job whose worker died gets on_broken(job, error) as its result, when given.
+    """
+    pool = _get_pool() if len(jobs) > 1 else None
+    if pool is None:
+        return [fn(*job) for job in jobs]
+
+    futures = [pool.submit(fn, *job) for job in jobs]
+    results = []
+    broken = False
+    try:
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as e:
+                broken = True
+                if on_broken is None:
+                    raise
+                results.append(on_broken(job, e))
+    finally:
+        if broken:
+            # A worker died, e.g. killed for memory; the next call starts a fresh pool
+            logger.error("Process pool broken, resetting it")
+            _reset_pool()
+    return results
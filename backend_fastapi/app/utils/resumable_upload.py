@@ -0,0 +1,201 @@
+import hashlib
+import os
+import shutil
+import uuid
+from typing import Optional
+from app.config import settings
+from app.db.redis_client import redis_client
+from app.utils.upload_spool import COPY_BUFFER_SIZE, spool_existing_file
+
+
+# Same cap as the multipart upload endpoint
+MAX_UPLOAD_SIZE = 800 * 1024 * 1024
+KEY_PREFIX = "resumable_upload:"
+LOCK_TIMEOUT_SECONDS = 120
+# How long a finalize holds its uploads, in case it dies before releasing or discarding them
+CLAIM_TIMEOUT_SECONDS = 600
+
+
+class ResumableUploadError(Exception):
+    status_code = 400
+
+
+class UploadNotFound(ResumableUploadError):
+    status_code = 404
+
+
+class UploadConflict(ResumableUploadError):
+    """The request does not match the state of the upload, e.g. a chunk sent at the wrong offset"""
+
+    status_code = 409
+
+
+class ChecksumMismatch(ResumableUploadError):
+    status_code = 422
+
+
+def _key(upload_id: str) -> str:
+    return f"{KEY_PREFIX}{upload_id}"
+
+
+def upload_dir(upload_id: str) -> str:
+    return os.path.join(settings.PRE_PROCESSING_SPOOL_DIR, "resumable", upload_id)
+
+
+def _data_path(upload_id: str) -> str:
+    return os.path.join(upload_dir(upload_id), "data")
+
+
+def _lock(upload_id: str):
+    lock = redis_client.lock(f"{_key(upload_id)}:lock", timeout=LOCK_TIMEOUT_SECONDS)
+    if not lock.acquire(blocking=False):
+        raise UploadConflict("Another request for this upload is in progress.")
+    return lock
+
+
+def initiate_upload(filename: str, size: int, content_type: Optional[str], sha256: Optional[str] = None) -> dict:
+    """Start a resumable upload of `size` bytes; `sha256` of the whole file is checked on finalize when given"""
+    if size <= 0:
+        raise ResumableUploadError("Upload size must be greater than zero.")
+    if size > MAX_UPLOAD_SIZE:
+        raise ResumableUploadError(
+            f"File size exceeds maximum limit of {MAX_UPLOAD_SIZE // (1024 * 1024)}MB."
+        )
+
+    upload_id = uuid.uuid4().hex
+    key = _key(upload_id)
+    redis_client.hset(
+        key,
+        mapping={
+            "filename": filename,
+            "size": size,
+            "content_type": content_type or "",
+            "sha256": (sha256 or "").lower(),
+            "offset": 0,
+        },
+    )
+    redis_client.expire(key, settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+    # Created after the state so cleanup_expired_uploads never sees a directory without it
+    os.makedirs(upload_dir(upload_id), exist_ok=True)
+    open(_data_path(upload_id), "wb").close()
+    return get_upload(upload_id)
+
+
+def get_upload(upload_id: str) -> dict:
+    state = redis_client.hgetall(_key(upload_id))
+    if not state:
+        raise UploadNotFound("Upload not found or expired.")
+
+    state = {key.decode(): value.decode() for key, value in state.items()}
+    return {
+        "upload_id": upload_id,
+        "filename": state["filename"],
+        "content_type": state["content_type"] or None,
+        "size": int(state["size"]),
+        "offset": int(state["offset"]),
+        "sha256": state["sha256"] or None,
+        "max_chunk_size": settings.RESUMABLE_UPLOAD_MAX_CHUNK_SIZE,
+    }
+
+
+def write_chunk(upload_id: str, offset: int, data: bytes, checksum: str) -> dict:
+    """
+    Write a chunk at `offset`, which must be the current offset of the upload, after
+    checking it against its SHA-256 `checksum`. Bytes past the offset left by an
+    interrupted write are overwritten.
+    """
+    lock = _lock(upload_id)
+    try:
+        upload = get_upload(upload_id)
+        if offset != upload["offset"]:
+            raise UploadConflict(f"Chunk offset {offset} does not match the upload offset {upload['offset']}.")
+        if offset + len(data) > upload["size"]:
+            raise ResumableUploadError("Chunk exceeds the declared upload size.")
+        if hashlib.sha256(data).hexdigest() != (checksum or "").lower():
+            raise ChecksumMismatch("Chunk checksum does not match its content.")
+
+        with open(_data_path(upload_id), "r+b") as fp:
+            fp.seek(offset)
+            fp.write(data)
+            fp.truncate()
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        key = _key(upload_id)
+        upload["offset"] = offset + len(data)
+        redis_client.hset(key, "offset", upload["offset"])
+        redis_client.expire(key, settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+        return upload
+    finally:
+        lock.release()
+
+
+def verify_upload(upload_id: str) -> dict:
+    """Check that an upload is complete and matches the checksum it was initiated with"""
+    upload = get_upload(upload_id)
+    if upload["offset"] != upload["size"]:
+        raise UploadConflict(f"Upload is incomplete: {upload['offset']} of {upload['size']} bytes received.")
+    if upload["sha256"] and _file_sha256(_data_path(upload_id)) != upload["sha256"]:
+        raise ChecksumMismatch("Upload checksum does not match the assembled file.")
+    return upload
+
+
+def _claim_key(upload_id: str) -> str:
+    return f"{_key(upload_id)}:batch"
+
+
+def spool_upload(upload_id: str, batch_id) -> dict:
+    """
+    Claim a complete upload for the batch and link it into the batch's spool directory;
+    returns its manifest entry. The upload is kept until discard_upload, once the batch is
+    created, or handed back with release_upload if the finalize fails.
+    """
+    lock = _lock(upload_id)
+    try:
+        upload = get_upload(upload_id)
+        if upload["offset"] != upload["size"]:
+            raise UploadConflict(f"Upload is incomplete: {upload['offset']} of {upload['size']} bytes received.")
+        if not redis_client.set(_claim_key(upload_id), str(batch_id), nx=True, ex=CLAIM_TIMEOUT_SECONDS):
+            raise UploadConflict("Upload is already being finalized.")
+
+        try:
+            return spool_existing_file(batch_id, _data_path(upload_id), upload["filename"], upload["content_type"])
+        except BaseException:
+            redis_client.delete(_claim_key(upload_id))
+            raise
+    finally:
+        lock.release()
+
+
+def release_upload(upload_id: str, batch_id) -> None:
+    """Drop the claim of the batch on an upload, so it can be finalized again"""
+    if redis_client.get(_claim_key(upload_id)) == str(batch_id).encode():
+        redis_client.delete(_claim_key(upload_id))
+
+
+def discard_upload(upload_id: str) -> None:
+    """Remove an upload whose batch has been created, which holds its own link to the data"""
+    redis_client.delete(_key(upload_id), _claim_key(upload_id))
+    shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+
+
+def _file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(COPY_BUFFER_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def cleanup_expired_uploads() -> int:
+    """Remove the data of uploads whose state has expired; returns the number removed"""
+    root = os.path.join(settings.PRE_PROCESSING_SPOOL_DIR, "resumable")
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    for upload_id in os.listdir(root):
+        if not redis_client.exists(_key(upload_id)):
+            shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+from typing import BinaryIO, Callable, List, Optional
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+from app.config import settings
+
+
+MANIFEST_NAME = "manifest.json"
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def batch_spool_dir(batch_id) -> str:
+    return os.path.join(settings.PRE_PROCESSING_SPOOL_DIR, str(batch_id))
+
+
+def spool_file(batch_id, fp: BinaryIO, filename: Optional[str], content_type: Optional[str]) -> dict:
+    """Copy one uploaded file into the spool directory of the batch and add it to its manifest"""
+    return _add_to_spool(batch_id, filename, content_type, lambda path: _copy_to(fp, path))
+
+
+def spool_existing_file(batch_id, source: str, filename: Optional[str], content_type: Optional[str]) -> dict:
+    """
+    Hard-link a file already on the spool filesystem into the spool directory of the batch;
+    the source is left in place, and removing the batch spool leaves it untouched
+    """
+    return _add_to_spool(batch_id, filename, content_type, lambda path: os.link(source, path))
+
+
+def _copy_to(fp: BinaryIO, path: str) -> None:
+    with open(path, "wb") as spooled:
+        shutil.copyfileobj(fp, spooled, COPY_BUFFER_SIZE)
+
+
+def _add_to_spool(batch_id, filename: Optional[str], content_type: Optional[str], store: Callable[[str], None]) -> dict:
+    directory = batch_spool_dir(batch_id)
+    os.makedirs(directory, exist_ok=True)
+    entries = read_manifest(batch_id)
+
+    path = os.path.join(directory, f"{len(entries)}.upload")
+    store(path)
+
+    entry = {"path": path, "filename": filename, "content_type": content_type}
+    entries.append(entry)
+    _write_manifest(batch_id, entries)
+    return entry
+
+
+def spool_uploads(batch_id, uploads: List[UploadFile]) -> List[dict]:
+    """Copy the files of a multipart upload into the spool directory of the batch"""
+    entries = []
+    for upload in uploads:
+        upload.file.seek(0)
+        entries.append(spool_file(batch_id, upload.file, upload.filename, upload.content_type))
+    return entries
+
+
+def read_manifest(batch_id) -> List[dict]:
+    try:
+        with open(os.path.join(batch_spool_dir(batch_id), MANIFEST_NAME)) as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return []
+
+
+def _write_manifest(batch_id, entries: List[dict]) -> None:
+    # Written to a temporary name first so a reader never sees a partial manifest
+    path = os.path.join(batch_spool_dir(batch_id), MANIFEST_NAME)
+    with open(f"{path}.tmp", "w") as fp:
+        json.dump(entries, fp)
+    os.replace(f"{path}.tmp", path)
+
+
+def open_spooled_uploads(batch_id) -> List[UploadFile]:
+    """Reopen the spooled files of a batch as UploadFile objects, in upload order"""
+    return [
+        UploadFile(
+            file=open(entry["path"], "rb"),
+            size=os.path.getsize(entry["path"]),
+            filename=entry["filename"],
+            headers=Headers({"content-type": entry["content_type"] or ""}),
+        )
+        for entry in read_manifest(batch_id)
+    ]
+
+
+def remove_batch_spool(batch_id) -> None:
+    shutil.rmtree(batch_spool_dir(batch_id), ignore_errors=True)
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("boto3")
+pytest.importorskip("google.api_core")
+
+from app.config import settings  # noqa: E402
+from app.service.json_conversion.async_image_transfer import AsyncImageTransfer, _read_part  # noqa: E402
+from app.service.json_conversion.image_transfer import COPIED, FAILED, TransferResult  # noqa: E402
+
+
+class ChunkedStream:
+    """Stream returning at most `chunk` bytes per read, like a socket"""
+
+    def __init__(self, data: bytes, chunk: int):
+        self.data = data
+        self.chunk = chunk
+
+    async def read(self, size: int) -> bytes:
+        taken = self.data[: min(size, self.chunk)]
+        self.data = self.data[len(taken) :]
+        return taken
+
+
+async def _parts(data, chunk, size):
+    stream = ChunkedStream(data, chunk)
+    parts = []
+    while True:
+        part = await _read_part(stream, size)
+        if not part:
+            return parts
+        parts.append(part)
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 100])
+def test_read_part_fills_each_part(chunk):
+    data = bytes(range(256)) * 4
+    parts = asyncio.run(_parts(data, chunk, 100))
+    assert b"".join(parts) == data
+    assert all(len(part) == 100 for part in parts[:-1])
+    assert len(parts[-1]) == len(data) % 100 or len(parts[-1]) == 100
+
+
+def test_read_part_of_empty_stream():
+    assert asyncio.run(_read_part(ChunkedStream(b"", 10), 100)) == b""
+
+
+class FakeEngine(AsyncImageTransfer):
+    """Engine whose copies only record how many records were read and not copied yet"""
+
+    def __init__(self, read):
+        self.read = read
+        self.done = 0
+        self.read_ahead = 0
+
+    async def gcloud_to_s3(self, transfer, s3_client, s3_bucket, existing):
+        await asyncio.sleep(0.001)
+        self.read_ahead = max(self.read_ahead, len(self.read) - self.done)
+        self.done += 1
+        _, source, s3_key = transfer
+        status = FAILED if source == "broken" else COPIED
+        return TransferResult(source, s3_key, status, None, 0.0, 1)
+
+
+def test_copy_records_reads_records_as_they_are_copied(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_COPY_MAX_CONCURRENCY", 4)
+    read = []
+
+    def records():
+        for key in range(50):
+            read.append(key)
+            source = "broken" if key == 7 else f"image-{key}"
+            yield key, [("bucket", source, f"assets/{key}.png")]
+
+    async def copy():
+        engine = FakeEngine(read)
+        copied, results = await engine.copy_records(records(), None, "bucket", {})
+        return engine, copied, results
+
+    engine, copied, results = asyncio.run(copy())
+    assert sorted(copied) == [key for key in range(50) if key != 7]
+    assert len(results) == 50
+    # The records copied, queued and read in the last chunk
+    assert engine.read_ahead <= 3 * 4
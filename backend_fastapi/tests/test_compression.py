@@ -0,0 +1,42 @@
+import gzip
+import io
+import pytest
+
+zstandard = pytest.importorskip("zstandard")
+
+from app.utils.compression import (  # noqa: E402
+    GZIP,
+    ZSTD,
+    compress_payload,
+    decompress_payload,
+    decompressing_reader,
+    detect_encoding,
+)
+
+
+DATA = b'{"records": [' + b",".join(b'{"id": %d}' % i for i in range(2000)) + b"]}"
+
+
+def test_detect_encoding_keeps_position():
+    fp = io.BytesIO(gzip.compress(DATA))
+    assert detect_encoding(fp) == GZIP
+    assert fp.tell() == 0
+    assert detect_encoding(io.BytesIO(zstandard.ZstdCompressor().compress(DATA))) == ZSTD
+    assert detect_encoding(io.BytesIO(DATA)) is None
+
+
+def test_decompressing_reader_reads_every_encoding():
+    for raw in (gzip.compress(DATA), zstandard.ZstdCompressor().compress(DATA), DATA):
+        assert decompressing_reader(io.BytesIO(raw)).read() == DATA
+
+
+def test_decompressing_reader_reads_concatenated_zstd_frames():
+    compressor = zstandard.ZstdCompressor()
+    raw = compressor.compress(DATA[:100]) + compressor.compress(DATA[100:])
+    assert decompressing_reader(io.BytesIO(raw)).read() == DATA
+
+
+def test_payload_round_trip():
+    compressed = compress_payload(DATA)
+    assert len(compressed) < len(DATA)
+    assert decompress_payload(compressed) == DATA
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("celery")
+pytest.importorskip("sqlalchemy")
+
+from app.db.records import ConversionInput, has_unresolved_images  # noqa: E402
+from app.jobs import celery_task  # noqa: E402
+
+
+class FakeSession:
+    def commit(self):
+        pass
+
+
+class FakeProcessor:
+    """Converts like JSONProcessor once the image is in the asset listing"""
+
+    def __init__(self):
+        self.converted = []
+
+    def process_record(self, rlhf, sft):
+        self.converted.append(rlhf["id"])
+        return {"deliverable_id": rlhf["id"], "image": f"s3://bucket/assets/{rlhf['id']}.png"}
+
+
+def converted_with(image_name):
+    return {"deliverable_id": "a", "messages": [{"contents": [{"image": {"url": f"s3://bucket/assets/{image_name}"}}]}]}
+
+
+def test_has_unresolved_images():
+    assert has_unresolved_images(converted_with("None"))
+    assert not has_unresolved_images(converted_with("a.png"))
+    assert not has_unresolved_images(converted_with("None.png"))
+
+
+def test_reupload_after_failed_image_copy_is_converted_again(monkeypatch):
+    # An earlier batch converted "a" while its image copy had failed, and "b" with its image
+    inputs = [
+        ConversionInput(1, {"id": "a"}, {}, "sft-a", converted_with("None")),
+        ConversionInput(2, {"id": "b"}, {}, "sft-b", converted_with("b.png")),
+    ]
+    saved = []
+    monkeypatch.setattr(celery_task, "iter_conversion_inputs", lambda db, batch: iter(inputs))
+    monkeypatch.setattr(celery_task, "save_conversions", lambda db, conversions: saved.extend(conversions))
+
+    processor = FakeProcessor()
+    assert celery_task.convert_batch_records(FakeSession(), None, processor) == 2
+    assert processor.converted == ["a"]
+    assert [conversion["converted"] for conversion in saved] == [
+        {"deliverable_id": "a", "image": "s3://bucket/assets/a.png"},
+        converted_with("b.png"),
+    ]
@@ -0,0 +1,123 @@
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytest.importorskip("boto3")
+google_exceptions = pytest.importorskip("google.api_core.exceptions")
+
+from botocore.exceptions import ClientError, EndpointConnectionError  # noqa: E402
+from app.service.json_conversion.image_transfer import (  # noqa: E402
+    COPIED,
+    FAILED,
+    SKIPPED,
+    TransferError,
+    TransferResult,
+    already_copied,
+    is_transient,
+    submit_records,
+    transfer_summary,
+)
+
+
+CONTENT = b"image bytes"
+MD5 = base64.b64encode(hashlib.md5(CONTENT).digest()).decode()
+
+
+def _s3_object(size=len(CONTENT), etag=hashlib.md5(CONTENT).hexdigest()):
+    return {"size": size, "etag": etag}
+
+
+def test_missing_object_is_not_copied():
+    assert not already_copied(None, len(CONTENT), MD5, None)
+
+
+def test_single_part_object_matches_by_md5():
+    assert already_copied(_s3_object(), str(len(CONTENT)), MD5, None)
+    assert not already_copied(_s3_object(etag="0" * 32), len(CONTENT), MD5, None)
+
+
+def test_size_mismatch_is_not_copied():
+    assert not already_copied(_s3_object(size=1), len(CONTENT), MD5, None)
+
+
+def test_multipart_or_unhashed_objects_match_by_size():
+    assert already_copied(_s3_object(etag="abc-3"), len(CONTENT), MD5, None)
+    assert already_copied(_s3_object(), len(CONTENT), None, None)
+
+
+def test_gzip_blobs_match_any_finished_object():
+    assert already_copied(_s3_object(size=100), 20, MD5, "gzip")
+    assert not already_copied(_s3_object(size=0), 20, MD5, "gzip")
+
+
+def _client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "PutObject")
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        google_exceptions.ServiceUnavailable("busy"),
+        google_exceptions.TooManyRequests("slow down"),
+        TransferError(503, "busy"),
+        _client_error("SlowDown"),
+        EndpointConnectionError(endpoint_url="https://s3"),
+        ConnectionResetError(),
+        TimeoutError(),
+    ],
+)
+def test_transient_errors(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        google_exceptions.NotFound("gone"),
+        google_exceptions.Forbidden("denied"),
+        TransferError(403, "denied"),
+        _client_error("AccessDenied"),
+        ValueError("bad"),
+    ],
+)
+def test_permanent_errors(error):
+    assert not is_transient(error)
+
+
+def test_transfer_summary():
+    results = [
+        TransferResult("gs://b/a", "a", COPIED, None, 1.0, 1, 2 * 1024 * 1024),
+        TransferResult("gs://b/b", "b", COPIED, None, 1.0, 2, 2 * 1024 * 1024),
+        TransferResult("gs://b/c", "c", SKIPPED, None, 0.1, 1),
+        TransferResult("gs://b/d", "d", FAILED, None, 3.0, 4, error_class="NotFound"),
+    ]
+    summary = transfer_summary(results, 2.0)
+    assert summary["images"] == 4
+    assert (summary["copied"], summary["skipped"], summary["failed"], summary["retried"]) == (2, 1, 1, 2)
+    assert summary["bytes"] == 4 * 1024 * 1024
+    assert summary["images_per_second"] == 1.0
+    assert summary["mb_per_second"] == 2.0
+
+
+def test_submit_records_reads_records_as_they_complete():
+    read = []
+    in_flight = []
+
+    def records():
+        for key in range(20):
+            read.append(key)
+            yield key, {"key": key}
+
+    def process_item(item):
+        return item["key"] * 2
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = {}
+        for key, future in submit_records(executor, process_item, records(), window=4):
+            # Records read and not yet completed, this one included
+            in_flight.append(len(read) - len(results))
+            results[key] = future.result()
+
+    assert results == {key: key * 2 for key in range(20)}
+    assert max(in_flight) <= 4
@@ -0,0 +1,56 @@
+import hashlib
+import io
+import json
+import pytest
+from app.utils.json_stream import HashingReader, JSONRecordStream, JSONStreamError
+
+
+DOCUMENTS = [
+    "[1.5]",
+    "[-12.75e-3, 0, 1E+2, 3.0]",
+    '{"rlhf": [{"id": 1, "score": 0.25}, {"id": 22}], "count": 12345, "sft": [], "name": "é✓"}',
+    '  [ {"a": [1, 2.5, {"b": null}]} , true, false, null, "x,]}" ]  ',
+    '{"total": 1234567.125, "items": [10, 200, 3000]}',
+]
+
+
+def _stream(doc, chunk_size):
+    return JSONRecordStream(io.BytesIO(doc.encode("utf-8")), chunk_size=chunk_size)
+
+
+def _expected(doc):
+    value = json.loads(doc)
+    if isinstance(value, list):
+        return [(None, item) for item in value], {}
+    records = [(key, item) for key, items in value.items() if isinstance(items, list) for item in items]
+    extra = {key: item for key, item in value.items() if not isinstance(item, list)}
+    return records, extra
+
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+def test_every_chunk_size_matches_json_loads(doc):
+    records, extra = _expected(doc)
+    for chunk_size in range(1, len(doc.encode("utf-8")) + 1):
+        stream = _stream(doc, chunk_size)
+        assert list(stream) == records, chunk_size
+        assert stream.extra == extra, chunk_size
+
+
+def test_outline_counts_array_items():
+    stream = _stream(DOCUMENTS[2], 4)
+    list(stream)
+    assert stream.outline() == {"rlhf": 2, "sft": 0, "count": 12345, "name": "é✓"}
+
+
+@pytest.mark.parametrize("doc", ["[1, 2", '{"a": [1,]}', "[1] [2]", "42", "[1.]"])
+def test_invalid_documents_raise(doc):
+    for chunk_size in (1, 3, 64):
+        with pytest.raises(JSONStreamError):
+            list(_stream(doc, chunk_size))
+
+
+def test_hashing_reader_hashes_bytes_read():
+    data = json.dumps({"a": list(range(500))}).encode()
+    reader = HashingReader(io.BytesIO(data))
+    list(JSONRecordStream(reader, chunk_size=7))
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
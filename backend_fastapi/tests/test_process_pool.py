@@ -0,0 +1,39 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+
+from app.config import settings
+from app.utils import process_pool
+
+
+def _square_or_die(value):
+    if value < 0:
+        # Like a worker killed for memory
+        os._exit(1)
+    return value * value
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "PRE_PROCESSING_PARSE_WORKERS", 2)
+    yield
+    process_pool._reset_pool()
+
+
+def test_results_are_in_job_order(pool):
+    assert process_pool.map_in_pool(_square_or_die, [(value,) for value in range(6)]) == [0, 1, 4, 9, 16, 25]
+
+
+def test_broken_pool_gives_each_job_its_error(pool):
+    results = process_pool.map_in_pool(
+        _square_or_die, [(2,), (-1,), (3,)], on_broken=lambda job, e: f"failed {job[0]}"
+    )
+    assert results[1] == "failed -1"
+    assert all(result in (value * value, f"failed {value}") for result, value in zip(results, (2, -1, 3)))
+    # The next call starts a fresh pool
+    assert process_pool.map_in_pool(_square_or_die, [(2,), (3,)]) == [4, 9]
+
+
+def test_broken_pool_raises_without_on_broken(pool):
+    with pytest.raises(BrokenProcessPool):
+        process_pool.map_in_pool(_square_or_die, [(2,), (-1,)])
@@ -0,0 +1,109 @@
+import copy
+from app.config import settings
+from app.strategies.preprocessing.record_checks import (
+    RecordCheckSummary,
+    check_image_eval_record,
+    check_rlhf_vision_record,
+    check_sft_record,
+)
+
+
+RLHF_VISION_RECORD = {
+    "metadata": {"turing_task_url": "https://labeling.turing.com/task/8c1f2e4a-3b5d-4c6e-9f70-1a2b3c4d5e6f"},
+    "messages": [
+        {"role": "user", "prompt_evaluation": []},
+        {
+            "role": "assistant",
+            "images_list": [{"uri": "gs://bucket/image.png"}],
+            "signal": {"human_evals": []},
+            "response_options": [{"model_id": "a", "text": "x"}, {"model_id": "b", "text": "y"}],
+        },
+    ],
+}
+
+
+def test_valid_rlhf_vision_record():
+    assert check_rlhf_vision_record(RLHF_VISION_RECORD) == []
+
+
+def test_rlhf_vision_record_problems():
+    assert check_rlhf_vision_record([]) == ["Record is not an object."]
+
+    record = copy.deepcopy(RLHF_VISION_RECORD)
+    record["metadata"]["turing_task_url"] = "https://labeling.turing.com/task/none"
+    del record["messages"][1]["images_list"]
+    record["messages"][1]["response_options"] = [{"model_id": "a", "text": "x"}]
+    assert check_rlhf_vision_record(record) == [
+        "metadata.turing_task_url does not contain a task id.",
+        "messages[1] needs at least two response_options.",
+        "messages[1] has no images_list[0].uri.",
+    ]
+
+    record = copy.deepcopy(RLHF_VISION_RECORD)
+    record["messages"] = []
+    assert check_rlhf_vision_record(record) == ["Missing messages."]
+
+
+IMAGE_EVAL_RECORD = {
+    "metadata": {"turing_task_url": "https://labeling.turing.com/task/8c1f2e4a-3b5d-4c6e-9f70-1a2b3c4d5e6f"},
+    "messages": [
+        {"role": "system", "text": "system"},
+        {"role": "user", "text": "12_a cat"},
+        {
+            "role": "assistant",
+            "signal": {"human_evals": [{}, {}]},
+            "response_options": [{"model_id": "a", "text": "gs://bucket/a.png"}, {"model_id": "b", "text": "no image"}],
+        },
+    ],
+}
+
+
+def test_valid_image_eval_record():
+    assert check_image_eval_record(IMAGE_EVAL_RECORD) == []
+
+
+def test_image_eval_record_problems():
+    assert check_image_eval_record("record") == ["Record is not an object."]
+
+    record = copy.deepcopy(IMAGE_EVAL_RECORD)
+    del record["metadata"]
+    del record["messages"][1]["text"]
+    record["messages"][2]["response_options"] = [{"model_id": "a", "text": "https://example.com/a.png"}]
+    assert check_image_eval_record(record) == [
+        "Missing metadata.turing_task_url.",
+        "messages[1] has no text.",
+        "messages[2] has a response image that is not a GCS object URL.",
+        "messages[2] has fewer response_options than human_evals.",
+    ]
+
+    record = copy.deepcopy(IMAGE_EVAL_RECORD)
+    record["messages"][2] = {"role": "assistant", "response_options": [{"text": "no image"}]}
+    assert check_image_eval_record(record) == [
+        "messages[2] response_options need a model_id and a text.",
+        "messages[2] has no signal.human_evals.",
+    ]
+
+    record = copy.deepcopy(IMAGE_EVAL_RECORD)
+    record["messages"] = record["messages"][1:]
+    assert check_image_eval_record(record) == ["Needs the prompt in messages[1] and its answer in messages[2]."]
+
+
+def test_sft_record():
+    assert check_sft_record({"colabLink": "https://colab", "humanUser": {}}) == []
+    assert check_sft_record({}) == ["Missing colabLink.", "Missing humanUser."]
+
+
+def test_summary_waits_for_enough_records(monkeypatch):
+    monkeypatch.setattr(settings, "PRE_VALIDATION_MIN_RECORDS", 10)
+    monkeypatch.setattr(settings, "PRE_VALIDATION_MAX_BROKEN_RATIO", 0.5)
+    summary = RecordCheckSummary()
+    for _ in range(4):
+        summary.add("url", ["Broken."])
+    assert not summary.too_broken()
+    assert summary.too_broken(final=True)
+
+    for _ in range(6):
+        summary.add("url", [])
+    assert summary.checked == 10 and summary.broken == 4
+    assert not summary.too_broken()
+    assert summary.errors[0] == ("url", "Broken.")
@@ -0,0 +1,109 @@
+import datetime
+import decimal
+import uuid
+import pytest
+
+pytest.importorskip("msgpack")
+pytest.importorskip("zstandard")
+pytest.importorskip("celery")
+
+from app.jobs import serialization  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+_record = serialization._record
+
+
+@pytest.fixture(autouse=True)
+def no_metrics(monkeypatch):
+    # Payload metrics go to Redis, which is not under test
+    monkeypatch.setattr(serialization, "_record", lambda *args: None)
+
+
+def test_round_trip_keeps_extension_types():
+    obj = {
+        "batch_id": uuid.uuid4(),
+        "at": datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        "day": datetime.date(2025, 1, 2),
+        "amount": decimal.Decimal("12.50"),
+        "ids": [1, 2, 3],
+        "nested": {"name": "é", "none": None},
+        1: "int key",
+    }
+    assert serialization.decode(serialization.encode(obj)) == obj
+
+
+def test_small_payloads_are_not_compressed(monkeypatch):
+    monkeypatch.setattr(settings, "CELERY_COMPRESSION_THRESHOLD_BYTES", 1024)
+    assert serialization.encode({"a": 1})[:1] == serialization.RAW
+
+
+def test_large_payloads_are_compressed(monkeypatch):
+    monkeypatch.setattr(settings, "CELERY_COMPRESSION_THRESHOLD_BYTES", 1024)
+    obj = {"ids": list(range(5000))}
+    payload = serialization.encode(obj)
+    assert payload[:1] == serialization.ZSTD
+    assert serialization.decode(payload) == obj
+
+
+def test_threshold_zero_disables_compression(monkeypatch):
+    monkeypatch.setattr(settings, "CELERY_COMPRESSION_THRESHOLD_BYTES", 0)
+    assert serialization.encode({"ids": list(range(5000))})[:1] == serialization.RAW
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        serialization.encode({"value": object()})
+
+
+class FakePipeline:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def hincrby(self, key, field, value):
+        self.calls.append((key, field, value))
+
+    hincrbyfloat = hincrby
+
+    def execute(self):
+        self.calls.append("execute")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.calls = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.calls)
+
+
+def test_metrics_are_summed_until_flushed(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(serialization, "redis_client", redis)
+    monkeypatch.setattr(serialization, "_pending", {})
+    monkeypatch.setattr(settings, "CELERY_PAYLOAD_METRICS_FLUSH_SECONDS", 3600)
+    monkeypatch.setattr(serialization, "_last_flush", serialization.time.monotonic())
+
+    _record("key", "decoded", 10, 5, 0.5)
+    _record("key", "decoded", 30, 15, 0.25)
+    assert redis.calls == []
+
+    serialization.flush_payload_metrics()
+    assert redis.calls == [
+        ("key", "decoded", 2),
+        ("key", "decoded_raw_bytes", 40),
+        ("key", "decoded_bytes", 20),
+        ("key", "decoded_seconds", 0.75),
+        "execute",
+    ]
+
+
+def test_metrics_are_flushed_when_the_interval_is_up(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(serialization, "redis_client", redis)
+    monkeypatch.setattr(serialization, "_pending", {})
+    monkeypatch.setattr(settings, "CELERY_PAYLOAD_METRICS_FLUSH_SECONDS", 0)
+
+    _record("key", "published", 10, 5, 0.5)
+    assert redis.calls[-1] == "execute"
+    assert serialization._pending == {}
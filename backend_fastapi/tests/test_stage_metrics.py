@@ -0,0 +1,27 @@
+import os
+import time
+import pytest
+
+pytest.importorskip("celery")
+pytest.importorskip("sqlalchemy")
+
+from app.jobs import stage_metrics  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc")
+
+SPIKE_BYTES = 64 * 1024 * 1024
+
+
+def test_peak_is_sampled_during_the_stage(monkeypatch):
+    monkeypatch.setattr(stage_metrics, "RSS_SAMPLE_SECONDS", 0.01)
+    sampler = stage_metrics._RssSampler()
+    baseline = sampler.peak
+    spike = bytearray(SPIKE_BYTES)
+    spike[::4096] = b"x" * len(spike[::4096])
+    time.sleep(0.1)
+    del spike
+    assert sampler.stop() >= baseline + SPIKE_BYTES // 2
+
+    # A later stage does not inherit the spike, as it would with ru_maxrss
+    later = stage_metrics._RssSampler()
+    assert later.stop() < baseline + SPIKE_BYTES // 2
@@ -0,0 +1,56 @@
+from app.service.delivery_validation.parse_json_data import StatsAccumulator, process_json_data
+
+
+CONVERSATIONS = [
+    {
+        "messages": [
+            {"role": "user"},
+            {"role": "assistant"},
+            {"role": "user"},
+        ],
+        "notes": {"task_category_list": [{"category": "Math", "subcategory": ["Math", "Algebra"]}]},
+    },
+    {
+        "messages": [
+            {
+                "_message_type": "MessageBranch",
+                "choices": [
+                    {"messages": [{"role": "user"}], "other_properties": {"original_messages": [{}]}},
+                ],
+            },
+        ],
+        "notes": {"task_category_list": ["Code"], "main_coding_language": "python"},
+    },
+]
+
+
+def test_counts_turns_and_categories():
+    stats = StatsAccumulator("2410-rlhf-text")
+    for conversation in CONVERSATIONS:
+        stats.add(conversation)
+    result = stats.result()
+
+    assert result["totalConversations"] == 2
+    # Two direct user turns, one in a choice and one original message
+    assert result["totalUserTurns"] == 4
+    assert result["rlhf"] == 3
+    assert result["ideal_sft"] == 1
+    assert result["categoryGroups"] == {"Math": 1, "Code": 1}
+    assert result["subcategoryGroups"]["Algebra"]["total_rlhf_turn"] == 2
+    assert result["mainCodingLanguageGroups"]["python"] == {
+        "total_rlhf_turn": 1,
+        "total_count": 1,
+        "sft_turn": 1,
+        "total_turn": 2,
+    }
+
+
+def test_matches_process_json_data():
+    stats = StatsAccumulator("2410-rlhf-text")
+    for conversation in CONVERSATIONS:
+        stats.add(conversation)
+    assert stats.result() == process_json_data(CONVERSATIONS, "2410-rlhf-text")
+
+
+def test_no_data():
+    assert StatsAccumulator("2410-rlhf-text").result() == "Data is not available"